@@ -0,0 +1,105 @@
+"""
+Writer latency while an online backup runs
+
+Usage:
+    python -m benchmarks.bench_backup --users 5000 --transactions 500000 --pages-per-step 256
+
+Generates a bank with benchmarks.datagen, then runs a writer thread that keeps
+posting deposits. Writer latency is measured for a quiet baseline period and
+again while src.backup.backup_database copies the database with the given
+step size and sleep, with and without compression. Prints the writer p50/p99
+for each run next to the backup's wall time, restart count and longest step.
+"""
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from benchmarks.datagen import generate_bank
+from src import backup, database
+from src.histogram import Histogram
+from src.transactions import deposit
+
+class _Writer:
+    """Posts small deposits back to back and records each one's latency"""
+    def __init__(self, account_ids, seed: int):
+        self.account_ids = account_ids
+        self.rng = random.Random(seed)
+        self.latencies = Histogram()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            account_id = self.rng.choice(self.account_ids)
+            begin = time.perf_counter()
+            deposit(account_id, Decimal("1.00"), "bench")
+            self.latencies.record((time.perf_counter() - begin) * 1_000_000)
+
+    def __enter__(self) -> "_Writer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+def _writer_summary(histogram: Histogram) -> dict:
+    return {
+        "writes": histogram.count,
+        "p50_us": histogram.percentile(50),
+        "p99_us": histogram.percentile(99),
+        "max_us": histogram.max,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--transactions", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--pages-per-step", type=int, default=backup.BACKUP_PAGES_PER_STEP)
+    parser.add_argument("--step-sleep", type=float, default=backup.BACKUP_STEP_SLEEP)
+    parser.add_argument("--baseline-seconds", type=float, default=3.0)
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_bank(Path(tmp) / "bench.db", args.users, args.transactions, args.seed)
+        with database.get_db_connection() as conn:
+            account_ids = [row[0] for row in conn.execute("SELECT id FROM accounts")]
+
+        runs = []
+        with _Writer(account_ids, args.seed) as writer:
+            time.sleep(args.baseline_seconds)
+        runs.append({"run": "no backup", "writer": _writer_summary(writer.latencies)})
+        print(json.dumps(runs[-1]))
+
+        cases = (
+            ("throttled", args.pages_per_step, args.step_sleep, False),
+            ("throttled+gzip", args.pages_per_step, args.step_sleep, True),
+            ("single step", -1, 0.0, False),
+        )
+        for name, pages, sleep, compress in cases:
+            with _Writer(account_ids, args.seed) as writer:
+                report = backup.backup_database(
+                    Path(tmp) / "backups", compress=compress, pages_per_step=pages, step_sleep=sleep
+                )
+            runs.append({
+                "run": name,
+                "writer": _writer_summary(writer.latencies),
+                "backup": {key: report.get(key) for key in (
+                    "ok", "database_bytes", "backup_bytes", "steps", "restarts", "copy_seconds",
+                    "verify_seconds", "compress_seconds", "wall_seconds", "max_step_us", "p99_step_us",
+                )},
+            })
+            print(json.dumps(runs[-1]))
+
+    if args.output:
+        args.output.write_text(json.dumps(runs, indent=2), encoding="utf-8")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Export throughput and peak memory
+
+Usage:
+    python -m benchmarks.bench_export --users 10000 --transactions 10000000
+
+Generates a bank with benchmarks.datagen, then exports the whole journal to
+CSV, gzipped CSV, JSONL and the columnar format, each in a fresh process so the
+reported peak RSS belongs to that export alone. For comparison it also loads
+the journal with get_all_transactions(), the only way to dump it before.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.datagen import generate_bank
+
+BASELINE_SCRIPT = """
+import json, time
+from src.admin import get_all_transactions
+from src.exporter import peak_rss_mb
+started = time.perf_counter()
+rows = len(get_all_transactions())
+seconds = time.perf_counter() - started
+print(json.dumps({"format": "get_all_transactions", "rows": rows, "seconds": round(seconds, 3),
+                  "rows_per_sec": round(rows / seconds), "peak_rss_mb": peak_rss_mb()}))
+"""
+
+def _run(args, db_path: Path) -> dict:
+    env = dict(os.environ, BANK_DB_PATH=str(db_path))
+    result = subprocess.run([sys.executable, *args], env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout[result.stdout.index("{"):])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--transactions", type=int, default=10_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-baseline", action="store_true", help="do not load everything into memory")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        generate_bank(db_path, args.users, args.transactions, args.seed)
+        for name in ("export.csv", "export.csv.gz", "export.jsonl", "export.col"):
+            report = _run(["-m", "src.exporter", str(Path(tmp) / name)], db_path)
+            print(json.dumps({key: report.get(key) for key in (
+                "format", "path", "rows", "bytes", "seconds", "rows_per_sec", "peak_rss_mb")}))
+            os.remove(Path(tmp) / name)
+        if not args.skip_baseline:
+            print(json.dumps(_run(["-c", BASELINE_SCRIPT], db_path)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Time-to-first-paint of the dashboards after login on a large database
+
+Usage:
+    python -m benchmarks.bench_first_paint --users 20000 --entries 1000000
+
+Generates a bank with benchmarks.datagen, then builds UserDashboard and
+AdminDashboard and measures the time until the window has been drawn once. Each dashboard is measured
+with lazy tabs (the default) and with every tab built up front, which is what
+the dashboards did before tabs were made lazy. Needs a display; under CI run
+it with xvfb-run.
+
+The database work UserDashboard does before its first paint is timed first,
+without a display: the cached session lookup with lazy tabs, plus the account
+snapshot (balance, history and locks) it used to read up front.
+"""
+import argparse
+import tempfile
+import time
+import tkinter as tk
+from pathlib import Path
+
+from benchmarks.datagen import generate_bank
+from src.auth import get_user_by_id
+from src import account_cache
+from src.session import get_session
+from src.transactions import get_account_snapshot
+
+# ui.dashboard.HISTORY_LIMIT; that module needs the UI toolkit to import
+HISTORY_LIMIT = 50
+
+def _first_paint(root, build, eager: bool) -> float:
+    started = time.perf_counter()
+    dashboard = build()
+    dashboard.pack(expand=True, fill="both")
+    if eager:
+        for tab in dashboard.notebook.tabs():
+            dashboard.notebook.build(tab)
+    root.update_idletasks()
+    elapsed = time.perf_counter() - started
+    # Let the deferred build of the first tab finish before tearing down
+    time.sleep(0.01)
+    root.update()
+    dashboard.destroy()
+    root.update()
+    return elapsed
+
+def _queries_before_paint(user_id: int, eager: bool, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        # As after a fresh login: the session is loaded, the account is not cached yet
+        get_session(user_id)
+        account_cache.clear()
+        started = time.perf_counter()
+        account = get_session(user_id).accounts[0]
+        if eager:
+            get_account_snapshot(account.id, HISTORY_LIMIT)
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--entries", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_bank(Path(tmp) / "bench.db", args.users, args.entries)
+        for eager in (True, False):
+            samples = _queries_before_paint(2, eager, args.repeat)
+            print({
+                "dashboard": "user",
+                "queries_before_paint": "eager" if eager else "lazy",
+                "median_ms": round(samples[len(samples) // 2] * 1000, 2),
+                "max_ms": round(samples[-1] * 1000, 2),
+            })
+
+        try:
+            import ttkbootstrap as ttk
+            from ui.admin import AdminDashboard
+            from ui.dashboard import UserDashboard
+        except ImportError as e:
+            print(f"UI toolkit not available: {e}")
+            return
+        try:
+            root = ttk.Window(themename="litera")
+        except tk.TclError as e:
+            print(f"No display available: {e}")
+            return
+        admin = get_user_by_id(1)
+        user = get_user_by_id(2)
+        cases = {
+            "user": lambda: UserDashboard(root, user, on_logout=lambda: None),
+            "admin": lambda: AdminDashboard(root, admin, on_logout=lambda: None),
+        }
+        for name, build in cases.items():
+            for eager in (True, False):
+                samples = sorted(_first_paint(root, build, eager) for _ in range(args.repeat))
+                print({
+                    "dashboard": name,
+                    "tabs": "eager" if eager else "lazy",
+                    "median_ms": round(samples[len(samples) // 2] * 1000, 1),
+                    "max_ms": round(samples[-1] * 1000, 1),
+                })
+        root.destroy()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Contention benchmark: many sender processes paying one receiver account
+
+Usage:
+    python -m benchmarks.bench_hot_account --senders 8 --transfers 200 --shards 8
+
+Runs the workload twice, once with the receiver as a plain account and once
+with balance sharding enabled, and prints throughput for each run.
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from src import database
+from src.sharding import enable_balance_sharding, fold_all_shards
+from src.transactions import get_account_balance, transfer_funds
+
+RECEIVER_NUMBER = "ACHOT0001"
+
+def _setup(db_path: Path, senders: int, shards: int) -> int:
+    database.DB_PATH = db_path
+    database.initialize_database(seed_admin=False)
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO users (username, password) VALUES (?, ?)", ("merchant", "x")
+        )
+        cursor.execute(
+            "INSERT INTO accounts (user_id, account_number, balance) VALUES (?, ?, 0)",
+            (cursor.lastrowid, RECEIVER_NUMBER)
+        )
+        receiver_id = cursor.lastrowid
+        for i in range(senders):
+            cursor.execute(
+                "INSERT INTO users (username, password) VALUES (?, ?)", (f"sender{i}", "x")
+            )
+            cursor.execute(
+                "INSERT INTO accounts (user_id, account_number, balance) VALUES (?, ?, ?)",
+                (cursor.lastrowid, f"ACSND{i:04d}", 1_000_000)
+            )
+        conn.commit()
+    if shards:
+        enable_balance_sharding(receiver_id, shards)
+    return receiver_id
+
+def _sender(db_path: Path, sender_index: int, transfers: int, results) -> None:
+    database.DB_PATH = db_path
+    with database.get_db_connection() as conn:
+        sender_id = conn.execute(
+            "SELECT id FROM accounts WHERE account_number = ?", (f"ACSND{sender_index:04d}",)
+        ).fetchone()[0]
+    ok = 0
+    for _ in range(transfers):
+        success, _ = transfer_funds(sender_id, RECEIVER_NUMBER, Decimal("1.00"), "bench")
+        ok += success
+    results.put(ok)
+
+def run(senders: int, transfers: int, shards: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        receiver_id = _setup(db_path, senders, shards)
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=_sender, args=(db_path, i, transfers, results))
+            for i in range(senders)
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        committed = sum(results.get() for _ in workers)
+        fold_all_shards()
+        balance = get_account_balance(receiver_id)
+        return {
+            "shards": shards,
+            "committed": committed,
+            "attempted": senders * transfers,
+            "seconds": round(elapsed, 3),
+            "transfers_per_sec": round(committed / elapsed, 1),
+            "balance_exact": balance == Decimal(committed),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--senders", type=int, default=8)
+    parser.add_argument("--transfers", type=int, default=200)
+    parser.add_argument("--shards", type=int, default=8)
+    args = parser.parse_args()
+
+    for shards in (0, args.shards):
+        print(run(args.senders, args.transfers, shards))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Bulk import throughput
+
+Usage:
+    python -m benchmarks.bench_import --accounts 100000 --transactions 1000000
+
+Writes a seeded accounts CSV (with pre-hashed passwords and opening balances)
+and a transactions JSONL file with a deposit/withdraw/transfer mix, then loads
+both into a fresh database with src.importer, once in normal mode and once in
+fast mode. Prints rows per second for each load and checks the ledger.
+"""
+import argparse
+import csv
+import json
+import random
+import tempfile
+from pathlib import Path
+
+from src import database
+from src.hashing import hash_secret
+from src.importer import import_accounts, import_transactions
+from src.reconcile import check_ledger
+from src.utils import generate_account_number
+
+def write_files(directory: Path, accounts: int, transactions: int, seed: int = 42):
+    """Write accounts.csv and transactions.jsonl; returns their paths"""
+    rng = random.Random(seed)
+    password_hash = hash_secret("BenchPass1")
+    accounts_path = directory / "accounts.csv"
+    with open(accounts_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(("username", "password", "full_name", "email", "opening_balance"))
+        for i in range(accounts):
+            writer.writerow((f"branch{i}", password_hash, f"Branch User {i}", f"branch{i}@example.com",
+                             f"{rng.randint(1_000_00, 500_000_00) / 100:.2f}"))
+
+    # A fresh database numbers the imported users from 1, so their account numbers are known up front
+    numbers = [generate_account_number(user_id) for user_id in range(1, accounts + 1)]
+    transactions_path = directory / "transactions.jsonl"
+    with open(transactions_path, "w", encoding="utf-8") as f:
+        for _ in range(transactions):
+            kind = rng.choices(("transfer", "deposit", "withdraw"), (0.6, 0.25, 0.15))[0]
+            row = {"type": kind, "account": rng.choice(numbers), "amount": f"{rng.randint(100, 200_000) / 100:.2f}"}
+            if kind == "transfer":
+                row["to_account"] = rng.choice(numbers)
+            f.write(json.dumps(row) + "\n")
+    return accounts_path, transactions_path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=100_000)
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        accounts_path, transactions_path = write_files(Path(tmp), args.accounts, args.transactions, args.seed)
+        for fast in (False, True):
+            database.DB_PATH = Path(tmp) / f"import-{'fast' if fast else 'normal'}.db"
+            database.initialize_database(seed_admin=False)
+            for report in (import_accounts(accounts_path, fast=fast),
+                           import_transactions(transactions_path, fast=fast)):
+                print(json.dumps({"fast": fast, **report}))
+            print(json.dumps({"fast": fast, "violations": check_ledger()["violations"]}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Login latency under a burst: many users signing in at the same moment
+
+Usage:
+    python -m benchmarks.bench_login_burst --users 64 --rounds 10 --workers 2 4
+
+Every user logs in concurrently from its own thread. The burst runs once per
+--workers value so the effect of the hashing concurrency cap on p50/p99 login
+latency can be compared.
+"""
+import argparse
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from src import auth, database, hashing
+
+PASSWORD = "BenchPass1"
+
+def _setup(db_path: Path, users: int) -> None:
+    database.DB_PATH = db_path
+    database.initialize_database(seed_admin=False)
+    password_hash = hashing.hash_secret(PASSWORD)
+    with database.get_db_connection() as conn:
+        conn.executemany(
+            "INSERT INTO users (username, password) VALUES (?, ?)",
+            [(f"user{i}", password_hash) for i in range(users)]
+        )
+        conn.commit()
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def run(users: int, rounds: int, workers: int) -> dict:
+    hashing.set_workers(workers)
+    latencies, failures = [], 0
+    lock = threading.Lock()
+    start_gate = threading.Barrier(users)
+
+    def login(index: int) -> None:
+        nonlocal failures
+        start_gate.wait()
+        started = time.perf_counter()
+        ok = auth.authenticate_user(f"user{index}", PASSWORD)[0] is not None
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            failures += not ok
+
+    # Warm the pool so process start-up is not counted
+    auth.authenticate_user("user0", PASSWORD)
+    for _ in range(rounds):
+        threads = [threading.Thread(target=login, args=(i,)) for i in range(users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    return {
+        "workers": workers,
+        "logins": len(latencies),
+        "failed": failures,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--cost", type=int, default=hashing.BCRYPT_ROUNDS,
+                        help="bcrypt work factor used for the seeded passwords")
+    args = parser.parse_args()
+
+    hashing.set_work_factor(args.cost)
+    with tempfile.TemporaryDirectory() as tmp:
+        _setup(Path(tmp) / "bench.db", args.users)
+        for workers in args.workers:
+            print(run(args.users, args.rounds, workers))
+    hashing.shutdown()
+
+if __name__ == "__main__":
+    main()
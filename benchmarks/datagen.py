@@ -0,0 +1,218 @@
+"""
+Seeded synthetic bank generator
+
+Usage:
+    python -m benchmarks.datagen bench.db --users 100000 --transactions 10000000
+
+Builds a database with users, one account each and a journal whose activity
+follows a Zipf distribution over accounts: a few hot accounts see most of the
+traffic, as in a real ledger. The same seed always produces the same rows.
+
+Rows are written directly with executemany in large chunks, with journaling
+off and the journal indexes dropped until the load has finished, so 10M
+entries take minutes rather than the hours the posting functions would need.
+The result is still consistent with them: every account starts with an
+opening deposit, no balance ever goes negative, locks debit the account and
+have a matching locked_funds row, and final balances equal the sum of the
+journal legs.
+"""
+import argparse
+import bisect
+import itertools
+import random
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from src import database
+from src.hashing import hash_secret
+from src.utils import generate_account_number, generate_ulid
+
+# 2025-01-01T00:00:00Z; fixed so the same seed yields identical timestamps
+DEFAULT_START_US = 1_735_689_600_000_000
+DEFAULT_SPAN_DAYS = 365
+DEFAULT_PASSWORD = "BenchPass1"
+DEFAULT_PIN = "1234"
+CHUNK_SIZE = 50_000
+
+# Share of generated entries per operation; anything a balance cannot cover becomes a deposit
+TYPE_MIX = (("transfer", 0.60), ("deposit", 0.20), ("withdraw", 0.15), ("lock", 0.05))
+
+ENTRY_SQL = """INSERT INTO journal_entries
+    (type, amount, debit_account_id, credit_account_id, description, reference, status,
+     created_at, created_at_us, txn_ref)
+    VALUES (?, ?, ?, ?, ?, ?, 'completed', datetime(? / 1000000, 'unixepoch'), ?, ?)"""
+
+LOCK_SQL = """INSERT INTO locked_funds (account_id, amount, pin_hash, description, created_at)
+    VALUES (?, ?, ?, ?, datetime(? / 1000000, 'unixepoch'))"""
+
+class ZipfSampler:
+    """Draw account ids with probability proportional to 1 / rank ** s"""
+    def __init__(self, account_ids: List[int], s: float = 1.1, rng: Optional[random.Random] = None):
+        self.rng = rng or random.Random()
+        # Hot ranks are scattered over the id space instead of being the lowest ids
+        self.ranked = list(account_ids)
+        self.rng.shuffle(self.ranked)
+        self.cum_weights = list(itertools.accumulate(1 / rank ** s for rank in range(1, len(self.ranked) + 1)))
+
+    def sample(self) -> int:
+        return self.ranked[bisect.bisect(self.cum_weights, self.rng.random() * self.cum_weights[-1])]
+
+    def samples(self, k: int) -> List[int]:
+        return self.rng.choices(self.ranked, cum_weights=self.cum_weights, k=k)
+
+    def hottest(self, n: int = 1) -> List[int]:
+        return self.ranked[:n]
+
+def _amount_cents(rng: random.Random, mean_rupees: float = 2500) -> int:
+    # Long-tailed: mostly small amounts with the odd large one, capped below the API limits
+    return min(max(100, int(rng.expovariate(1 / mean_rupees) * 100)), 100_000_00)
+
+def generate_bank(db_path: Path, users: int = 1000, transactions: int = 100_000, seed: int = 42,
+                  zipf_s: float = 1.1, start_us: int = DEFAULT_START_US,
+                  span_days: int = DEFAULT_SPAN_DAYS, password: str = DEFAULT_PASSWORD,
+                  pin: str = DEFAULT_PIN, seed_admin: bool = True) -> dict:
+    """
+    Build a synthetic bank in a new database file
+    Args:
+        db_path: Database file to create; DB_PATH is pointed at it
+        users: Number of users, each with one savings account
+        transactions: Number of journal entries after the opening deposits
+        seed: Seed of the generator; equal seeds give identical databases
+        zipf_s: Skew of account activity (larger is more concentrated)
+        password: Password of every generated user (hashed once)
+        pin: PIN of every generated lock (hashed once)
+    Returns:
+        dict: Row counts, money totals and build time
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    database.DB_PATH = Path(db_path)
+    database.initialize_database(seed_admin=seed_admin)
+    password_hash = hash_secret(password)
+    pin_hash = hash_secret(pin)
+    step_us = max(1, span_days * 86_400_000_000 // max(1, users + transactions))
+    now_us = start_us
+
+    with database.get_db_connection() as conn:
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA cache_size = -262144")
+        cursor = conn.cursor()
+        database.drop_journal_indexes(cursor)
+
+        cursor.executemany(
+            "INSERT INTO users (username, password, full_name, email) VALUES (?, ?, ?, ?)",
+            ((f"user{i}", password_hash, f"User {i}", f"user{i}@example.com") for i in range(users))
+        )
+        cursor.execute("SELECT id FROM users WHERE role = 'user' ORDER BY id")
+        user_ids = [row[0] for row in cursor.fetchall()]
+        cursor.executemany(
+            "INSERT INTO accounts (user_id, account_number, balance) VALUES (?, ?, 0)",
+            ((user_id, generate_account_number(user_id)) for user_id in user_ids)
+        )
+        cursor.execute("SELECT id, account_number FROM accounts ORDER BY id")
+        accounts = cursor.fetchall()
+        account_ids = [row[0] for row in accounts]
+        numbers = {row[0]: row[1] for row in accounts}
+        balances = dict.fromkeys(account_ids, 0)
+        deposited = withdrawn = locked = 0
+
+        # Opening deposits
+        entries = []
+        for account_id in account_ids:
+            cents = _amount_cents(rng, 50_000)
+            balances[account_id] += cents
+            deposited += cents
+            entries.append(("deposit", cents / 100, None, account_id, "Opening deposit", None,
+                            now_us, now_us, generate_ulid(now_us, rng.getrandbits(70))))
+            now_us += step_us
+        cursor.executemany(ENTRY_SQL, entries)
+
+        sampler = ZipfSampler(account_ids, zipf_s, random.Random(seed + 1))
+        types = [name for name, _ in TYPE_MIX]
+        type_weights = list(itertools.accumulate(weight for _, weight in TYPE_MIX))
+        counts = dict.fromkeys(types, 0)
+        lock_count = 0
+        remaining = transactions
+        while remaining > 0:
+            size = min(CHUNK_SIZE, remaining)
+            remaining -= size
+            entries, locks = [], []
+            for kind, account_id in zip(rng.choices(types, cum_weights=type_weights, k=size),
+                                        sampler.samples(size)):
+                cents = _amount_cents(rng)
+                txn_ref = generate_ulid(now_us, rng.getrandbits(70))
+                if kind != "deposit" and balances[account_id] < cents:
+                    kind = "deposit"
+                if kind == "transfer":
+                    receiver_id = sampler.sample()
+                    if receiver_id == account_id:
+                        kind = "deposit"
+                if kind == "deposit":
+                    balances[account_id] += cents
+                    deposited += cents
+                    entries.append(("deposit", cents / 100, None, account_id, "Deposit", None,
+                                    now_us, now_us, txn_ref))
+                elif kind == "withdraw":
+                    balances[account_id] -= cents
+                    withdrawn += cents
+                    entries.append(("withdraw", cents / 100, account_id, None, "Withdrawal", None,
+                                    now_us, now_us, txn_ref))
+                elif kind == "transfer":
+                    balances[account_id] -= cents
+                    balances[receiver_id] += cents
+                    entries.append(("transfer", cents / 100, account_id, receiver_id, None,
+                                    numbers[receiver_id], now_us, now_us, txn_ref))
+                else:
+                    balances[account_id] -= cents
+                    locked += cents
+                    lock_count += 1
+                    entries.append(("lock", cents / 100, account_id, None, "Funds locked", None,
+                                    now_us, now_us, txn_ref))
+                    locks.append((account_id, f"{cents / 100:.2f}", pin_hash, "Funds locked", now_us))
+                counts[kind] += 1
+                now_us += step_us
+            cursor.executemany(ENTRY_SQL, entries)
+            cursor.executemany(LOCK_SQL, locks)
+
+        cursor.executemany(
+            "UPDATE accounts SET balance = ? WHERE id = ?",
+            ((cents / 100, account_id) for account_id, cents in balances.items())
+        )
+        conn.commit()
+        database.create_journal_indexes(cursor)
+        cursor.execute("ANALYZE")
+        conn.commit()
+
+    seconds = time.perf_counter() - started
+    total_rows = users + transactions
+    return {
+        "users": users,
+        "accounts": len(account_ids),
+        "entries": total_rows,
+        "by_type": counts,
+        "locks": lock_count,
+        "deposited": deposited / 100,
+        "withdrawn": withdrawn / 100,
+        "locked": locked / 100,
+        "seed": seed,
+        "zipf_s": zipf_s,
+        "seconds": round(seconds, 2),
+        "rows_per_sec": round(total_rows / seconds) if seconds else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("db_path", type=Path)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of account activity")
+    args = parser.parse_args()
+
+    if args.db_path.exists():
+        parser.error(f"{args.db_path} already exists")
+    print(generate_bank(args.db_path, args.users, args.transactions, args.seed, args.zipf))
+
+if __name__ == "__main__":
+    main()
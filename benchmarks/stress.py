@@ -0,0 +1,241 @@
+"""
+Multi-process concurrency stress test with money-conservation checks
+
+Usage:
+    python -m benchmarks.stress --workers 8 --ops 2000 --hot-accounts 4 --hot-share 0.5
+
+Generates a bank with benchmarks.datagen, then starts --workers processes that
+each run a random mix of deposit, withdraw, transfer_funds, lock_funds and
+unlock_funds against the same database file. With probability --hot-share an
+operation targets one of the --hot-accounts busiest accounts, otherwise any
+account, so writers collide both on the database lock and on the same rows.
+
+Reports throughput, latency and outcome rates per operation, plus the time
+spent waiting for the write lock (BEGIN IMMEDIATE, measured with query
+tracing). Afterwards the ledger is reconciled (src.reconcile) and the money
+deposited and withdrawn according to the workers' successful results is
+checked against the journal. Any violation makes the exit status 1.
+"""
+import argparse
+import json
+import multiprocessing
+import queue
+import random
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.datagen import DEFAULT_PIN, ZipfSampler, generate_bank
+from src import database, hashing, query_trace, transactions
+from src.histogram import Histogram
+from src.metrics import classify
+from src.reconcile import TOLERANCE, check_ledger
+
+OPERATIONS = ("deposit", "withdraw", "transfer_funds", "lock_funds", "unlock_funds")
+DEFAULT_MIX = {"deposit": 0.15, "withdraw": 0.15, "transfer_funds": 0.5, "lock_funds": 0.1, "unlock_funds": 0.1}
+LOCK_WAIT_SQL = "BEGIN IMMEDIATE"
+
+def _worker(db_path: Path, index: int, ops: int, duration: float, seed: int, hot_ids: List[int],
+            all_ids: List[int], hot_share: float, mix: Dict[str, float], cost: int, start_at: float,
+            results) -> None:
+    database.DB_PATH = db_path
+    hashing.set_work_factor(cost)
+    hashing.set_workers(1)
+    query_trace.enable(slow_query_ms=float("inf"))
+    rng = random.Random(seed * 1000 + index)
+    with database.get_db_connection() as conn:
+        numbers = dict(conn.execute("SELECT id, account_number FROM accounts").fetchall())
+
+    def pick() -> int:
+        return rng.choice(hot_ids) if rng.random() < hot_share else rng.choice(all_ids)
+
+    operations = list(mix)
+    weights = [mix[name] for name in operations]
+    latencies = {name: Histogram() for name in OPERATIONS}
+    outcomes: Dict[str, Dict[str, int]] = {name: {} for name in OPERATIONS}
+    deposited = withdrawn = Decimal("0")
+    done = 0
+
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = time.perf_counter() + duration if duration else None
+    started = time.perf_counter()
+    while (done < ops) if deadline is None else (time.perf_counter() < deadline):
+        name = rng.choices(operations, weights)[0]
+        account_id = pick()
+        amount = Decimal(rng.randint(100, 500_000)) / 100
+        begin = time.perf_counter()
+        if name == "deposit":
+            result = transactions.deposit(account_id, amount, "stress")
+        elif name == "withdraw":
+            result = transactions.withdraw(account_id, amount, "stress")
+        elif name == "transfer_funds":
+            receiver_id = pick()
+            while receiver_id == account_id:
+                receiver_id = rng.choice(all_ids)
+            result = transactions.transfer_funds(account_id, numbers[receiver_id], amount, "stress")
+        elif name == "lock_funds":
+            result = transactions.lock_funds(account_id, amount, DEFAULT_PIN, "stress")
+        else:
+            with database.get_db_connection() as conn:
+                lock = conn.execute(
+                    "SELECT id FROM locked_funds WHERE account_id = ? AND is_unlocked = 0 ORDER BY id LIMIT 1",
+                    (account_id,)
+                ).fetchone()
+            result = (
+                transactions.unlock_funds(lock[0], account_id, DEFAULT_PIN)
+                if lock else (False, "Locked funds not found or already unlocked")
+            )
+        latencies[name].record((time.perf_counter() - begin) * 1_000_000)
+        outcome = classify(result)
+        outcomes[name][outcome] = outcomes[name].get(outcome, 0) + 1
+        if outcome == "success":
+            if name == "deposit":
+                deposited += amount
+            elif name == "withdraw":
+                withdrawn += amount
+        done += 1
+
+    lock_wait = query_trace.statement_histograms().get(LOCK_WAIT_SQL, Histogram())
+    hashing.shutdown()
+    results.put({
+        "ops": done,
+        "seconds": time.perf_counter() - started,
+        "latencies": {name: histogram.to_dict() for name, histogram in latencies.items()},
+        "outcomes": outcomes,
+        "lock_wait": lock_wait.to_dict(),
+        "deposited": str(deposited),
+        "withdrawn": str(withdrawn),
+    })
+
+def run_stress(db_path: Path, workers: int = 4, ops: int = 500, duration: float = 0, seed: int = 42,
+               hot_accounts: int = 4, hot_share: float = 0.5, mix: Dict[str, float] = None,
+               cost: int = 4, opening: dict = None) -> dict:
+    """
+    Run the workers against an already generated database and check the ledger afterwards
+    Args:
+        db_path: Database built by benchmarks.datagen.generate_bank
+        workers: Number of worker processes
+        ops: Operations per worker (ignored when duration is set)
+        duration: Seconds each worker runs for instead of a fixed operation count
+        hot_accounts: Size of the hot set, taken from the Zipf ranking of the generator
+        hot_share: Probability that an operation targets the hot set
+        mix: Relative weight of each operation (DEFAULT_MIX by default)
+        cost: bcrypt work factor used for PINs
+        opening: Result of generate_bank, whose totals the journal must still contain
+    Returns:
+        dict: Throughput, per-operation latency and outcome rates, lock wait, and violations
+    """
+    database.DB_PATH = Path(db_path)
+    with database.get_db_connection() as conn:
+        all_ids = [row[0] for row in conn.execute("SELECT id FROM accounts ORDER BY id")]
+    hot_ids = ZipfSampler(all_ids, rng=random.Random(seed + 1)).hottest(hot_accounts)
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    start_at = time.time() + 1.0 + workers * 0.2
+    processes = [
+        context.Process(
+            target=_worker,
+            args=(database.DB_PATH, index, ops, duration, seed, hot_ids, all_ids, hot_share,
+                  mix or DEFAULT_MIX, cost, start_at, results)
+        )
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    reports = []
+    while len(reports) < len(processes):
+        try:
+            reports.append(results.get(timeout=1))
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                raise RuntimeError("A stress worker exited without reporting")
+    for process in processes:
+        process.join()
+    wall = max(report["seconds"] for report in reports)
+
+    latencies = {name: Histogram() for name in OPERATIONS}
+    outcomes: Dict[str, Dict[str, int]] = {name: {} for name in OPERATIONS}
+    lock_wait = Histogram()
+    deposited = withdrawn = Decimal("0")
+    for report in reports:
+        for name in OPERATIONS:
+            latencies[name].merge(Histogram.from_dict(report["latencies"][name]))
+            for outcome, count in report["outcomes"][name].items():
+                outcomes[name][outcome] = outcomes[name].get(outcome, 0) + count
+        lock_wait.merge(Histogram.from_dict(report["lock_wait"]))
+        deposited += Decimal(report["deposited"])
+        withdrawn += Decimal(report["withdrawn"])
+
+    ledger = check_ledger()
+    violations = list(ledger["violations"])
+    if opening is not None:
+        expected_deposited = Decimal(str(opening["deposited"])) + deposited
+        expected_withdrawn = Decimal(str(opening["withdrawn"])) + withdrawn
+        if abs(ledger["deposited"] - expected_deposited) >= TOLERANCE:
+            violations.append(
+                f"Journal deposits {ledger['deposited']} differ from successful deposits {expected_deposited}"
+            )
+        if abs(ledger["withdrawn"] - expected_withdrawn) >= TOLERANCE:
+            violations.append(
+                f"Journal withdrawals {ledger['withdrawn']} differ from successful withdrawals {expected_withdrawn}"
+            )
+
+    total_ops = sum(report["ops"] for report in reports)
+    per_operation = {}
+    for name in OPERATIONS:
+        calls = sum(outcomes[name].values())
+        if not calls:
+            continue
+        per_operation[name] = dict(
+            latencies[name].summary(),
+            rates={outcome: round(count / calls, 4) for outcome, count in sorted(outcomes[name].items())},
+        )
+    errors = sum(outcomes[name].get("db_error", 0) for name in OPERATIONS)
+    return {
+        "workers": workers,
+        "ops": total_ops,
+        "seconds": round(wall, 2),
+        "throughput": round(total_ops / wall, 1) if wall else None,
+        "db_error_rate": round(errors / total_ops, 4) if total_ops else 0.0,
+        "lock_wait_us": lock_wait.summary(),
+        "operations": per_operation,
+        "ledger": {key: str(value) for key, value in ledger.items() if key != "violations"},
+        "violations": violations,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=500, help="operations per worker")
+    parser.add_argument("--duration", type=float, default=0, help="seconds per worker instead of --ops")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--hot-accounts", type=int, default=4)
+    parser.add_argument("--hot-share", type=float, default=0.5)
+    parser.add_argument("--cost", type=int, default=4, help="bcrypt work factor for PINs")
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    args = parser.parse_args()
+
+    hashing.set_work_factor(args.cost)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "stress.db"
+        opening = generate_bank(db_path, args.users, args.transactions, args.seed)
+        hashing.shutdown()
+        report = run_stress(db_path, args.workers, args.ops, args.duration, args.seed,
+                            args.hot_accounts, args.hot_share, cost=args.cost, opening=opening)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if report["violations"]:
+        print(f"{len(report['violations'])} invariant violation(s)", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Benchmark suite for the ledger, auth and admin operations
+
+Usage:
+    python -m benchmarks.suite --users 10000 --transactions 1000000 --output results.json
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json
+
+Builds a synthetic bank with benchmarks.datagen (or reuses one given with
+--db; --in-memory runs on an in-memory copy of it), then times each operation
+against accounts drawn from the same Zipf distribution as the generated
+traffic. Throughput and latency percentiles are
+printed and written as JSON. With --baseline the run is compared against a
+stored result and the exit status is 1 if any benchmark's p95 latency grew, or
+its throughput fell, by more than --tolerance.
+
+benchmarks/baseline.json was recorded with the default parameters (2000 users,
+200000 transactions, seed 42, zipf 1.1, 1000 ops, cost 4). Timings depend on the
+machine, so regenerate it on the machine that will run the comparison with
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+and commit the result together with the change that moved the numbers.
+"""
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from benchmarks.datagen import DEFAULT_PASSWORD, DEFAULT_PIN, ZipfSampler, generate_bank
+from src import account_cache, admin, auth, database, hashing, transactions
+from src.histogram import Histogram
+
+DEFAULT_TOLERANCE = 0.25
+
+class Context:
+    """Generated bank and the samplers the benchmarks draw their arguments from"""
+    def __init__(self, seed: int, zipf_s: float):
+        with database.get_db_connection() as conn:
+            accounts = conn.execute(
+                "SELECT a.id, a.account_number, u.id, u.username FROM accounts a JOIN users u ON u.id = a.user_id"
+            ).fetchall()
+        self.numbers = {row[0]: row[1] for row in accounts}
+        self.user_of = {row[0]: (row[2], row[3]) for row in accounts}
+        self.sampler = ZipfSampler(list(self.numbers), zipf_s, random.Random(seed + 1))
+
+    def account(self) -> int:
+        return self.sampler.sample()
+
+    def other_account(self, account_id: int) -> int:
+        while True:
+            other = self.sampler.sample()
+            if other != account_id:
+                return other
+
+def _posting(ctx: Context, name: str) -> Callable[[], None]:
+    def run():
+        account_id = ctx.account()
+        if name == "deposit":
+            transactions.deposit(account_id, Decimal("10.00"), "bench")
+        elif name == "withdraw":
+            transactions.withdraw(account_id, Decimal("1.00"), "bench")
+        elif name == "transfer_funds":
+            transactions.transfer_funds(account_id, ctx.numbers[ctx.other_account(account_id)], Decimal("1.00"), "bench")
+        elif name == "lock_funds":
+            transactions.lock_funds(account_id, Decimal("1.00"), DEFAULT_PIN, "bench")
+    return run
+
+def _open_locks(ops: int) -> list:
+    with database.get_db_connection() as conn:
+        return conn.execute(
+            "SELECT id, account_id FROM locked_funds WHERE is_unlocked = 0 ORDER BY id LIMIT ?", (ops,)
+        ).fetchall()
+
+def _unlock(ctx: Context, ops: int) -> Callable[[], None]:
+    locks = _open_locks(ops)
+    # The generated bank (or an earlier lock_funds run) may not hold enough open
+    # locks, so lock more before timing rather than running out mid-benchmark
+    missing = ops - len(locks)
+    for _ in range(missing * 10):
+        if missing <= 0:
+            break
+        success, _message = transactions.lock_funds(ctx.account(), Decimal("1.00"), DEFAULT_PIN, "bench")
+        missing -= success
+    locks = _open_locks(ops)
+    if len(locks) < ops:
+        raise RuntimeError(f"unlock_funds needs {ops} open locks but only {len(locks)} could be created")
+    pending = iter(locks)
+    def run():
+        lock_id, account_id = next(pending)
+        transactions.unlock_funds(lock_id, account_id, DEFAULT_PIN)
+    return run
+
+def _block_toggle(ctx: Context, ops: int) -> Callable[[], None]:
+    def run():
+        account_id = ctx.account()
+        admin.block_unblock_account(account_id, True)
+        admin.block_unblock_account(account_id, False)
+    return run
+
+# name: (build(ctx, ops) -> one-operation callable, share of --ops to run)
+BENCHMARKS: Dict[str, tuple] = {
+    "deposit": (lambda ctx, ops: _posting(ctx, "deposit"), 1.0),
+    "withdraw": (lambda ctx, ops: _posting(ctx, "withdraw"), 1.0),
+    "transfer_funds": (lambda ctx, ops: _posting(ctx, "transfer_funds"), 1.0),
+    "lock_funds": (lambda ctx, ops: _posting(ctx, "lock_funds"), 0.5),
+    "unlock_funds": (_unlock, 0.5),
+    "get_account_balance": (lambda ctx, ops: lambda: transactions.get_account_balance(ctx.account()), 1.0),
+    "get_account_transactions": (
+        lambda ctx, ops: lambda: transactions.get_account_transactions(ctx.account(), limit=50), 1.0),
+    "get_account_transactions_unbounded": (
+        lambda ctx, ops: lambda: transactions.get_account_transactions(ctx.account()), 0.1),
+    "get_account_snapshot": (lambda ctx, ops: lambda: transactions.get_account_snapshot(ctx.account()), 1.0),
+    "read_account_state_uncached": (
+        lambda ctx, ops: lambda: account_cache.read_account_state(ctx.account()), 1.0),
+    "get_locked_funds": (lambda ctx, ops: lambda: transactions.get_locked_funds(ctx.account()), 1.0),
+    "authenticate_user": (
+        lambda ctx, ops: lambda: auth.authenticate_user(ctx.user_of[ctx.account()][1], DEFAULT_PASSWORD)[0], 0.2),
+    "get_user_accounts": (lambda ctx, ops: lambda: admin.get_user_accounts(ctx.user_of[ctx.account()][0]), 1.0),
+    "get_all_users": (lambda ctx, ops: admin.get_all_users, 0.02),
+    "get_all_transactions": (lambda ctx, ops: lambda: admin.get_all_transactions(limit=50), 0.2),
+    "get_transactions_with_user_details": (
+        lambda ctx, ops: lambda: admin.get_transactions_with_user_details(limit=50), 0.2),
+    "block_unblock_account": (_block_toggle, 0.5),
+}
+
+def run_benchmark(ctx: Context, name: str, ops: int, warmup: int = 5) -> dict:
+    """Time ops calls of one benchmark; latencies in microseconds"""
+    build, share = BENCHMARKS[name]
+    ops = max(5, int(ops * share))
+    operation = build(ctx, ops + warmup)
+    for _ in range(warmup):
+        operation()
+    histogram = Histogram()
+    started = time.perf_counter()
+    for _ in range(ops):
+        begin = time.perf_counter()
+        operation()
+        histogram.record((time.perf_counter() - begin) * 1_000_000)
+    seconds = time.perf_counter() - started
+    summary = histogram.summary()
+    return {
+        "ops": ops,
+        "seconds": round(seconds, 4),
+        "throughput": round(ops / seconds, 1) if seconds else None,
+        "mean_us": summary["mean"],
+        "p50_us": summary["p50"],
+        "p95_us": summary["p95"],
+        "p99_us": summary["p99"],
+        "max_us": summary["max"],
+    }
+
+def compare(results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    Compare a run against a baseline run
+    Returns:
+        List[str]: One line per benchmark whose p95 latency rose, or throughput fell,
+        by more than tolerance (a fraction); benchmarks missing from either side are skipped
+    """
+    regressions = []
+    for name, base in baseline.get("results", {}).items():
+        current = results.get("results", {}).get(name)
+        if current is None:
+            continue
+        if base["p95_us"] and current["p95_us"] > base["p95_us"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_us']} -> {current['p95_us']} us")
+        if base["throughput"] and current["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput']} -> {current['throughput']} ops/s")
+    return regressions
+
+def _meta(args, build: dict) -> dict:
+    return {
+        "users": args.users,
+        "transactions": args.transactions,
+        "seed": args.seed,
+        "zipf_s": args.zipf,
+        "ops": args.ops,
+        "bcrypt_rounds": hashing.BCRYPT_ROUNDS,
+        "build": build,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+def _print_table(results: dict) -> None:
+    print(f"{'benchmark':<36} {'ops':>6} {'ops/s':>10} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9}")
+    for name, r in results["results"].items():
+        print(f"{name:<36} {r['ops']:>6} {r['throughput']:>10} {r['p50_us']:>9} {r['p95_us']:>9} {r['p99_us']:>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--transactions", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--ops", type=int, default=1000, help="calls per benchmark (scaled down for heavy ones)")
+    parser.add_argument("--cost", type=int, default=4, help="bcrypt work factor for passwords and PINs")
+    parser.add_argument("--db", type=Path, help="generated database to copy instead of building one")
+    parser.add_argument("--in-memory", action="store_true",
+                        help="run against an in-memory copy of the database")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run these benchmarks only")
+    parser.add_argument("--output", type=Path, help="write results JSON here")
+    parser.add_argument("--baseline", type=Path, help="compare against this results JSON")
+    parser.add_argument("--save-baseline", type=Path, help="also write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    hashing.set_work_factor(args.cost)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        if args.db:
+            # Benchmarks write, so work on a copy of the given database (with its write-ahead log)
+            database.copy_database(args.db, db_path)
+            database.DB_PATH = db_path
+            with database.get_db_connection() as conn:
+                build = {
+                    "source": str(args.db),
+                    "users": conn.execute("SELECT COUNT(*) FROM users WHERE role = 'user'").fetchone()[0],
+                    "entries": conn.execute("SELECT COUNT(*) FROM journal_entries").fetchone()[0],
+                }
+        else:
+            build = generate_bank(db_path, args.users, args.transactions, args.seed, args.zipf)
+            print(f"Generated {build['entries']} entries in {build['seconds']} s ({build['rows_per_sec']} rows/s)")
+
+        if args.in_memory:
+            memory_uri = "file:/bench?vfs=memdb"
+            database.copy_database(db_path, memory_uri)
+            database.set_db_path(memory_uri)
+            build["in_memory"] = True
+
+        ctx = Context(args.seed, args.zipf)
+        results = {"meta": _meta(args, build), "results": {}}
+        for name in args.only or BENCHMARKS:
+            results["results"][name] = run_benchmark(ctx, name, args.ops)
+        auth.wait_for_rehashes()
+        account_cache.clear()
+        database.release_memory_database()
+    hashing.shutdown()
+
+    _print_table(results)
+    for path in (args.output, args.save_baseline):
+        if path:
+            path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        base_meta = baseline.get("meta", {})
+        for key in ("users", "transactions", "seed", "zipf_s", "bcrypt_rounds"):
+            if base_meta.get(key) != results["meta"][key]:
+                print(f"Warning: baseline {key}={base_meta.get(key)} differs from this run ({results['meta'][key]})")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressions beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
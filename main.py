@@ -1,19 +1,22 @@
-import tkinter as tk
-from tkinter import messagebox
-import ttkbootstrap as ttk
-from ttkbootstrap.constants import *
-from src.database import initialize_database
-from ui.login import LoginFrame
-from ui.register import RegisterFrame
-from ui.dashboard import UserDashboard
-from ui.admin import AdminDashboard
+from src import startup
+
+with startup.phase("import ui toolkit"):
+    import tkinter as tk
+    from tkinter import messagebox
+    import ttkbootstrap as ttk
+    from ttkbootstrap.constants import *
+with startup.phase("import login"):
+    from src.database import initialize_database
+    from ui.login import LoginFrame
 
 class BankApp(ttk.Window):
     def __init__(self):
-        super().__init__(themename="litera")
+        with startup.phase("create window"):
+            super().__init__(themename="litera")
         self.title("RRM Bank - Secure Banking")
         self.attributes('-fullscreen', True)
-        initialize_database()
+        with startup.phase("initialize database"):
+            initialize_database()
         self.update_idletasks()
         
         self.container = ttk.Frame(self, bootstyle="light")
@@ -78,7 +81,13 @@ class BankApp(ttk.Window):
                 foreground="gray"
             ).pack(pady=8)
         
-        self.show_login()
+        with startup.phase("build login screen"):
+            self.show_login()
+        self.after_idle(self._on_first_paint)
+    
+    def _on_first_paint(self):
+        startup.mark("login screen visible")
+        startup.print_report()
     
     def show_login(self):
         for widget in self.content_frame.winfo_children():
@@ -92,6 +101,7 @@ class BankApp(ttk.Window):
         self.login_frame.pack(expand=True, fill=BOTH)
     
     def show_register(self):
+        from ui.register import RegisterFrame
         for widget in self.content_frame.winfo_children():
             widget.destroy()
         
@@ -103,6 +113,9 @@ class BankApp(ttk.Window):
         self.register_frame.pack(expand=True, fill=BOTH)
     
     def handle_login_success(self, user):
+        # Dashboards are imported on first use to keep them off the startup path
+        from ui.admin import AdminDashboard
+        from ui.dashboard import UserDashboard
         for widget in self.content_frame.winfo_children():
             widget.destroy()
         
@@ -0,0 +1,245 @@
+"""
+Write-through LRU cache of per-account read state
+
+Each entry holds an account's balance, its HISTORY_SIZE most recent postings
+and its active locks. Entries are filled on a miss from one read transaction
+and refreshed by the posting functions right after they commit.
+
+Staleness is detected without polling the data itself: a long-lived watcher
+connection per database reads PRAGMA data_version, which changes whenever any
+other connection (in this or another process) commits. Only then are the
+journal entries written since the last check scanned, and cached accounts they
+touch are dropped unless the entry already reflects them. Every change to a
+balance, history or lock goes through the journal, so this is exact.
+"""
+from collections import OrderedDict
+from decimal import Decimal
+import sqlite3
+from typing import List, Optional
+from src import archive
+from src.database import get_db_connection
+from src.journal import ACCOUNT_POSTINGS_SQL, MAX_TIMESTAMP_US, MIN_TIMESTAMP_US, account_postings_sql, posting_from_row
+from src.models import Transaction
+from src.sharding import TOTAL_BALANCE_SQL
+from src.watched_cache import WatchedCache, WatchedStore
+
+CACHE_SIZE = 1024
+HISTORY_SIZE = 50
+
+ACTIVE_LOCKS_SQL = """
+    SELECT id, amount, description, created_at
+    FROM locked_funds
+    WHERE account_id = ? AND is_unlocked = 0
+    ORDER BY created_at DESC, id DESC
+"""
+
+class AccountEntry:
+    def __init__(self, balance: Decimal, history: List[Transaction], locks: List[dict], as_of: int):
+        self.balance = balance
+        self.history = history
+        self.locks = locks
+        # Highest journal entry id this entry is known to reflect
+        self.as_of = as_of
+
+class _Store(WatchedStore):
+    """Cached entries and change tracking for one database file"""
+    def __init__(self, stats):
+        super().__init__(stats)
+        self.entries: "OrderedDict[int, AccountEntry]" = OrderedDict()
+        # Every surviving entry is exact at least up to this journal entry id
+        self.checked_through = _max_entry_id(self.watcher.cursor())
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def validate(self) -> None:
+        if not self.changed():
+            return
+        rows = self.watcher.execute(
+            """SELECT id, debit_account_id, credit_account_id FROM journal_entries
+            WHERE id > ? ORDER BY id""",
+            (self.checked_through,)
+        ).fetchall()
+        for entry_id, debit_id, credit_id in rows:
+            for account_id in (debit_id, credit_id):
+                entry = self.entries.get(account_id)
+                if entry is not None and entry.as_of < entry_id:
+                    del self.entries[account_id]
+                    self.stats["invalidations"] += 1
+            self.checked_through = entry_id
+
+    def effective_as_of(self, entry: AccountEntry) -> int:
+        return max(entry.as_of, self.checked_through)
+
+def _max_entry_id(cursor: sqlite3.Cursor) -> int:
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM journal_entries")
+    return cursor.fetchone()[0]
+
+_cache = WatchedCache(_Store, "entries")
+_stats = _cache.stats
+clear = _cache.clear
+cache_stats = _cache.cache_stats
+reset_stats = _cache.reset_stats
+
+def _load_locks(cursor: sqlite3.Cursor, account_id: int) -> List[dict]:
+    cursor.execute(ACTIVE_LOCKS_SQL, (account_id,))
+    columns = [col[0] for col in cursor.description]
+    locks = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    for lock in locks:
+        lock["amount"] = Decimal(lock["amount"])
+    return locks
+
+def _load_balance(cursor: sqlite3.Cursor, account_id: int) -> Optional[Decimal]:
+    cursor.execute(f"SELECT {TOTAL_BALANCE_SQL} AS balance FROM accounts a WHERE a.id = ?", (account_id,))
+    row = cursor.fetchone()
+    return Decimal(row["balance"]) if row else None
+
+def _load_postings(cursor: sqlite3.Cursor, account_id: int, limit: int,
+                   start_us: int = MIN_TIMESTAMP_US, end_us: int = MAX_TIMESTAMP_US) -> List[Transaction]:
+    cursor.execute(
+        account_postings_sql() + " ORDER BY created_at_us DESC, id DESC LIMIT :limit",
+        {"account_id": account_id, "start_us": start_us, "end_us": end_us, "limit": limit}
+    )
+    return [posting_from_row(row) for row in cursor.fetchall()]
+
+def read_account_state(account_id: int, history_limit: int = HISTORY_SIZE) -> Optional[AccountEntry]:
+    """Read balance, recent history and active locks from one consistent read transaction"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        try:
+            balance = _load_balance(cursor, account_id)
+            if balance is None:
+                return None
+            entry = AccountEntry(
+                balance,
+                _load_postings(cursor, account_id, history_limit),
+                _load_locks(cursor, account_id),
+                _max_entry_id(cursor)
+            )
+            short = len(entry.history) < history_limit and archive.has_archives(cursor)
+        finally:
+            conn.rollback()
+    if short:
+        # Archived entries are immutable, so reading them after the transaction is still consistent
+        entry.history += [
+            posting_from_row(row) for row in archive.read_archived(
+                ACCOUNT_POSTINGS_SQL,
+                {"account_id": account_id, "start_us": MIN_TIMESTAMP_US, "end_us": MAX_TIMESTAMP_US},
+                history_limit - len(entry.history), exclude_ids=[txn.id for txn in entry.history]
+            )
+        ]
+    return entry
+
+def get_entry(account_id: int) -> Optional[AccountEntry]:
+    """
+    Return the cached state of an account, loading it on a miss
+    Args:
+        account_id: The account ID
+    Returns:
+        AccountEntry: Balance, recent history and active locks, or None if the
+        account does not exist, the cache is disabled or the database errored
+    """
+    if CACHE_SIZE <= 0:
+        return None
+    try:
+        with _cache.lock:
+            store = _cache.get_store()
+            store.validate()
+            entry = store.entries.get(account_id)
+            if entry is not None:
+                store.entries.move_to_end(account_id)
+                _stats["hits"] += 1
+                return entry
+            _stats["misses"] += 1
+
+        entry = read_account_state(account_id)
+        if entry is None:
+            return None
+        with _cache.lock:
+            # A fill older than the last validation may have missed entries it skipped
+            if entry.as_of >= store.checked_through and account_id not in store.entries:
+                store.entries[account_id] = entry
+                while len(store.entries) > CACHE_SIZE:
+                    store.entries.popitem(last=False)
+                    _stats["evictions"] += 1
+        return entry
+    except sqlite3.Error as e:
+        print(f"Account cache error for account ID {account_id}: {e}")
+        return None
+
+def record_posting(entry_id: int, *account_ids: Optional[int]) -> None:
+    """
+    Refresh cached accounts touched by a journal entry that has just committed
+    Called by the posting functions after commit. Accounts that are not cached
+    are left alone; if another writer touched a cached account in between, the
+    entry is dropped instead of patched.
+    Args:
+        entry_id: ID of the committed journal entry
+        *account_ids: Accounts the entry debited or credited
+    """
+    with _cache.lock:
+        store = _cache.current_store()
+        if store is None:
+            return
+        targets = {
+            account_id: (store.entries[account_id], store.effective_as_of(store.entries[account_id]))
+            for account_id in account_ids if account_id in store.entries
+        }
+    if not targets:
+        return
+
+    updates = {}
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            cursor.execute("SELECT type, created_at_us FROM journal_entries WHERE id = ?", (entry_id,))
+            row = cursor.fetchone()
+            for account_id, (entry, as_of) in targets.items():
+                cursor.execute(
+                    """SELECT 1 FROM journal_entries
+                    WHERE id > ? AND id < ? AND (debit_account_id = ? OR credit_account_id = ?)
+                    LIMIT 1""",
+                    (as_of, entry_id, account_id, account_id)
+                )
+                if row is None or cursor.fetchone():
+                    updates[account_id] = None
+                    continue
+                postings = [
+                    posting for posting in _load_postings(
+                        cursor, account_id, HISTORY_SIZE, row["created_at_us"], row["created_at_us"] + 1
+                    )
+                    if posting.id == entry_id
+                ]
+                locks = _load_locks(cursor, account_id) if row["type"] in ("lock", "unlock") else None
+                updates[account_id] = (_load_balance(cursor, account_id), postings, locks)
+            conn.rollback()
+    except sqlite3.Error as e:
+        print(f"Account cache refresh error for entry {entry_id}: {e}")
+        updates = dict.fromkeys(targets)
+
+    with _cache.lock:
+        for account_id, update in updates.items():
+            entry, as_of = targets[account_id]
+            if store.entries.get(account_id) is not entry:
+                continue
+            if update is None or entry.as_of > as_of or update[0] is None:
+                del store.entries[account_id]
+                _stats["invalidations"] += 1
+                continue
+            balance, postings, locks = update
+            entry.balance = balance
+            entry.history = sorted(
+                postings + entry.history, key=lambda txn: (txn.created_at_us, txn.id), reverse=True
+            )[:HISTORY_SIZE]
+            if locks is not None:
+                entry.locks = locks
+            entry.as_of = entry_id
+
+def invalidate(account_id: int) -> None:
+    """Drop one account from the cache of the current database"""
+    with _cache.lock:
+        store = _cache.current_store()
+        if store is not None and store.entries.pop(account_id, None) is not None:
+            _stats["invalidations"] += 1
@@ -1,7 +1,16 @@
-from typing import List
+import json
+import re
+import sqlite3
+from decimal import Decimal
+from typing import List, Optional, Sequence, Tuple
+from src import archive, page_cache
 from src.database import get_db_connection
+from src.metrics import instrumented
 from src.models import User, Account, Transaction
+from src.session import invalidate_account
+from src.sharding import TOTAL_BALANCE_SQL
 
+@instrumented("get_all_users")
 def get_all_users() -> List[User]:
     """Get all registered users"""
     with get_db_connection() as conn:
@@ -11,52 +20,413 @@ def get_all_users() -> List[User]:
         )
         return [User(**row) for row in cursor.fetchall()]
 
+ALL_TRANSACTIONS_SQL = """
+    SELECT id, COALESCE(debit_account_id, credit_account_id) AS account_id,
+           type, amount, description, reference, status, created_at,
+           CASE WHEN debit_account_id IS NOT NULL THEN credit_account_id END AS counterparty_account_id,
+           created_at_us, txn_ref
+    FROM {schema}journal_entries
+"""
+
+@instrumented("get_all_transactions")
 def get_all_transactions(limit: int = None) -> List[Transaction]:
-    """Get all system transactions"""
+    """Get all system transactions, including archived ones when the limit reaches them"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        query = """SELECT id, account_id, type, amount, description, reference, 
-                  status, created_at FROM transactions 
-                  ORDER BY created_at DESC"""
+        query = ALL_TRANSACTIONS_SQL.format(schema="") + " ORDER BY created_at_us DESC, id DESC"
         if limit is not None:
             query += " LIMIT ?"
             cursor.execute(query, (limit,))
         else:
             cursor.execute(query)
+        rows = cursor.fetchall()
+        if (limit is None or len(rows) < limit) and archive.has_archives(cursor):
+            rows += archive.read_archived(
+                ALL_TRANSACTIONS_SQL, {}, None if limit is None else limit - len(rows),
+                exclude_ids=[row["id"] for row in rows]
+            )
+        return [Transaction(**row) for row in rows]
+
+SEARCH_TRANSACTIONS_SQL = """
+    SELECT j.id, COALESCE(j.debit_account_id, j.credit_account_id) AS account_id,
+           j.type, j.amount, j.description, j.reference, j.status, j.created_at,
+           CASE WHEN j.debit_account_id IS NOT NULL THEN j.credit_account_id END AS counterparty_account_id,
+           j.created_at_us, j.txn_ref
+    FROM journal_search s
+    JOIN journal_entries j ON j.id = s.rowid
+    WHERE journal_search MATCH ?
+"""
+
+def _match_expression(query: str) -> str:
+    """FTS5 expression matching every word of a free-text query, the last as a prefix"""
+    # Quoting each word keeps FTS5 operators and punctuation in user input literal
+    words = re.findall(r"\w+", query)
+    if not words:
+        return ""
+    return " ".join([f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*'])
+
+@instrumented("search_transactions")
+def search_transactions(query: str, account_id: Optional[int] = None,
+                        date_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+                        limit: int = 50, offset: int = 0) -> List[Transaction]:
+    """
+    Search live transactions by description and reference text, best matches first
+    Args:
+        query: Words to find, e.g. "rent march" or an account number; the last word may be partial
+        account_id: Only entries debiting or crediting this account
+        date_range: (start_us, end_us) bounds on created_at_us, inclusive and exclusive; either may be None
+        limit: Page size
+        offset: Number of results to skip
+    Returns:
+        List[Transaction]: One page of results; archived entries are not searched
+    """
+    expression = _match_expression(query)
+    if not expression:
+        return []
+    sql = SEARCH_TRANSACTIONS_SQL
+    params = [expression]
+    if account_id is not None:
+        sql += " AND (j.debit_account_id = ? OR j.credit_account_id = ?)"
+        params += [account_id, account_id]
+    start_us, end_us = date_range or (None, None)
+    if start_us is not None:
+        sql += " AND j.created_at_us >= ?"
+        params.append(start_us)
+    if end_us is not None:
+        sql += " AND j.created_at_us < ?"
+        params.append(end_us)
+    sql += " ORDER BY s.rank, j.created_at_us DESC, j.id DESC LIMIT ? OFFSET ?"
+    params += [limit, offset]
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+        except sqlite3.OperationalError as e:
+            print(f"Search failed: {e}")
+            return []
+        return [Transaction(**row) for row in cursor.fetchall()]
+
+# Sort keys offered to the admin listings as (column, direction) pairs; each is served by an index
+TRANSACTION_SORTS = {
+    "newest": (("created_at_us", "DESC"), ("id", "DESC")),
+    "oldest": (("created_at_us", "ASC"), ("id", "ASC")),
+    "amount_desc": (("amount", "DESC"), ("id", "DESC")),
+    "amount_asc": (("amount", "ASC"), ("id", "ASC")),
+}
+USER_COLUMNS = ("id", "username", "role", "full_name", "email", "created_at")
+USER_SORTS = {
+    "id": (("id", "ASC"),),
+    "username": (("username", "ASC"),),
+    "newest": (("id", "DESC"),),
+}
+
+# Owner, account and counterparty details of a page of ALL_TRANSACTIONS_SQL rows,
+# joined to the page only so the listing's own query plan is unchanged
+TRANSACTION_DETAILS_SQL = f"""
+    SELECT t.*, a.account_number, {TOTAL_BALANCE_SQL} AS balance, a.is_blocked,
+           u.id AS user_id, u.username, u.full_name, c.account_number AS counterparty_account_number
+    FROM ({{page}}) t
+    LEFT JOIN accounts a ON a.id = t.account_id
+    LEFT JOIN users u ON u.id = a.user_id
+    LEFT JOIN accounts c ON c.id = t.counterparty_account_id
+"""
+USER_ACCOUNTS_SQL = f"""
+    SELECT p.*, a.id AS account_id, a.account_number, {TOTAL_BALANCE_SQL} AS balance,
+           a.account_type, a.is_blocked
+    FROM ({{page}}) p
+    LEFT JOIN accounts a ON a.user_id = p.id
+"""
+
+def _order_by(keys: Sequence[Tuple[str, str]], table: str = "") -> str:
+    return ", ".join(f"{table}{column} {direction}" for column, direction in keys)
+
+def _after(keys: Sequence[Tuple[str, str]], after: Sequence, params: dict, table: str = "") -> str:
+    """Keyset condition selecting the rows that sort after the given key, e.g. (created_at_us, id) < (?, ?)"""
+    if len(after) != len(keys):
+        raise ValueError(f"Page key {tuple(after)!r} does not match the sort columns {[c for c, _ in keys]}")
+    columns = ", ".join(f"{table}{column}" for column, _ in keys)
+    values = []
+    for i, value in enumerate(after):
+        params[f"after{i}"] = value
+        values.append(f":after{i}")
+    # Every sort has one direction throughout, so one row-value comparison serves
+    operator = "<" if keys[0][1] == "DESC" else ">"
+    return f"({columns}) {operator} ({', '.join(values)})"
+
+def _page_key(row, keys: Sequence[Tuple[str, str]]) -> tuple:
+    return tuple(row[column] if isinstance(row, dict) else getattr(row, column) for column, _ in keys)
+
+def transaction_page_key(row, sort: str = "newest") -> tuple:
+    """
+    Sort key of a find_transactions() or find_transaction_details() row
+    Pass the key of a page's last row as `after` to get the next page.
+    """
+    return _page_key(row, TRANSACTION_SORTS[sort])
+
+def user_page_key(user: User, sort: str = "id") -> tuple:
+    """Sort key of a find_users() user; pass the last one of a page as `after` to get the next"""
+    return _page_key(user, USER_SORTS[sort])
+
+def _transactions_page_sql(start_us: Optional[int], end_us: Optional[int], types: Optional[Sequence[str]],
+                           min_amount: Optional[Decimal], max_amount: Optional[Decimal], status: Optional[str],
+                           user_id: Optional[int], blocked: Optional[bool], sort: str,
+                           limit: int, after: Optional[Sequence]) -> Tuple[str, dict]:
+    if sort not in TRANSACTION_SORTS:
+        raise ValueError(f"Unknown sort {sort!r}; expected one of {', '.join(TRANSACTION_SORTS)}")
+    conditions = []
+    params = {"limit": limit}
+    if after is not None:
+        conditions.append(_after(TRANSACTION_SORTS[sort], after, params))
+    if start_us is not None:
+        conditions.append("created_at_us >= :start_us")
+        params["start_us"] = start_us
+    if end_us is not None:
+        conditions.append("created_at_us < :end_us")
+        params["end_us"] = end_us
+    if types:
+        conditions.append("type IN (SELECT value FROM json_each(:types))")
+        params["types"] = json.dumps(list(types))
+    if min_amount is not None:
+        conditions.append("amount >= :min_amount")
+        params["min_amount"] = float(min_amount)
+    if max_amount is not None:
+        conditions.append("amount <= :max_amount")
+        params["max_amount"] = float(max_amount)
+    if status:
+        conditions.append("status = :status")
+        params["status"] = status
+    select = ALL_TRANSACTIONS_SQL.format(schema="")
+    if user_id is not None or blocked:
+        # A user's or the blocked accounts are few: one range scan per leg index
+        accounts = []
+        if user_id is not None:
+            accounts.append("user_id = :user_id")
+            params["user_id"] = user_id
+        if blocked is not None:
+            accounts.append("is_blocked = :blocked")
+            params["blocked"] = int(blocked)
+        account_ids = f"SELECT id FROM accounts WHERE {' AND '.join(accounts)}"
+        extra = "".join(f" AND {condition}" for condition in conditions)
+        query = f"""{select} WHERE debit_account_id IN ({account_ids}){extra}
+            UNION ALL
+            {select} WHERE credit_account_id IN ({account_ids})
+            AND (debit_account_id IS NULL OR debit_account_id NOT IN ({account_ids})){extra}"""
+    else:
+        if blocked is not None:
+            # Most accounts are unblocked: walk the sort index and check each entry's accounts
+            conditions.append(
+                "EXISTS (SELECT 1 FROM accounts WHERE id IN (debit_account_id, credit_account_id) AND is_blocked = 0)"
+            )
+        query = select + (f" WHERE {' AND '.join(conditions)}" if conditions else "")
+    query += f" ORDER BY {_order_by(TRANSACTION_SORTS[sort])} LIMIT :limit"
+    return query, params
+
+@instrumented("find_transactions")
+def find_transactions(start_us: Optional[int] = None, end_us: Optional[int] = None,
+                      types: Optional[Sequence[str]] = None, min_amount: Optional[Decimal] = None,
+                      max_amount: Optional[Decimal] = None, status: Optional[str] = None,
+                      user_id: Optional[int] = None, blocked: Optional[bool] = None,
+                      sort: str = "newest", limit: int = 50, after: Optional[Sequence] = None) -> List[Transaction]:
+    """
+    Filter and sort live transactions in SQL, one page at a time
+    Args:
+        start_us: Inclusive lower bound on created_at_us
+        end_us: Exclusive upper bound on created_at_us
+        types: Only these entry types
+        min_amount: Inclusive lower bound on the amount
+        max_amount: Inclusive upper bound on the amount
+        status: Only entries with this status
+        user_id: Only entries debiting or crediting one of this user's accounts
+        blocked: Only entries touching a blocked (True) or an unblocked (False) account
+        sort: One of TRANSACTION_SORTS
+        limit: Page size
+        after: transaction_page_key() of the previous page's last entry; None for the first page
+    Returns:
+        List[Transaction]: One page of entries; archived entries are not listed
+    """
+    query, params = _transactions_page_sql(start_us, end_us, types, min_amount, max_amount, status,
+                                           user_id, blocked, sort, limit, after)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
         return [Transaction(**row) for row in cursor.fetchall()]
 
+@instrumented("find_transaction_details")
+def find_transaction_details(start_us: Optional[int] = None, end_us: Optional[int] = None,
+                             types: Optional[Sequence[str]] = None, min_amount: Optional[Decimal] = None,
+                             max_amount: Optional[Decimal] = None, status: Optional[str] = None,
+                             user_id: Optional[int] = None, blocked: Optional[bool] = None,
+                             sort: str = "newest", limit: int = 50, after: Optional[Sequence] = None) -> List[dict]:
+    """
+    find_transactions() with each entry's owner and account details, cached per page
+    Returns:
+        List[dict]: Transaction fields plus account_number, balance, is_blocked, user_id,
+        username, full_name and counterparty_account_number
+    """
+    query, params = _transactions_page_sql(start_us, end_us, types, min_amount, max_amount, status,
+                                           user_id, blocked, sort, limit, after)
+    query = TRANSACTION_DETAILS_SQL.format(page=query) + f" ORDER BY {_order_by(TRANSACTION_SORTS[sort], 't.')}"
+    key = ("transactions", start_us, end_us, tuple(types or ()), min_amount, max_amount, status,
+           user_id, blocked, sort, limit, tuple(after) if after is not None else None)
+
+    def load():
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
+
+    def scope(rows):
+        keys = TRANSACTION_SORTS[sort]
+        return page_cache.Scope(
+            [row[column] for row in rows for column in ("account_id", "counterparty_account_id")],
+            columns=[column for column, _ in keys], descending=keys[0][1] == "DESC", after=after,
+            last=_page_key(rows[-1], keys) if len(rows) == limit else None
+        )
+    return page_cache.get_or_load(key, load, scope)
+
+@instrumented("get_transaction_details")
+def get_transaction_details(entry_id: int) -> Optional[dict]:
+    """One live entry with the same details as find_transaction_details(), or None"""
+    query = TRANSACTION_DETAILS_SQL.format(page=ALL_TRANSACTIONS_SQL.format(schema="") + " WHERE id = ?")
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, (entry_id,))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
+def _users_page_sql(username_prefix: Optional[str], role: Optional[str], blocked: Optional[bool],
+                    sort: str, limit: int, after: Optional[Sequence]) -> Tuple[str, dict]:
+    if sort not in USER_SORTS:
+        raise ValueError(f"Unknown sort {sort!r}; expected one of {', '.join(USER_SORTS)}")
+    conditions = []
+    params = {"limit": limit}
+    if after is not None:
+        conditions.append(_after(USER_SORTS[sort], after, params, "u."))
+    if username_prefix:
+        # A range rather than LIKE so the unique username index is used
+        conditions.append("u.username >= :prefix AND u.username < :prefix_end")
+        params["prefix"] = username_prefix
+        params["prefix_end"] = username_prefix + "\U0010ffff"
+    if role:
+        conditions.append("u.role = :role")
+        params["role"] = role
+    if blocked is not None:
+        exists = "EXISTS (SELECT 1 FROM accounts a WHERE a.user_id = u.id AND a.is_blocked = 1)"
+        conditions.append(exists if blocked else f"NOT {exists}")
+    query = f"SELECT {', '.join(f'u.{column}' for column in USER_COLUMNS)} FROM users u"
+    if conditions:
+        query += f" WHERE {' AND '.join(conditions)}"
+    query += f" ORDER BY {_order_by(USER_SORTS[sort], 'u.')} LIMIT :limit"
+    return query, params
+
+@instrumented("find_users")
+def find_users(username_prefix: Optional[str] = None, role: Optional[str] = None,
+               blocked: Optional[bool] = None, sort: str = "id",
+               limit: int = 50, after: Optional[Sequence] = None) -> List[User]:
+    """
+    Filter and sort users in SQL, one page at a time
+    Args:
+        username_prefix: Only usernames starting with this text (case-sensitive)
+        role: Only users with this role
+        blocked: Only users with (True) or without (False) a blocked account
+        sort: One of USER_SORTS
+        limit: Page size
+        after: user_page_key() of the previous page's last user; None for the first page
+    Returns:
+        List[User]: One page of users
+    """
+    query, params = _users_page_sql(username_prefix, role, blocked, sort, limit, after)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return [User(**row) for row in cursor.fetchall()]
+
+@instrumented("get_user_by_username")
+def get_user_by_username(username: str) -> Optional[User]:
+    """Get the user with exactly this username (case-sensitive), via the unique username index"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(USER_COLUMNS)} FROM users WHERE username = ?", (username,))
+        user_data = cursor.fetchone()
+        return User(**user_data) if user_data else None
+
+@instrumented("find_users_with_accounts")
+def find_users_with_accounts(username_prefix: Optional[str] = None, role: Optional[str] = None,
+                             blocked: Optional[bool] = None, sort: str = "id",
+                             limit: int = 50, after: Optional[Sequence] = None) -> List[Tuple[User, List[Account]]]:
+    """
+    find_users() with every listed user's accounts from the same query, cached per page
+    Returns:
+        List[Tuple[User, List[Account]]]: One page of users, each with its accounts by id
+    """
+    query, params = _users_page_sql(username_prefix, role, blocked, sort, limit, after)
+    query = USER_ACCOUNTS_SQL.format(page=query) + f" ORDER BY {_order_by(USER_SORTS[sort], 'p.')}, a.id"
+    key = ("users", username_prefix, role, blocked, sort, limit, tuple(after) if after is not None else None)
+
+    def load():
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            users = {}
+            for row in cursor.fetchall():
+                if row["id"] not in users:
+                    users[row["id"]] = (User(**{column: row[column] for column in USER_COLUMNS}), [])
+                if row["account_id"] is not None:
+                    users[row["id"]][1].append(Account(
+                        id=row["account_id"], user_id=row["id"], account_number=row["account_number"],
+                        balance=row["balance"], account_type=row["account_type"], is_blocked=row["is_blocked"]
+                    ))
+            return list(users.values())
+
+    def scope(page):
+        # New entries never add users, they only move the balances shown
+        return page_cache.Scope(account.id for _, accounts in page for account in accounts)
+    return page_cache.get_or_load(key, load, scope)
+
+@instrumented("get_user_accounts")
 def get_user_accounts(user_id: int) -> List[Account]:
     """Get all accounts for a user"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
-            """SELECT id, user_id, account_number, balance, account_type, is_blocked 
-            FROM accounts WHERE user_id = ?""",
+            f"""SELECT a.id, a.user_id, a.account_number, {TOTAL_BALANCE_SQL} AS balance,
+            a.account_type, a.is_blocked 
+            FROM accounts a WHERE a.user_id = ?""",
             (user_id,)
         )
         return [Account(**row) for row in cursor.fetchall()]
 
+TRANSACTIONS_WITH_USERS_SQL = """
+    SELECT t.id, a.id AS account_id, t.type, t.amount, t.description, t.status, t.created_at,
+           t.created_at_us, u.username, u.full_name
+    FROM {schema}journal_entries t
+    JOIN accounts a ON a.id = COALESCE(t.debit_account_id, t.credit_account_id)
+    JOIN users u ON a.user_id = u.id
+"""
+
+@instrumented("get_transactions_with_user_details")
 def get_transactions_with_user_details(limit: int = None) -> List[dict]:
     """Get all transactions with associated user details"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        query = """
-            SELECT t.id, t.account_id, t.type, t.amount, t.description, t.status, t.created_at,
-                   u.username, u.full_name
-            FROM transactions t
-            JOIN accounts a ON t.account_id = a.id
-            JOIN users u ON a.user_id = u.id
-            ORDER BY t.created_at DESC
-        """
+        query = TRANSACTIONS_WITH_USERS_SQL.format(schema="") + " ORDER BY t.created_at_us DESC, t.id DESC"
         params = []
         if limit is not None:
             query += " LIMIT ?"
             params.append(limit)
         
         cursor.execute(query, params)
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        rows = cursor.fetchall()
+        if (limit is None or len(rows) < limit) and archive.has_archives(cursor):
+            rows += archive.read_archived(
+                TRANSACTIONS_WITH_USERS_SQL, {}, None if limit is None else limit - len(rows),
+                exclude_ids=[row["id"] for row in rows], order_by="t.created_at_us DESC, t.id DESC"
+            )
+        return [
+            {key: row[key] for key in row.keys() if key != "created_at_us"} for row in rows
+        ]
 
+@instrumented("block_unblock_account")
 def block_unblock_account(account_id: int, block: bool) -> bool:
     """Block or unblock an account"""
     with get_db_connection() as conn:
@@ -69,6 +439,7 @@ def block_unblock_account(account_id: int, block: bool) -> bool:
             if cursor.rowcount == 0:
                 return False
             conn.commit()
+            invalidate_account(account_id)
             return True
         except sqlite3.Error:
             return False
\ No newline at end of file
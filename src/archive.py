@@ -0,0 +1,299 @@
+"""
+Cold storage for old journal entries
+
+archive_entries() moves journal entries older than a horizon out of the main
+database into one file per period next to it (bank_2025.db, or bank_2025_03.db
+with monthly periods). The main file uses write-ahead logging, under which a
+transaction spanning the main file and an ATTACHed partition is not atomic
+across the two, so the move is two transactions: entries are first copied
+into the partition and committed there, then deleted from the main file. An
+interrupted run can leave entries in both (readers skip ids they already
+have), never in neither, and the next run finishes the move. The
+archive_partitions table in the main database records which period each file
+covers and up to which time within it entries have been moved.
+
+Archived entries are always older than every entry left in the main file, so
+history queries read the main file first and only open partitions when it
+returned fewer rows than asked for and the date range reaches back into an
+archived period. Partitions are attached one at a time, newest first, and
+detached again, so any number of them stays within SQLite's attach limit.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+from src import database
+from src.database import get_db_connection
+from src.journal import MAX_TIMESTAMP_US, MIN_TIMESTAMP_US
+from src.utils import now_micros
+
+ARCHIVE_HORIZON_DAYS = int(os.environ.get("BANK_ARCHIVE_HORIZON_DAYS", "365"))
+ARCHIVE_PERIOD = os.environ.get("BANK_ARCHIVE_PERIOD", "year")
+PERIODS = ("year", "month")
+
+ARCHIVE_SCHEMA = "archive_partition"
+
+# Same columns as the live journal; accounts stay in the main file, so no foreign keys
+PARTITION_DDL = (
+    """CREATE TABLE IF NOT EXISTS {schema}.journal_entries (
+        id INTEGER PRIMARY KEY,
+        type TEXT NOT NULL,
+        amount REAL NOT NULL,
+        debit_account_id INTEGER,
+        credit_account_id INTEGER,
+        description TEXT,
+        reference TEXT,
+        status TEXT DEFAULT 'completed',
+        created_at TIMESTAMP,
+        created_at_us INTEGER,
+        txn_ref TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_journal_debit_time ON journal_entries(debit_account_id, created_at_us)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_journal_credit_time ON journal_entries(credit_account_id, created_at_us)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_journal_time ON journal_entries(created_at_us)",
+)
+
+JOURNAL_COLUMNS = (
+    "id, type, amount, debit_account_id, credit_account_id, description, reference, status, "
+    "created_at, created_at_us, txn_ref"
+)
+
+def _micros(moment: datetime) -> int:
+    return int(moment.timestamp()) * 1_000_000
+
+def period_bounds(timestamp_us: int, period: str = ARCHIVE_PERIOD) -> Tuple[str, int, int]:
+    """
+    Return the label and [start, end) microsecond bounds of the period containing a timestamp
+    Labels are "2025" for yearly and "2025_03" for monthly periods (UTC).
+    """
+    moment = datetime.fromtimestamp(timestamp_us / 1_000_000, tz=timezone.utc)
+    if period == "year":
+        start = datetime(moment.year, 1, 1, tzinfo=timezone.utc)
+        end = datetime(moment.year + 1, 1, 1, tzinfo=timezone.utc)
+        return f"{moment.year}", _micros(start), _micros(end)
+    if period == "month":
+        start = datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+        end = datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1, tzinfo=timezone.utc)
+        return f"{moment.year}_{moment.month:02d}", _micros(start), _micros(end)
+    raise ValueError(f"Unknown archive period {period!r}; expected one of {PERIODS}")
+
+def partition_path(label: str, archive_dir: Optional[Path] = None) -> Path:
+    """File holding one period, e.g. bank_2025.db next to bank.db"""
+    if database.is_memory_database():
+        raise ValueError("In-memory databases cannot be archived")
+    db_path = database.database_file()
+    return Path(archive_dir or db_path.parent) / f"{db_path.stem}_{label}.db"
+
+def list_partitions(cursor: Optional[sqlite3.Cursor] = None) -> List[dict]:
+    """Catalog rows of all partitions, newest period first"""
+    if cursor is None:
+        with get_db_connection() as conn:
+            return list_partitions(conn.cursor())
+    cursor.execute(
+        "SELECT period, path, start_us, end_us, archived_through_us, row_count, archived_at "
+        "FROM archive_partitions "
+        "ORDER BY start_us DESC"
+    )
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def partitions_for_range(cursor: sqlite3.Cursor, start_us: int = MIN_TIMESTAMP_US,
+                         end_us: int = MAX_TIMESTAMP_US) -> List[dict]:
+    """Non-empty partitions overlapping [start_us, end_us), newest first"""
+    return [
+        partition for partition in list_partitions(cursor)
+        if partition["row_count"] and partition["start_us"] < end_us
+        and partition["archived_through_us"] > start_us
+    ]
+
+def has_archives(cursor: sqlite3.Cursor) -> bool:
+    """Cheap check callers make before paying for read_archived()"""
+    cursor.execute("SELECT 1 FROM archive_partitions WHERE row_count > 0 LIMIT 1")
+    return cursor.fetchone() is not None
+
+def archived_through(cursor: Optional[sqlite3.Cursor] = None) -> Optional[int]:
+    """Time (microseconds) before which entries have left the main file, or None if none have"""
+    if cursor is None:
+        with get_db_connection() as conn:
+            return archived_through(conn.cursor())
+    cursor.execute("SELECT MAX(archived_through_us) FROM archive_partitions WHERE row_count > 0")
+    return cursor.fetchone()[0]
+
+def _attach(conn: sqlite3.Connection, path: str) -> None:
+    conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (str(path),))
+
+def _detach(conn: sqlite3.Connection) -> None:
+    conn.execute(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+
+@contextmanager
+def attached(conn: sqlite3.Connection, partition: dict) -> Iterator[str]:
+    """
+    Attach a partition to a connection for the duration of a with block
+    Yields:
+        str: Schema prefix to format query templates with, i.e. "archive_partition."
+    """
+    _attach(conn, partition["path"])
+    try:
+        yield f"{ARCHIVE_SCHEMA}."
+    finally:
+        _detach(conn)
+
+def query_partitions(select_sql: str, params=()) -> Iterator[Tuple[dict, List[sqlite3.Row]]]:
+    """
+    Run a query template against every non-empty partition in turn
+    Yields:
+        (partition, rows) for each partition, newest first
+    """
+    conn = get_db_connection()
+    try:
+        for partition in partitions_for_range(conn.cursor()):
+            _attach(conn, partition["path"])
+            try:
+                rows = conn.execute(select_sql.format(schema=f"{ARCHIVE_SCHEMA}."), params).fetchall()
+            finally:
+                _detach(conn)
+            yield partition, rows
+    finally:
+        conn.close()
+
+def read_archived(select_sql: str, params: dict, limit: Optional[int] = None,
+                  start_us: int = MIN_TIMESTAMP_US, end_us: int = MAX_TIMESTAMP_US,
+                  exclude_ids: Iterable[int] = (),
+                  order_by: str = "created_at_us DESC, id DESC") -> List[sqlite3.Row]:
+    """
+    Run a journal query against the archive partitions a date range needs
+    Args:
+        select_sql: Query template whose journal table is written {schema}journal_entries
+        params: Named parameters of the query
+        limit: Stop after this many rows (newest first); None reads every overlapping partition
+        start_us: Inclusive lower bound of the range the caller is reading
+        end_us: Exclusive upper bound of the range the caller is reading
+        exclude_ids: Entry ids the caller already has (guards against a concurrent archive run)
+        order_by: Newest-first ORDER BY clause of the query
+    Returns:
+        List[sqlite3.Row]: Matching rows, newest first
+    """
+    if limit is not None and limit <= 0:
+        return []
+    seen = set(exclude_ids)
+    excluded = len(seen)
+    rows = []
+    conn = get_db_connection()
+    try:
+        partitions = partitions_for_range(conn.cursor(), start_us, end_us)
+        for partition in partitions:
+            _attach(conn, partition["path"])
+            try:
+                query = select_sql.format(schema=f"{ARCHIVE_SCHEMA}.") + f" ORDER BY {order_by}"
+                query_params = dict(params)
+                if limit is not None:
+                    query += " LIMIT :archive_limit"
+                    query_params["archive_limit"] = limit - len(rows) + excluded
+                for row in conn.execute(query, query_params).fetchall():
+                    if row["id"] not in seen:
+                        seen.add(row["id"])
+                        rows.append(row)
+            finally:
+                _detach(conn)
+            if limit is not None and len(rows) >= limit:
+                return rows[:limit]
+        return rows
+    finally:
+        conn.close()
+
+def archive_entries(horizon_days: Optional[int] = None, before_us: Optional[int] = None,
+                    period: str = ARCHIVE_PERIOD, archive_dir: Optional[Path] = None,
+                    vacuum: bool = False) -> Tuple[bool, str]:
+    """
+    Move journal entries older than the horizon into per-period partition files
+    Args:
+        horizon_days: Keep this many days in the main file (ARCHIVE_HORIZON_DAYS by default)
+        before_us: Archive entries created before this epoch-microsecond time instead
+        period: "year" or "month" partitions
+        archive_dir: Directory of the partition files; defaults to the database's directory
+        vacuum: VACUUM the main file afterwards to return the freed pages to the OS
+    Returns:
+        Tuple[bool, str]: (success, message)
+    """
+    if period not in PERIODS:
+        return False, f"Unknown archive period {period!r}"
+    if database.is_memory_database():
+        return False, "In-memory databases cannot be archived"
+    if before_us is None:
+        days = ARCHIVE_HORIZON_DAYS if horizon_days is None else horizon_days
+        before_us = now_micros() - days * 86_400_000_000
+
+    moved = 0
+    periods = []
+    conn = get_db_connection()
+    try:
+        while True:
+            row = conn.execute(
+                "SELECT MIN(created_at_us) FROM journal_entries WHERE created_at_us < ?", (before_us,)
+            ).fetchone()
+            if row[0] is None:
+                break
+            label, start_us, end_us = period_bounds(row[0], period)
+            upper_us = min(end_us, before_us)
+            path = partition_path(label, archive_dir)
+            _attach(conn, path)
+            try:
+                cursor = conn.cursor()
+                # Copy first; rows an interrupted run already copied are skipped
+                cursor.execute("BEGIN IMMEDIATE")
+                for ddl in PARTITION_DDL:
+                    cursor.execute(ddl.format(schema=ARCHIVE_SCHEMA))
+                cursor.execute(
+                    f"""INSERT OR IGNORE INTO {ARCHIVE_SCHEMA}.journal_entries ({JOURNAL_COLUMNS})
+                    SELECT {JOURNAL_COLUMNS} FROM main.journal_entries
+                    WHERE created_at_us >= ? AND created_at_us < ?""",
+                    (start_us, upper_us)
+                )
+                conn.commit()
+
+                # Then delete only what the partition now holds
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute(
+                    f"""DELETE FROM main.journal_entries WHERE created_at_us >= ? AND created_at_us < ?
+                    AND id IN (SELECT id FROM {ARCHIVE_SCHEMA}.journal_entries)""",
+                    (start_us, upper_us)
+                )
+                count = cursor.rowcount
+                cursor.execute(
+                    "SELECT COUNT(*) FROM main.journal_entries WHERE created_at_us >= ? AND created_at_us < ?",
+                    (start_us, upper_us)
+                )
+                left = cursor.fetchone()[0]
+                if left:
+                    conn.rollback()
+                    return False, f"Archiving {label} failed: {left} entries were not copied"
+                cursor.execute(
+                    """INSERT INTO main.archive_partitions
+                    (period, path, start_us, end_us, archived_through_us, row_count, archived_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(period) DO UPDATE SET
+                        archived_through_us = MAX(archived_through_us, excluded.archived_through_us),
+                        row_count = row_count + excluded.row_count, archived_at = excluded.archived_at""",
+                    (label, str(path.resolve()), start_us, end_us, upper_us, count, int(time.time()))
+                )
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            finally:
+                _detach(conn)
+            moved += count
+            periods.append(label)
+        if vacuum and moved:
+            conn.execute("VACUUM")
+    except sqlite3.Error as e:
+        return False, f"Archiving failed: Database error ({str(e)})"
+    finally:
+        conn.close()
+
+    if not moved:
+        return True, "No entries older than the horizon"
+    return True, f"Archived {moved} entries into {', '.join(periods)}"
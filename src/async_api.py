@@ -0,0 +1,140 @@
+"""
+asyncio facade over the ledger, auth and admin functions
+
+Every call runs the blocking sqlite3/bcrypt work on a dedicated thread pool so
+the event loop never blocks. Two limits keep a busy service well behaved:
+
+* MAX_CONCURRENT_PER_DB: calls allowed to run against one database file at
+  once; further calls wait their turn instead of piling up lock waits.
+* MAX_PENDING: calls admitted per event loop (running or waiting); beyond
+  that callers are suspended until capacity frees up (back-pressure).
+
+Cancelling a task before its call has started removes it from the queue. A
+call that is already running is allowed to finish (its transaction commits or
+rolls back as a unit) and the result is discarded; its slot is only released
+once the worker thread is done.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import threading
+import weakref
+from src import admin, auth, database, transactions
+
+MAX_WORKERS = 32
+MAX_CONCURRENT_PER_DB = 8
+MAX_PENDING = 10000
+
+_executor = None
+_executor_lock = threading.Lock()
+_loop_limits: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="bank-db")
+        return _executor
+
+def _limits(loop: asyncio.AbstractEventLoop, db_key: str):
+    limits = _loop_limits.get(loop)
+    if limits is None:
+        limits = {"pending": asyncio.Semaphore(MAX_PENDING), "databases": {}, "running": {}}
+        _loop_limits[loop] = limits
+    databases = limits["databases"]
+    if db_key not in databases:
+        databases[db_key] = asyncio.Semaphore(MAX_CONCURRENT_PER_DB)
+        limits["running"][db_key] = 0
+    return limits
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a blocking ledger function on the database executor
+    Args:
+        func: The synchronous function to call
+        *args, **kwargs: Passed through to func
+    Returns:
+        Whatever func returns
+    """
+    loop = asyncio.get_running_loop()
+    db_key = str(database.DB_PATH)
+    limits = _limits(loop, db_key)
+    pending, db_slots = limits["pending"], limits["databases"][db_key]
+
+    await pending.acquire()
+    try:
+        await db_slots.acquire()
+    except BaseException:
+        pending.release()
+        raise
+    limits["running"][db_key] += 1
+
+    def release():
+        limits["running"][db_key] -= 1
+        db_slots.release()
+        pending.release()
+
+    try:
+        future = _get_executor().submit(functools.partial(func, *args, **kwargs))
+    except BaseException:
+        release()
+        raise
+    def on_done(_):
+        try:
+            loop.call_soon_threadsafe(release)
+        except RuntimeError:
+            # The loop closed while the call ran (it was cancelled or timed out and the
+            # loop shut down); nothing can wait on its semaphores any more
+            release()
+
+    future.add_done_callback(on_done)
+    return await asyncio.wrap_future(future)
+
+def in_flight() -> dict:
+    """Return the number of running calls per database for the current event loop"""
+    limits = _loop_limits.get(asyncio.get_running_loop())
+    return dict(limits["running"]) if limits else {}
+
+def shutdown(wait: bool = True) -> None:
+    """Stop the executor threads; a later call starts a fresh pool"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
+
+def _wrap(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_blocking(func, *args, **kwargs)
+    return wrapper
+
+# Ledger
+deposit = _wrap(transactions.deposit)
+withdraw = _wrap(transactions.withdraw)
+transfer_funds = _wrap(transactions.transfer_funds)
+lock_funds = _wrap(transactions.lock_funds)
+unlock_funds = _wrap(transactions.unlock_funds)
+get_account_by_number = _wrap(transactions.get_account_by_number)
+get_account_balance = _wrap(transactions.get_account_balance)
+get_account_transactions = _wrap(transactions.get_account_transactions)
+get_locked_funds = _wrap(transactions.get_locked_funds)
+
+# Auth
+authenticate_user = _wrap(auth.authenticate_user)
+register_user = _wrap(auth.register_user)
+get_user_by_id = _wrap(auth.get_user_by_id)
+
+# Admin
+get_all_users = _wrap(admin.get_all_users)
+get_all_transactions = _wrap(admin.get_all_transactions)
+find_users = _wrap(admin.find_users)
+get_user_by_username = _wrap(admin.get_user_by_username)
+find_transactions = _wrap(admin.find_transactions)
+find_transaction_details = _wrap(admin.find_transaction_details)
+get_transaction_details = _wrap(admin.get_transaction_details)
+find_users_with_accounts = _wrap(admin.find_users_with_accounts)
+search_transactions = _wrap(admin.search_transactions)
+get_user_accounts = _wrap(admin.get_user_accounts)
+get_transactions_with_user_details = _wrap(admin.get_transactions_with_user_details)
+block_unblock_account = _wrap(admin.block_unblock_account)
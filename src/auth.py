@@ -1,31 +1,117 @@
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import hmac
+import threading
+from typing import Optional, Tuple
 from src.models import User
 from src.database import get_db_connection
+from src.hashing import HashingBusy, hash_secret, is_hashed, needs_rehash, verify_secret
+from src.metrics import instrumented
+from src.session import invalidate_user
 import sqlite3
 
-def authenticate_user(username: str, password: str) -> Optional[User]:
-    """Authenticate user and return User object if successful"""
+_rehash_executor = None
+_rehash_lock = threading.Lock()
+_pending_rehashes = set()
+
+INVALID_CREDENTIALS = "Incorrect username or password"
+ALREADY_REGISTERED = "Username already exists"
+
+def _upgrade_password(user_id: int, stored: str, password: str) -> None:
+    """Replace a plaintext or outdated hash, unless the password changed meanwhile"""
+    try:
+        new_hash = hash_secret(password)
+    except HashingBusy:
+        # The login already succeeded; the next one retries the upgrade
+        return
+    with get_db_connection() as conn:
+        try:
+            conn.execute(
+                "UPDATE users SET password = ? WHERE id = ? AND password = ?",
+                (new_hash, user_id, stored)
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Password rehash error: {e}")
+
+def _schedule_rehash(user_id: int, stored: str, password: str) -> None:
+    global _rehash_executor
+    with _rehash_lock:
+        if _rehash_executor is None:
+            _rehash_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bank-rehash")
+        future = _rehash_executor.submit(_upgrade_password, user_id, stored, password)
+        _pending_rehashes.add(future)
+    future.add_done_callback(_pending_rehashes.discard)
+
+def wait_for_rehashes() -> None:
+    """Block until background password upgrades scheduled so far have been written"""
+    for future in list(_pending_rehashes):
+        future.result()
+
+@instrumented("authenticate_user")
+def authenticate_user(username: str, password: str) -> Tuple[Optional[User], str]:
+    """
+    Authenticate user
+    Passwords still stored in plaintext (or hashed with an old work factor) are
+    accepted once and rehashed in the background, so the login itself only pays
+    for a single verification.
+
+    Returns:
+        (user, "") on success, otherwise (None, message) - the message says
+        whether the credentials were wrong or the server is too busy to check them
+    """
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
-            "SELECT id, username, role, full_name, email, created_at FROM users WHERE username = ? AND password = ?",
-            (username, password)
+            "SELECT id, username, role, full_name, email, created_at, password FROM users WHERE username = ?",
+            (username,)
         )
         user_data = cursor.fetchone()
-        
-        if user_data:
-            return User(**user_data)
-        return None
 
-def register_user(username: str, password: str, full_name: str = None, email: str = None) -> Optional[User]:
-    """Register a new user and return User object if successful"""
+    if not user_data:
+        return None, INVALID_CREDENTIALS
+    stored = user_data["password"]
+    if is_hashed(stored):
+        try:
+            verified = verify_secret(password, stored)
+        except HashingBusy as e:
+            return None, str(e)
+        if not verified:
+            return None, INVALID_CREDENTIALS
+        if needs_rehash(stored):
+            _schedule_rehash(user_data["id"], stored, password)
+    else:
+        if not hmac.compare_digest(stored.encode(), password.encode()):
+            return None, INVALID_CREDENTIALS
+        _schedule_rehash(user_data["id"], stored, password)
+
+    user_data = dict(user_data)
+    del user_data["password"]
+    return User(**user_data), ""
+
+@instrumented("register_user")
+def register_user(username: str, password: str, full_name: str = None, email: str = None) -> Tuple[Optional[User], str]:
+    """
+    Register a new user with one account
+
+    Returns:
+        (user, "") on success, otherwise (None, message) - the message says
+        whether the username is taken or the server is too busy
+    """
+    # A taken username is the common failure; find it before paying for bcrypt
+    with get_db_connection() as conn:
+        if conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone():
+            return None, ALREADY_REGISTERED
+    try:
+        password_hash = hash_secret(password)
+    except HashingBusy as e:
+        return None, str(e)
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute(
                 "INSERT INTO users (username, password, full_name, email) VALUES (?, ?, ?, ?)",
-                (username, password, full_name, email)
+                (username, password_hash, full_name, email)
             )
             user_id = cursor.lastrowid
             
@@ -36,9 +122,11 @@ def register_user(username: str, password: str, full_name: str = None, email: st
             )
             
             conn.commit()
-            return get_user_by_id(user_id)
+            invalidate_user(user_id)
+            return get_user_by_id(user_id), ""
     except sqlite3.IntegrityError:
-        return None
+        # The username was claimed by another registration while hashing
+        return None, ALREADY_REGISTERED
 
 def get_user_by_id(user_id: int) -> Optional[User]:
     """Get user by ID"""
@@ -49,4 +137,4 @@ def get_user_by_id(user_id: int) -> Optional[User]:
             (user_id,)
         )
         user_data = cursor.fetchone()
-        return User(**user_data) if user_data else None
\ No newline at end of file
+        return User(**user_data) if user_data else None
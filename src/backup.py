@@ -0,0 +1,237 @@
+"""
+Online backups with the SQLite backup API
+
+backup_database() copies the live database page by page with
+Connection.backup, BACKUP_PAGES_PER_STEP pages per step with a
+BACKUP_STEP_SLEEP pause in between. Database files use write-ahead logging,
+so the copy runs inside one read transaction: every step reads the same
+snapshot, writers commit to the log alongside it without waiting, and their
+commits never restart the copy.
+
+In-memory databases have a rollback journal instead, where a reader blocks
+writers. There each step takes the read lock only for itself, and a writer
+that changes the database mid-copy makes SQLite restart the copy from the
+page it changed, so the result is still a consistent snapshot. Under a
+steady stream of writes such restarts could go on forever, so after
+BACKUP_MAX_RESTARTS of them the copy is redone in a single step, which holds
+the read lock for the whole copy but is guaranteed to finish.
+
+Each backup is written to a temporary file, verified (PRAGMA integrity_check
+plus the ledger reconciliation of src/reconcile.py), optionally gzipped and
+then renamed into place, so a file named bank-<timestamp>.db[.gz] in the
+backup directory is always complete and checked. BackupScheduler runs backups
+on an interval and keeps the newest BACKUP_RETENTION of them.
+
+Cold-storage partition files (src/archive.py) are not included.
+"""
+from collections import deque
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Union
+from src import database
+from src.histogram import Histogram
+from src.reconcile import check_ledger
+
+BACKUP_PAGES_PER_STEP = int(os.environ.get("BANK_BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_SLEEP = float(os.environ.get("BANK_BACKUP_STEP_SLEEP", "0.005"))
+BACKUP_RETENTION = int(os.environ.get("BANK_BACKUP_RETENTION", "7"))
+BACKUP_MAX_RESTARTS = int(os.environ.get("BANK_BACKUP_MAX_RESTARTS", "20"))
+BACKUP_PREFIX = "bank-"
+# A step that finds a writer mid-commit retries after this long (sqlite3's default is 250 ms)
+BUSY_RETRY_SLEEP = 0.01
+
+class _TooManyRestarts(Exception):
+    pass
+
+def default_backup_dir() -> Path:
+    """BANK_BACKUP_DIR, or a backups directory next to the database file"""
+    configured = os.environ.get("BANK_BACKUP_DIR")
+    if configured:
+        return Path(configured)
+    if database.is_memory_database():
+        return Path(tempfile.gettempdir()) / "bank-backups"
+    return database.database_file().parent / "backups"
+
+def verify_database(path: Union[Path, str]) -> List[str]:
+    """
+    Check a database file: SQLite integrity check plus ledger reconciliation
+    Returns:
+        List[str]: Problems found; empty if the file is sound
+    """
+    conn = sqlite3.connect(f"file:{Path(path).as_posix()}?mode=ro", uri=True)
+    try:
+        problems = [row[0] for row in conn.execute("PRAGMA integrity_check").fetchall() if row[0] != "ok"]
+        if not problems:
+            problems = check_ledger(conn, check_archives=False)["violations"]
+        return problems
+    except sqlite3.Error as e:
+        return [f"Cannot read backup: {e}"]
+    finally:
+        conn.close()
+
+def verify_backup(path: Union[Path, str]) -> List[str]:
+    """Verify a backup file, decompressing .gz backups to a temporary file first"""
+    path = Path(path)
+    if path.suffix != ".gz":
+        return verify_database(path)
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = Path(tmp) / path.stem
+        with gzip.open(path, "rb") as src, open(plain, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        return verify_database(plain)
+
+def _gzip(source: Path, target: Path) -> None:
+    with open(source, "rb") as src, gzip.open(target, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+def list_backups(directory: Optional[Path] = None) -> List[Path]:
+    """Completed backups in a directory, oldest first"""
+    directory = Path(directory or default_backup_dir())
+    if not directory.exists():
+        return []
+    return sorted(
+        path for path in directory.iterdir()
+        if path.name.startswith(BACKUP_PREFIX) and path.name.endswith((".db", ".db.gz"))
+    )
+
+def prune_backups(directory: Optional[Path] = None, keep: int = BACKUP_RETENTION) -> List[Path]:
+    """Delete all but the newest keep backups; returns the deleted paths"""
+    backups = list_backups(directory)
+    removed = backups[:-keep] if keep > 0 else backups
+    for path in removed:
+        path.unlink()
+    return removed
+
+def backup_database(directory: Optional[Path] = None, compress: bool = True, verify: bool = True,
+                    pages_per_step: int = BACKUP_PAGES_PER_STEP, step_sleep: float = BACKUP_STEP_SLEEP,
+                    keep: Optional[int] = None) -> dict:
+    """
+    Take an online backup of the current database
+    Args:
+        directory: Where to write it; default_backup_dir() by default
+        compress: gzip the verified copy
+        verify: Run the integrity and reconciliation checks before keeping the copy
+        pages_per_step: Pages copied per step, i.e. per read lock taken on the live database
+        step_sleep: Pause between steps, during which writers run freely
+        keep: Prune to this many backups afterwards (None keeps everything)
+    Returns:
+        dict: ok, path, sizes, page, step and restart counts, wall time, the longest and p99
+        step time (including retries while a writer held the database), and problems
+    """
+    directory = Path(directory or default_backup_dir())
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+    name = f"{BACKUP_PREFIX}{stamp}-{time.time_ns() % 1_000_000_000:09d}.db"
+    steps = Histogram()
+    state = {"pages": 0, "remaining": None, "restarts": 0, "last": time.perf_counter()}
+
+    def progress(status, remaining, total):
+        now = time.perf_counter()
+        steps.record((now - state["last"]) * 1_000_000)
+        state["pages"] = total
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > BACKUP_MAX_RESTARTS:
+                raise _TooManyRestarts()
+        state["remaining"] = remaining
+        if remaining and step_sleep:
+            time.sleep(step_sleep)
+        state["last"] = time.perf_counter()
+
+    started = time.perf_counter()
+    fd, tmp_name = tempfile.mkstemp(dir=directory, prefix=".backup-", suffix=".db")
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    report = {"ok": False, "path": None, "problems": []}
+    try:
+        source = database.connect()
+        target = sqlite3.connect(tmp_path)
+        try:
+            if source.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+                # Pin one snapshot for the whole copy (a read transaction starts at its first read)
+                source.execute("BEGIN")
+                source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            try:
+                source.backup(target, pages=pages_per_step, progress=progress, sleep=BUSY_RETRY_SLEEP)
+            except _TooManyRestarts:
+                state["last"] = time.perf_counter()
+                source.backup(target, pages=-1, progress=progress, sleep=BUSY_RETRY_SLEEP)
+        finally:
+            target.close()
+            if source.in_transaction:
+                source.rollback()
+            source.close()
+        copied = time.perf_counter()
+        database_bytes = tmp_path.stat().st_size
+
+        problems = verify_database(tmp_path) if verify else []
+        verified = time.perf_counter()
+        report["problems"] = problems
+        if problems:
+            return report
+
+        if compress:
+            final_path = directory / (name + ".gz")
+            _gzip(tmp_path, final_path.with_suffix(".gz.tmp"))
+            os.replace(final_path.with_suffix(".gz.tmp"), final_path)
+        else:
+            final_path = directory / name
+            os.replace(tmp_path, final_path)
+        finished = time.perf_counter()
+        report.update({
+            "ok": True,
+            "path": str(final_path),
+            "database_bytes": database_bytes,
+            "backup_bytes": final_path.stat().st_size,
+            "pages": state["pages"],
+            "steps": steps.count,
+            "restarts": state["restarts"],
+            "copy_seconds": round(copied - started, 3),
+            "verify_seconds": round(verified - copied, 3),
+            "compress_seconds": round(finished - verified, 3) if compress else 0.0,
+            "wall_seconds": round(finished - started, 3),
+            "max_step_us": steps.max,
+            "p99_step_us": steps.percentile(99),
+        })
+        if keep is not None:
+            report["pruned"] = [str(path) for path in prune_backups(directory, keep)]
+        return report
+    except (sqlite3.Error, OSError) as e:
+        report["problems"].append(f"Backup failed: {e}")
+        return report
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+class BackupScheduler:
+    """Run backup_database() every interval_seconds on a background thread"""
+    def __init__(self, interval_seconds: float, keep: int = BACKUP_RETENTION, **backup_options):
+        self.interval_seconds = interval_seconds
+        self.keep = keep
+        self.backup_options = backup_options
+        self.reports = deque(maxlen=50)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> "BackupScheduler":
+        self._thread = threading.Thread(target=self._run, name="bank-backup", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            report = backup_database(keep=self.keep, **self.backup_options)
+            self.reports.append(report)
+            if not report["ok"]:
+                print(f"Backup error: {'; '.join(report['problems'])}")
+
+    def stop(self, wait: bool = True) -> None:
+        self._stop.set()
+        if wait and self._thread is not None:
+            self._thread.join()
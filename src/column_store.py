@@ -0,0 +1,330 @@
+"""
+Memory-mapped columnar side store for historical analytics
+
+Usage:
+    python -m src.column_store            # refresh, then print all reports
+    python -m src.column_store --top 20 --no-refresh
+
+Heavy reports (per-account totals, monthly volumes, top accounts) scan the
+whole journal. Running them against the live database competes with posting
+traffic for the database lock and the page cache, so they run against a
+read-optimized copy instead: a directory next to the database holding the
+journal in the columnar format of src/columnar.py (the format of .col
+exports), one segment file per refresh plus a catalog,
+
+    entries-000000000001.col  entries-000000120001.col  ...  meta.json
+
+Each row is one journal entry with its debit and credit account (0 when the
+entry has none), so an account's credits are the amounts of the rows that
+credit it and its debits those of the rows that debit it; their difference is
+its balance excluding locked funds.
+
+refresh() writes the entries with an id above the last one ingested into a
+new segment named after the first id it may hold, reading archived partitions
+as well as the live file, so keeping the store current costs one rowid range
+read of the new entries. meta.json lists the segments and is replaced only
+once the segment file is complete, so a crash mid-refresh leaves at most an
+unlisted segment that the next refresh overwrites. When there are more than
+MAX_SEGMENTS segments they are merged into one. Do not archive while a refresh
+runs.
+
+Readers map the segments meta.json lists with ColumnarFile. Columns come back
+as NumPy arrays when NumPy is installed and as iterators over the segments'
+zero-copy memoryviews otherwise; the reports below work with either.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+from itertools import chain
+import argparse
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+from src import archive, database
+from src.columnar import BASE_TYPES, COLUMNS, ColumnarFile, ColumnarWriter, TypeCodes
+from src.database import get_db_connection
+from src.exporter import COLUMNAR_COLUMNS
+
+REFRESH_PAGE_SIZE = 50_000
+MAX_SEGMENTS = 16
+
+ENTRIES_AFTER_SQL = (
+    f"SELECT {', '.join(COLUMNAR_COLUMNS)} FROM {{schema}}journal_entries WHERE id > ? ORDER BY id LIMIT ?"
+)
+
+_lock = threading.Lock()
+_stores: Dict[str, "ColumnStore"] = {}
+
+def default_store_dir() -> Path:
+    """BANK_COLUMN_STORE_DIR, or a <stem>_columns directory next to the database file"""
+    configured = os.environ.get("BANK_COLUMN_STORE_DIR")
+    if configured:
+        return Path(configured)
+    if database.is_memory_database():
+        return Path(tempfile.gettempdir()) / "bank-columns"
+    db_path = database.database_file()
+    return db_path.parent / f"{db_path.stem}_columns"
+
+def _numpy():
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        return None
+
+class ColumnView:
+    """The store's segments as of one meta.json, mapped read-only"""
+    def __init__(self, directory: Path, meta: dict):
+        self.rows: int = meta["rows"]
+        self.types: List[str] = meta["types"]
+        self._files = [ColumnarFile(directory / segment["file"]) for segment in meta["segments"]]
+
+    def __getitem__(self, name: str):
+        """One column over all segments: a NumPy array, or a single-pass iterator of values"""
+        np = _numpy()
+        if np is None:
+            return chain.from_iterable(f.column(name) for f in self._files)
+        parts = [f.numpy(name) for f in self._files]
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=dict(COLUMNS)[name])
+
+    def close(self) -> None:
+        """Unmap the segments; NumPy arrays taken from this view must be dropped first"""
+        for f in self._files:
+            try:
+                f.close()
+            except BufferError:
+                # A NumPy array still refers to it; the map closes when the array is freed
+                pass
+        self._files = []
+
+    def __enter__(self) -> "ColumnView":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class ColumnStore:
+    """Columnar segment files of the journal"""
+    def __init__(self, directory: Union[Path, str, None] = None):
+        self.directory = Path(directory or default_store_dir())
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.directory / "meta.json"
+
+    def meta(self) -> dict:
+        """Contents of meta.json: rows, segments, last ingested entry id, type names and source database"""
+        try:
+            return json.loads(self._meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {"rows": 0, "segments": [], "last_id": 0, "types": list(BASE_TYPES), "database": None}
+
+    def _write_meta(self, meta: dict) -> None:
+        tmp_path = self._meta_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp_path, self._meta_path)
+
+    def _remove(self, names) -> None:
+        for name in names:
+            try:
+                (self.directory / name).unlink(missing_ok=True)
+            except OSError:
+                # Still mapped by a reader on a platform that refuses; _reset() sweeps it later
+                pass
+
+    def _reset(self) -> dict:
+        self._remove([path.name for path in self.directory.glob("*.col")])
+        meta = {"rows": 0, "segments": [], "last_id": 0, "types": list(BASE_TYPES),
+                "database": str(database.DB_PATH)}
+        self._write_meta(meta)
+        return meta
+
+    def refresh(self) -> int:
+        """
+        Write the journal entries added since the last refresh as a new segment
+        The store is rebuilt from scratch when it was built from another database
+        or the journal has fewer entries than it already holds (e.g. after a restore).
+        Returns:
+            int: Number of journal entries ingested
+        """
+        with self._refresh_lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            meta = self.meta()
+            with get_db_connection() as conn:
+                conn.row_factory = None
+                latest = conn.execute("SELECT COALESCE(MAX(id), 0) FROM journal_entries").fetchone()[0]
+                if meta["database"] != str(database.DB_PATH) or (latest < meta["last_id"] and latest):
+                    meta = self._reset()
+                name = f"entries-{meta['last_id'] + 1:012d}.col"
+                writer = ColumnarWriter(self.directory / name, TypeCodes(meta["types"]))
+                try:
+                    last_id = meta["last_id"]
+                    for partition in archive.partitions_for_range(conn.cursor()):
+                        with archive.attached(conn, partition) as schema:
+                            last_id = max(last_id, self._ingest(conn, schema, meta["last_id"], writer))
+                    last_id = max(last_id, self._ingest(conn, "", meta["last_id"], writer))
+                except BaseException:
+                    writer.abort()
+                    raise
+            if not writer.rows:
+                writer.abort()
+                return 0
+            writer.close()
+            meta["segments"].append({"file": name, "rows": writer.rows})
+            meta.update(rows=meta["rows"] + writer.rows, last_id=last_id, types=writer.types.names,
+                        database=str(database.DB_PATH))
+            self._write_meta(meta)
+            if len(meta["segments"]) > MAX_SEGMENTS:
+                self._compact(meta)
+            return writer.rows
+
+    def _ingest(self, conn, schema: str, after_id: int, writer: ColumnarWriter) -> int:
+        """Append the entries with ids above after_id; returns the last id appended (after_id if none)"""
+        sql = ENTRIES_AFTER_SQL.format(schema=schema)
+        while True:
+            batch = conn.execute(sql, (after_id, REFRESH_PAGE_SIZE)).fetchall()
+            if not batch:
+                return after_id
+            writer.append(batch)
+            after_id = batch[-1][0]
+
+    def _compact(self, meta: dict) -> None:
+        """Merge every segment into one file named after the last entry id it holds"""
+        name = f"merged-{meta['last_id']:012d}.col"
+        writer = ColumnarWriter(self.directory / name, TypeCodes(meta["types"]))
+        try:
+            for segment in meta["segments"]:
+                with ColumnarFile(self.directory / segment["file"]) as f:
+                    for start in range(0, f.rows, REFRESH_PAGE_SIZE):
+                        writer.append_columns({
+                            column: f.column(column)[start:start + REFRESH_PAGE_SIZE] for column, _ in COLUMNS
+                        })
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+        old = [segment["file"] for segment in meta["segments"]]
+        meta["segments"] = [{"file": name, "rows": writer.rows}]
+        self._write_meta(meta)
+        self._remove(old)
+
+    def open(self) -> ColumnView:
+        """Map the segments as of the current meta.json; use as a context manager"""
+        return ColumnView(self.directory, self.meta())
+
+def get_store() -> ColumnStore:
+    """The column store of the current database"""
+    db_key = str(database.DB_PATH)
+    with _lock:
+        store = _stores.get(db_key)
+        if store is None:
+            store = _stores[db_key] = ColumnStore()
+        return store
+
+def _money(paise: int) -> Decimal:
+    return Decimal(int(paise)).scaleb(-2)
+
+def account_totals(view: ColumnView) -> Dict[int, dict]:
+    """
+    Credits, debits and net movement per account
+    Returns:
+        Dict[int, dict]: account_id -> {"credits", "debits", "net"} as Decimals
+    """
+    debits, credits, amounts = view["debit_account_id"], view["credit_account_id"], view["amount_paise"]
+    np = _numpy()
+    if np is not None and isinstance(amounts, np.ndarray):
+        # One signed leg per side of each entry; account 0 marks a missing side
+        accounts = np.concatenate([credits, debits])
+        legs = np.concatenate([amounts, -amounts])
+        present = accounts != 0
+        accounts, legs = accounts[present], legs[present]
+        if not len(accounts):
+            return {}
+        # Integer sums via argsort + reduceat: float bincount weights would round large totals
+        order = np.argsort(accounts, kind="stable")
+        sorted_accounts, sorted_legs = accounts[order], legs[order]
+        starts = np.flatnonzero(np.r_[True, sorted_accounts[1:] != sorted_accounts[:-1]])
+        credit_sums = np.add.reduceat(np.where(sorted_legs > 0, sorted_legs, 0), starts)
+        debit_sums = np.add.reduceat(np.where(sorted_legs < 0, -sorted_legs, 0), starts)
+        totals = zip(sorted_accounts[starts].tolist(), credit_sums.tolist(), debit_sums.tolist())
+    else:
+        sums = defaultdict(lambda: [0, 0])
+        for debit_id, credit_id, paise in zip(debits, credits, amounts):
+            if credit_id:
+                sums[credit_id][0] += paise
+            if debit_id:
+                sums[debit_id][1] += paise
+        totals = ((account_id, credit, debit) for account_id, (credit, debit) in sums.items())
+    return {
+        account_id: {"credits": _money(credit), "debits": _money(debit), "net": _money(credit - debit)}
+        for account_id, credit, debit in totals
+    }
+
+def monthly_volumes(view: ColumnView) -> List[dict]:
+    """
+    Entry count and amount per calendar month (UTC) and entry type
+    Returns:
+        List[dict]: {"month": "2025-03", "type", "count", "amount"} sorted by month and type
+    """
+    codes, amounts, times = view["type_code"], view["amount_paise"], view["created_at_us"]
+    np = _numpy()
+    groups: Dict[Tuple[str, int], List[int]] = {}
+    if np is not None and isinstance(codes, np.ndarray):
+        # Type codes are one signed byte, so month * 128 + code is a unique group key
+        months = times.astype("datetime64[us]").astype("datetime64[M]").astype(np.int64)
+        keys = months * 128 + codes
+        unique, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse)
+        sums = np.zeros(len(unique), dtype=np.int64)
+        np.add.at(sums, inverse, amounts)
+        for key, count, total in zip(unique.tolist(), counts.tolist(), sums.tolist()):
+            month_index, code = divmod(key, 128)
+            month = f"{1970 + month_index // 12}-{month_index % 12 + 1:02d}"
+            groups[(month, code)] = [count, total]
+    else:
+        month_of_day: Dict[int, str] = {}
+        for code, paise, created_at_us in zip(codes, amounts, times):
+            day = created_at_us // 86_400_000_000
+            month = month_of_day.get(day)
+            if month is None:
+                month = month_of_day[day] = datetime.fromtimestamp(day * 86_400, tz=timezone.utc).strftime("%Y-%m")
+            group = groups.setdefault((month, code), [0, 0])
+            group[0] += 1
+            group[1] += paise
+    return [
+        {"month": month, "type": view.types[code], "count": count, "amount": _money(total)}
+        for (month, code), (count, total) in sorted(groups.items())
+    ]
+
+def top_accounts(view: ColumnView, n: int = 10) -> List[Tuple[int, Decimal]]:
+    """The n accounts with the largest volume (credits plus debits), largest first"""
+    totals = account_totals(view)
+    ranked = sorted(totals.items(), key=lambda item: item[1]["credits"] + item[1]["debits"], reverse=True)
+    return [(account_id, sums["credits"] + sums["debits"]) for account_id, sums in ranked[:n]]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dir", type=Path, help="store directory (default: next to the database)")
+    parser.add_argument("--top", type=int, default=10, help="number of top accounts to list")
+    parser.add_argument("--no-refresh", action="store_true", help="report on the store as it is")
+    args = parser.parse_args()
+    store = ColumnStore(args.dir) if args.dir else get_store()
+    ingested = 0 if args.no_refresh else store.refresh()
+    with store.open() as view:
+        report = {
+            "ingested": ingested,
+            "rows": view.rows,
+            "monthly_volumes": monthly_volumes(view),
+            "top_accounts": [{"account_id": account_id, "volume": volume}
+                             for account_id, volume in top_accounts(view, args.top)],
+        }
+    print(json.dumps(report, indent=2, default=str))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Columnar files of journal entries for analytics
+
+A columnar file holds the numeric fields of journal entries as one
+fixed-width array per column, so a scan over amounts or timestamps reads only
+those bytes and can be memory-mapped without parsing:
+
+    BANKCOL1 | header length (uint64) | JSON header | padding | column arrays
+
+The header lists the row count, each column's array typecode and byte offset
+(aligned to 8 bytes), and the entry type names in code order. Amounts are
+stored as integer paise so sums are exact; a missing debit or credit account
+is stored as 0. Arrays are in native byte order. Text fields (descriptions,
+references) are left to the CSV and JSONL exports.
+
+ColumnarWriter streams batches into one temporary file per column and joins
+them when closed, so writing needs memory for one batch only. ColumnarFile
+maps a finished file and returns each column as a zero-copy memoryview, or as
+a NumPy array over the same memory when NumPy is installed.
+"""
+from array import array
+import json
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+MAGIC = b"BANKCOL1"
+ALIGNMENT = 8
+
+# (name, array typecode); all 8-byte integers except the one-byte type code
+COLUMNS = (
+    ("id", "q"),
+    ("created_at_us", "q"),
+    ("debit_account_id", "q"),
+    ("credit_account_id", "q"),
+    ("amount_paise", "q"),
+    ("type_code", "b"),
+)
+
+# Codes of the posting types; any other type found in the journal is appended in order of appearance
+BASE_TYPES = ("deposit", "withdraw", "transfer", "lock", "unlock")
+
+class TypeCodes:
+    """Maps journal entry type names to one-byte codes"""
+    def __init__(self, names: Sequence[str] = BASE_TYPES):
+        self.names = list(names)
+        self.codes = {name: code for code, name in enumerate(self.names)}
+
+    def code(self, name: str) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            if len(self.names) >= 127:
+                raise ValueError("Too many distinct entry types for a one-byte code")
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+def to_columns(rows: Iterable[Sequence], types: TypeCodes) -> Dict[str, array]:
+    """
+    Convert journal rows to column arrays
+    Args:
+        rows: (id, created_at_us, debit_account_id, credit_account_id, amount, type) tuples
+        types: Type code table, extended with any new type names
+    """
+    columns = {name: array(typecode) for name, typecode in COLUMNS}
+    ids, times, debits, credits, amounts, codes = (columns[name] for name, _ in COLUMNS)
+    code = types.code
+    for entry_id, created_at_us, debit_id, credit_id, amount, type in rows:
+        ids.append(entry_id)
+        times.append(created_at_us or 0)
+        debits.append(debit_id or 0)
+        credits.append(credit_id or 0)
+        amounts.append(round(amount * 100))
+        codes.append(code(type))
+    return columns
+
+class ColumnarWriter:
+    """Write a columnar file batch by batch"""
+    def __init__(self, path: Union[Path, str], types: Optional[TypeCodes] = None):
+        self.path = Path(path)
+        self.types = types or TypeCodes()
+        self.rows = 0
+        self._tmp = tempfile.TemporaryDirectory(dir=self.path.parent, prefix=".columnar-")
+        self._files = {name: open(Path(self._tmp.name) / name, "wb") for name, _ in COLUMNS}
+
+    def append(self, rows: Iterable[Sequence]) -> int:
+        """Append journal rows (see to_columns); returns the number of rows written"""
+        return self.append_columns(to_columns(rows, self.types))
+
+    def append_columns(self, columns: Dict[str, Sequence]) -> int:
+        """
+        Append columns that are already converted, e.g. views of another columnar file
+        Args:
+            columns: Equal-length arrays or memoryviews for every name in COLUMNS, with its
+                typecode and type codes valid for this writer's types
+        Returns:
+            int: Number of rows written
+        """
+        for name, _ in COLUMNS:
+            self._files[name].write(columns[name])
+        count = len(columns["id"])
+        self.rows += count
+        return count
+
+    def close(self) -> int:
+        """Join the columns into the final file; returns its size in bytes"""
+        for f in self._files.values():
+            f.close()
+        header = {"rows": self.rows, "types": self.types.names, "columns": []}
+        sizes = {name: os.path.getsize(Path(self._tmp.name) / name) for name, _ in COLUMNS}
+        # Offsets depend on the header length and the header holds the offsets: repeat until stable
+        header_len = 0
+        while True:
+            offset = _align(len(MAGIC) + 8 + header_len)
+            header["columns"] = []
+            for name, typecode in COLUMNS:
+                header["columns"].append({"name": name, "typecode": typecode, "offset": offset})
+                offset = _align(offset + sizes[name])
+            encoded = json.dumps(header).encode()
+            if len(encoded) == header_len:
+                break
+            header_len = len(encoded)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "wb") as out:
+            out.write(MAGIC + struct.pack("<Q", len(encoded)) + encoded)
+            for column in header["columns"]:
+                out.write(b"\0" * (column["offset"] - out.tell()))
+                with open(Path(self._tmp.name) / column["name"], "rb") as src:
+                    while True:
+                        block = src.read(1 << 20)
+                        if not block:
+                            break
+                        out.write(block)
+            size = out.tell()
+        os.replace(tmp_path, self.path)
+        self._tmp.cleanup()
+        return size
+
+    def abort(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._tmp.cleanup()
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+class ColumnarFile:
+    """A memory-mapped columnar file"""
+    def __init__(self, path: Union[Path, str]):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{self.path} is not a columnar file")
+        (header_len,) = struct.unpack_from("<Q", self._mmap, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(self._mmap[start:start + header_len])
+        self.rows: int = header["rows"]
+        self.types: List[str] = header["types"]
+        self._columns = {column["name"]: column for column in header["columns"]}
+        self._views = []
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def column(self, name: str) -> memoryview:
+        """Zero-copy view of one column; release views (or use numpy()) before close()"""
+        spec = self._columns[name]
+        size = array(spec["typecode"]).itemsize
+        view = memoryview(self._mmap)[spec["offset"]:spec["offset"] + self.rows * size].cast(spec["typecode"])
+        self._views.append(view)
+        return view
+
+    def numpy(self, name: str):
+        """One column as a read-only NumPy array over the mapped file (needs numpy)"""
+        import numpy as np
+        spec = self._columns[name]
+        return np.frombuffer(self._mmap, dtype=np.dtype(spec["typecode"]), count=self.rows, offset=spec["offset"])
+
+    def close(self) -> None:
+        for view in self._views:
+            view.release()
+        self._views.clear()
+        self._mmap.close()
+
+    def __enter__(self) -> "ColumnarFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,17 +1,221 @@
+import os
 import sqlite3
+import threading
 from pathlib import Path
+from typing import Dict, Union
+from urllib.parse import unquote
+from src import query_trace
+from src.hashing import hash_secret
+from src.journal import backfill_entry_timestamps, migrate_legacy_transactions
 
-DB_PATH = Path(__file__).parent.parent / "bank.db"
+DEFAULT_DB_PATH = Path(__file__).parent.parent / "bank.db"
+SHARED_MEMORY_URI = "file::memory:?cache=shared"
 
-def get_db_connection():
-    """Create and return a database connection"""
-    conn = sqlite3.connect(DB_PATH)
+# One open connection per shared in-memory database keeps it alive between uses
+_memory_anchors: Dict[str, sqlite3.Connection] = {}
+_anchor_lock = threading.Lock()
+
+# Bumped whenever a data migration is added to _migrate() or the DDL below changes;
+# databases already at this version skip initialization entirely
+SCHEMA_VERSION = 7
+
+def resolve_db_path(target: Union[Path, str]) -> Union[Path, str]:
+    """Normalize a database target: URIs stay strings, ':memory:' becomes the shared in-memory URI"""
+    target = str(target)
+    if target == ":memory:":
+        return SHARED_MEMORY_URI
+    if target.startswith("file:"):
+        return target
+    return Path(target)
+
+# A file path, or a SQLite URI such as file::memory:?cache=shared; set with
+# the BANK_DB_PATH environment variable or set_db_path()
+DB_PATH: Union[Path, str] = resolve_db_path(os.environ.get("BANK_DB_PATH") or DEFAULT_DB_PATH)
+
+def is_memory_database(target: Union[Path, str, None] = None) -> bool:
+    """
+    True for in-memory URIs: file::memory:?cache=shared, file:name?mode=memory&cache=shared,
+    or file:/name?vfs=memdb. Shared-cache databases use table locks that fail at once
+    under concurrent writers; memdb ones wait on the busy timeout like files do.
+    """
+    target = str(DB_PATH if target is None else target)
+    return target.startswith("file:") and any(
+        marker in target for marker in (":memory:", "mode=memory", "vfs=memdb")
+    )
+
+def database_file(target: Union[Path, str, None] = None) -> Path:
+    """
+    File a database target lives in, e.g. /data/bank.db for file:/data/bank.db?mode=rwc
+    Raises:
+        ValueError: For in-memory databases, which have no file
+    """
+    target = DB_PATH if target is None else target
+    if is_memory_database(target):
+        raise ValueError("In-memory databases have no file")
+    target = str(target)
+    if target.startswith("file:"):
+        path = target[len("file:"):].split("?", 1)[0].split("#", 1)[0]
+        if path.startswith("//"):
+            # file://host/path; SQLite only accepts an empty host or localhost
+            path = "/" + path[2:].partition("/")[2]
+        return Path(unquote(path))
+    return Path(target)
+
+def set_db_path(target: Union[Path, str]) -> None:
+    """Point every later connection at another database file or URI"""
+    global DB_PATH
+    DB_PATH = resolve_db_path(target)
+
+def connect(target: Union[Path, str, None] = None, **kwargs) -> sqlite3.Connection:
+    """
+    Open a plain sqlite3 connection to a database target
+    Args:
+        target: File path or SQLite URI; defaults to DB_PATH
+        **kwargs: Passed on to sqlite3.connect (e.g. check_same_thread, factory)
+    """
+    target = DB_PATH if target is None else target
+    if str(target).startswith("file:"):
+        kwargs["uri"] = True
+        if is_memory_database(target):
+            with _anchor_lock:
+                if str(target) not in _memory_anchors:
+                    _memory_anchors[str(target)] = sqlite3.connect(str(target), uri=True, check_same_thread=False)
+    return sqlite3.connect(target, **kwargs)
+
+def release_memory_database(target: Union[Path, str, None] = None) -> None:
+    """Let a shared in-memory database be freed once its last connection closes"""
+    target = str(DB_PATH if target is None else target)
+    with _anchor_lock:
+        anchor = _memory_anchors.pop(target, None)
+    if anchor is not None:
+        anchor.close()
+
+def copy_database(source: Union[Path, str], target: Union[Path, str]) -> None:
+    """Copy a database into another file or in-memory URI with the online backup API"""
+    src, dst = connect(source), connect(target)
+    try:
+        if "vfs=memdb" in str(target):
+            # A page copy keeps the source's WAL header, which memdb cannot open;
+            # VACUUM INTO writes the (empty) memdb database in its own journal mode
+            src.execute("VACUUM INTO ?", (str(target),))
+        else:
+            src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
+def enable_wal(target: Union[Path, str, None] = None) -> None:
+    """
+    Switch a database file to write-ahead logging; in-memory databases keep their journal
+    The mode is stored in the file, so this only needs to run once per database. Under WAL
+    readers (backups, admin listings) and the one writer no longer block each other.
+    """
+    if is_memory_database(target):
+        return
+    conn = connect(target)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+    finally:
+        conn.close()
+
+def get_db_connection(target: Union[Path, str, None] = None):
+    """
+    Create and return a database connection
+    Args:
+        target: File path or SQLite URI to connect to instead of DB_PATH
+    """
+    if query_trace.ENABLED:
+        conn = connect(target, factory=query_trace.TracedConnection)
+    else:
+        conn = connect(target)
     conn.row_factory = sqlite3.Row
     return conn
 
-def initialize_database():
-    """Initialize database tables and default admin account"""
-    with get_db_connection() as conn:
+# Journal indexes: per-leg history and global ordering on integer timestamps
+JOURNAL_INDEXES = {
+    "idx_journal_debit_time": "CREATE INDEX IF NOT EXISTS idx_journal_debit_time ON journal_entries(debit_account_id, created_at_us)",
+    "idx_journal_credit_time": "CREATE INDEX IF NOT EXISTS idx_journal_credit_time ON journal_entries(credit_account_id, created_at_us)",
+    "idx_journal_time": "CREATE INDEX IF NOT EXISTS idx_journal_time ON journal_entries(created_at_us)",
+    "idx_journal_txn_ref": "CREATE UNIQUE INDEX IF NOT EXISTS idx_journal_txn_ref ON journal_entries(txn_ref)",
+    # Amount range filters and amount ordering in the admin listings
+    "idx_journal_amount": "CREATE INDEX IF NOT EXISTS idx_journal_amount ON journal_entries(amount)",
+}
+
+# Full-text index over journal descriptions and references (external content: the
+# text lives only in journal_entries), kept in sync by triggers so every writer is covered
+JOURNAL_SEARCH_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS journal_search USING fts5(
+        description, reference, content='journal_entries', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS journal_search_insert AFTER INSERT ON journal_entries
+    WHEN new.description IS NOT NULL OR new.reference IS NOT NULL BEGIN
+        INSERT INTO journal_search(rowid, description, reference) VALUES (new.id, new.description, new.reference);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS journal_search_delete AFTER DELETE ON journal_entries
+    WHEN old.description IS NOT NULL OR old.reference IS NOT NULL BEGIN
+        INSERT INTO journal_search(journal_search, rowid, description, reference)
+        VALUES ('delete', old.id, old.description, old.reference);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS journal_search_update AFTER UPDATE OF description, reference ON journal_entries
+    BEGIN
+        INSERT INTO journal_search(journal_search, rowid, description, reference)
+        SELECT 'delete', old.id, old.description, old.reference
+        WHERE old.description IS NOT NULL OR old.reference IS NOT NULL;
+        INSERT INTO journal_search(rowid, description, reference)
+        SELECT new.id, new.description, new.reference
+        WHERE new.description IS NOT NULL OR new.reference IS NOT NULL;
+    END""",
+)
+
+# A counter bumped by every change to users, to the shown columns of accounts (not the
+# balance) and to the archive catalog. Postings only add journal entries and move
+# balances, so a reader that sees the counter unchanged knows a commit was postings
+# only and can tell from the new entries alone what they affect (see page_cache).
+_BUMP_REFERENCE_VERSION = "UPDATE reference_version SET version = version + 1 WHERE id = 1;"
+REFERENCE_VERSION_DDL = (
+    """CREATE TABLE IF NOT EXISTS reference_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )""",
+    "INSERT OR IGNORE INTO reference_version (id, version) VALUES (1, 0)",
+) + tuple(
+    f"""CREATE TRIGGER IF NOT EXISTS {table}_reference_{event.split()[0].lower()} AFTER {event} ON {table}
+    BEGIN {_BUMP_REFERENCE_VERSION} END"""
+    for table, events in (
+        ("users", ("INSERT", "DELETE", "UPDATE OF username, role, full_name, email")),
+        ("accounts", ("INSERT", "DELETE", "UPDATE OF user_id, account_number, account_type, is_blocked")),
+        ("archive_partitions", ("INSERT", "DELETE", "UPDATE")),
+    )
+    for event in events
+)
+
+def reference_version(cursor: sqlite3.Cursor) -> int:
+    """Current value of the reference_version counter"""
+    cursor.execute("SELECT version FROM reference_version WHERE id = 1")
+    return cursor.fetchone()[0]
+
+def create_journal_indexes(cursor: sqlite3.Cursor) -> None:
+    """Create the journal indexes that do not exist yet"""
+    for ddl in JOURNAL_INDEXES.values():
+        cursor.execute(ddl)
+
+def drop_journal_indexes(cursor: sqlite3.Cursor) -> None:
+    """Drop the journal indexes, e.g. before a bulk load that rebuilds them afterwards"""
+    for name in JOURNAL_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+def schema_is_current(target: Union[Path, str, None] = None) -> bool:
+    """True if the database was already initialized with the current schema version"""
+    with get_db_connection(target) as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+def initialize_database(seed_admin: bool = True, target: Union[Path, str, None] = None):
+    """Initialize database tables and default admin account in DB_PATH or the given target"""
+    enable_wal(target)
+    if schema_is_current(target):
+        return
+    with get_db_connection(target) as conn:
         cursor = conn.cursor()
         
         # Users table
@@ -36,11 +240,13 @@ def initialize_database():
             balance REAL DEFAULT 0,
             account_type TEXT DEFAULT 'savings',
             is_blocked INTEGER DEFAULT 0,
+            shard_count INTEGER NOT NULL DEFAULT 0,
             FOREIGN KEY (user_id) REFERENCES users(id)
         )
         """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_accounts_user ON accounts(user_id)")
         
-        # Transactions table
+        # Legacy transactions table, superseded by journal_entries
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS transactions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -55,6 +261,25 @@ def initialize_database():
         )
         """)
         
+        # Journal: one row per business event, with the debit and credit legs
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS journal_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            amount REAL NOT NULL,
+            debit_account_id INTEGER,
+            credit_account_id INTEGER,
+            description TEXT,
+            reference TEXT,
+            status TEXT DEFAULT 'completed',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at_us INTEGER,
+            txn_ref TEXT,
+            FOREIGN KEY (debit_account_id) REFERENCES accounts(id),
+            FOREIGN KEY (credit_account_id) REFERENCES accounts(id)
+        )
+        """)
+        
         # Locked funds table
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS locked_funds (
@@ -69,12 +294,91 @@ def initialize_database():
         )
         """)
         
+        # Credit shards for hot accounts (see src/sharding.py)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS balance_shards (
+            account_id INTEGER NOT NULL,
+            shard INTEGER NOT NULL,
+            amount REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (account_id, shard),
+            FOREIGN KEY (account_id) REFERENCES accounts(id)
+        ) WITHOUT ROWID
+        """)
+        
+        # Results of committed postings, keyed by client idempotency key
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key TEXT PRIMARY KEY,
+            operation TEXT NOT NULL,
+            success INTEGER NOT NULL,
+            message TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys(created_at)"
+        )
+        
+        # Catalog of cold-storage partition files (see src/archive.py)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archive_partitions (
+            period TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            start_us INTEGER NOT NULL,
+            end_us INTEGER NOT NULL,
+            archived_through_us INTEGER NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            archived_at INTEGER NOT NULL
+        )
+        """)
+        
+        for ddl in JOURNAL_SEARCH_DDL:
+            cursor.execute(ddl)
+        
+        # Change counter of everything but postings (see REFERENCE_VERSION_DDL)
+        for ddl in REFERENCE_VERSION_DDL:
+            cursor.execute(ddl)
+        
         # Create default admin if not exists
         cursor.execute("SELECT * FROM users WHERE username='admin'")
-        if not cursor.fetchone():
+        if seed_admin and not cursor.fetchone():
             cursor.execute(
                 "INSERT INTO users (username, password, role, full_name) VALUES (?, ?, ?, ?)",
-                ("admin", "admin123", "admin", "System Administrator")
+                ("admin", hash_secret("admin123"), "admin", "System Administrator")
             )
         
-        conn.commit()
\ No newline at end of file
+        _migrate(cursor)
+        
+        create_journal_indexes(cursor)
+        conn.commit()
+
+def _migrate(cursor: sqlite3.Cursor):
+    """Run data migrations newer than the database's user_version"""
+    cursor.execute("PRAGMA user_version")
+    version = cursor.fetchone()[0]
+    if version < 1:
+        migrate_legacy_transactions(cursor)
+    if version < 2:
+        cursor.execute("PRAGMA table_info(journal_entries)")
+        columns = {row["name"] for row in cursor.fetchall()}
+        if "created_at_us" not in columns:
+            cursor.execute("ALTER TABLE journal_entries ADD COLUMN created_at_us INTEGER")
+        if "txn_ref" not in columns:
+            cursor.execute("ALTER TABLE journal_entries ADD COLUMN txn_ref TEXT")
+        cursor.execute("DROP INDEX IF EXISTS idx_journal_debit")
+        cursor.execute("DROP INDEX IF EXISTS idx_journal_credit")
+        backfill_entry_timestamps(cursor)
+    if version < 4:
+        # Index the entries written before the search triggers existed
+        cursor.execute("INSERT INTO journal_search(journal_search) VALUES ('rebuild')")
+    if version < 6:
+        cursor.execute("PRAGMA table_info(accounts)")
+        if "shard_count" not in {row["name"] for row in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE accounts ADD COLUMN shard_count INTEGER NOT NULL DEFAULT 0")
+        cursor.execute(
+            """UPDATE accounts SET shard_count = (
+                SELECT COUNT(*) FROM balance_shards s WHERE s.account_id = accounts.id
+            ) WHERE id IN (SELECT account_id FROM balance_shards)"""
+        )
+    if version < SCHEMA_VERSION:
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
\ No newline at end of file
@@ -0,0 +1,236 @@
+"""
+Streaming export of the journal to CSV, JSONL and columnar files
+
+Usage:
+    python -m src.exporter audit_2025.csv.gz --since 2025-01-01 --until 2026-01-01
+    python -m src.exporter ledger.col --account 42
+
+export_journal() writes journal entries, optionally filtered by account, date
+range and type, in (created_at_us, id) order: archived partitions first, then
+the live database. Rows are read one page of EXPORT_PAGE_SIZE entries at a time,
+each page its own statement resuming after the last (created_at_us, id) seen
+and drained with fetchmany, so memory stays flat however large the export and
+writers are only held up for the length of one page. Entries committed after
+the export started are not included. Do not archive while an export runs.
+
+Formats follow the file name: .csv and .jsonl (either with .gz for gzip), or
+.col for the columnar format of src/columnar.py.
+"""
+import argparse
+import csv
+from datetime import datetime, timezone
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Union
+from src import archive
+from src.columnar import ColumnarWriter
+from src.database import get_db_connection
+from src.journal import MAX_TIMESTAMP_US, MIN_TIMESTAMP_US
+
+EXPORT_PAGE_SIZE = int(os.environ.get("BANK_EXPORT_PAGE_SIZE", "50000"))
+FETCH_SIZE = 5000
+
+EXPORT_COLUMNS = (
+    "id", "type", "amount", "debit_account_id", "credit_account_id", "description", "reference",
+    "status", "created_at", "created_at_us", "txn_ref",
+)
+# Column order expected by src.columnar.to_columns
+COLUMNAR_COLUMNS = ("id", "created_at_us", "debit_account_id", "credit_account_id", "amount", "type")
+
+def _page_sql(columns: Sequence[str], schema: str, account_id: Optional[int], types: Optional[Sequence[str]]) -> str:
+    select = ", ".join(columns)
+    conditions = "(created_at_us, id) > (:after_us, :after_id) AND created_at_us < :end_us"
+    if types:
+        conditions += " AND type IN (SELECT value FROM json_each(:types))"
+    table = f"{schema}journal_entries"
+    if account_id is None:
+        return f"SELECT {select} FROM {table} WHERE {conditions} ORDER BY created_at_us, id LIMIT :limit"
+    # One range scan per leg index instead of an OR the planner would answer with a full scan
+    return f"""SELECT {select} FROM {table} WHERE debit_account_id = :account_id AND {conditions}
+        UNION ALL
+        SELECT {select} FROM {table}
+        WHERE credit_account_id = :account_id AND debit_account_id IS NOT :account_id AND {conditions}
+        ORDER BY created_at_us, id LIMIT :limit"""
+
+def iter_entries(columns: Sequence[str] = EXPORT_COLUMNS, account_id: Optional[int] = None,
+                 start_us: Optional[int] = None, end_us: Optional[int] = None,
+                 types: Optional[Sequence[str]] = None, include_archives: bool = True,
+                 page_size: int = EXPORT_PAGE_SIZE) -> Iterator[List[tuple]]:
+    """
+    Stream journal entries in batches of plain tuples, oldest first
+    Args:
+        columns: Journal columns to select; must include id and created_at_us
+        account_id: Only entries debiting or crediting this account
+        start_us: Inclusive lower bound on created_at_us
+        end_us: Exclusive upper bound on created_at_us
+        types: Only these entry types
+        include_archives: Also read the cold-storage partitions the range reaches
+        page_size: Entries per statement
+    Yields:
+        List[tuple]: Up to FETCH_SIZE rows at a time
+    """
+    time_pos, id_pos = columns.index("created_at_us"), columns.index("id")
+    start_us = MIN_TIMESTAMP_US if start_us is None else start_us
+    conn = get_db_connection()
+    conn.row_factory = None
+    try:
+        latest = conn.execute("SELECT MAX(created_at_us) FROM journal_entries").fetchone()[0]
+        end_us = min(MAX_TIMESTAMP_US if end_us is None else end_us, (latest or 0) + 1)
+        sources = [None]
+        if include_archives:
+            sources = list(reversed(archive.partitions_for_range(conn.cursor(), start_us, end_us))) + sources
+        for partition in sources:
+            if partition is None:
+                yield from _pages(conn, "", columns, time_pos, id_pos, account_id, start_us, end_us, types, page_size)
+                continue
+            with archive.attached(conn, partition) as schema:
+                yield from _pages(conn, schema, columns, time_pos, id_pos, account_id, start_us, end_us, types, page_size)
+    finally:
+        conn.close()
+
+def _pages(conn: sqlite3.Connection, schema: str, columns: Sequence[str], time_pos: int, id_pos: int,
+           account_id: Optional[int], start_us: int, end_us: int, types: Optional[Sequence[str]],
+           page_size: int) -> Iterator[List[tuple]]:
+    sql = _page_sql(columns, schema, account_id, types)
+    params = {
+        "after_us": start_us - 1, "after_id": MAX_TIMESTAMP_US, "end_us": end_us,
+        "limit": page_size, "account_id": account_id, "types": json.dumps(list(types or ())),
+    }
+    while True:
+        cursor = conn.execute(sql, params)
+        fetched = 0
+        while True:
+            batch = cursor.fetchmany(FETCH_SIZE)
+            if not batch:
+                break
+            fetched += len(batch)
+            last = batch[-1]
+            yield batch
+        cursor.close()
+        if fetched < page_size:
+            return
+        params["after_us"], params["after_id"] = last[time_pos], last[id_pos]
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process in MiB, or None where it cannot be read"""
+    # VmHWM belongs to this process image; ru_maxrss also counts a forking parent's peak
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def export_format(path: Union[Path, str]) -> str:
+    """Format implied by a file name: csv, jsonl or columnar"""
+    suffixes = [suffix.lower() for suffix in Path(path).suffixes]
+    compressed = bool(suffixes) and suffixes[-1] == ".gz"
+    if compressed:
+        suffixes.pop()
+    suffix = suffixes[-1] if suffixes else ""
+    formats = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".col": "columnar"}
+    if suffix not in formats or (compressed and suffix == ".col"):
+        raise ValueError(f"Cannot tell the export format of {path}; use .csv, .jsonl or .col")
+    return formats[suffix]
+
+def export_journal(path: Union[Path, str], account_id: Optional[int] = None, start_us: Optional[int] = None,
+                   end_us: Optional[int] = None, types: Optional[Sequence[str]] = None,
+                   include_archives: bool = True, page_size: int = EXPORT_PAGE_SIZE) -> dict:
+    """
+    Export journal entries to a file, streaming
+    Args:
+        path: Output file; .csv, .jsonl, .csv.gz, .jsonl.gz or .col
+        account_id: Only entries debiting or crediting this account
+        start_us: Inclusive lower bound on created_at_us
+        end_us: Exclusive upper bound on created_at_us
+        types: Only these entry types
+        include_archives: Also export archived entries in the range
+        page_size: Entries per statement
+    Returns:
+        dict: ok, format, path, rows, bytes, seconds, rows per second and the process's peak RSS
+    """
+    path = Path(path)
+    started = time.perf_counter()
+    try:
+        format = export_format(path)
+    except ValueError as e:
+        return {"ok": False, "error": str(e)}
+    filters = dict(account_id=account_id, start_us=start_us, end_us=end_us, types=types,
+                   include_archives=include_archives, page_size=page_size)
+    rows = 0
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        if format == "columnar":
+            writer = ColumnarWriter(path)
+            try:
+                for batch in iter_entries(COLUMNAR_COLUMNS, **filters):
+                    rows += writer.append(batch)
+            except BaseException:
+                writer.abort()
+                raise
+            size = writer.close()
+        else:
+            opener = gzip.open if path.suffix.lower() == ".gz" else open
+            with opener(tmp_path, "wt", newline="", encoding="utf-8") as f:
+                if format == "csv":
+                    writer = csv.writer(f)
+                    writer.writerow(EXPORT_COLUMNS)
+                    for batch in iter_entries(EXPORT_COLUMNS, **filters):
+                        writer.writerows(batch)
+                        rows += len(batch)
+                else:
+                    dumps = json.JSONEncoder(ensure_ascii=False).encode
+                    for batch in iter_entries(EXPORT_COLUMNS, **filters):
+                        f.write("".join([dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in batch]))
+                        rows += len(batch)
+            os.replace(tmp_path, path)
+            size = path.stat().st_size
+    except (sqlite3.Error, OSError) as e:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        return {"ok": False, "error": f"Export failed: {e}"}
+    seconds = time.perf_counter() - started
+    return {
+        "ok": True,
+        "format": format,
+        "path": str(path),
+        "rows": rows,
+        "bytes": size,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds) if seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def _date_micros(text: str) -> int:
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1_000_000)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", type=Path, help="output file: .csv, .jsonl (optionally .gz) or .col")
+    parser.add_argument("--account", type=int, help="account id")
+    parser.add_argument("--since", type=_date_micros, help="ISO date or time (UTC), inclusive")
+    parser.add_argument("--until", type=_date_micros, help="ISO date or time (UTC), exclusive")
+    parser.add_argument("--type", action="append", dest="types", help="entry type; may be repeated")
+    parser.add_argument("--no-archives", action="store_true", help="skip cold-storage partitions")
+    args = parser.parse_args()
+    print(json.dumps(export_journal(args.path, args.account, args.since, args.until, args.types,
+                                    include_archives=not args.no_archives), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+bcrypt hashing on a CPU process pool
+
+bcrypt costs hundreds of milliseconds per call at production work factors.
+Running it in worker processes lets several hashes proceed in parallel across
+cores and keeps it off the calling thread while no database lock is held.
+
+At most HASH_WORKERS hashes run at once. Further callers wait up to
+HASH_QUEUE_TIMEOUT seconds for a slot and then get HashingBusy, so a burst of
+logins queues up behind a fixed number of cores instead of pinning all of them.
+
+Settings (environment variables):
+    BANK_HASH_WORKERS: Concurrent hashes; defaults to half the cores (at least
+        one) so the rest stay free for the UI and database work
+    BANK_HASH_QUEUE_TIMEOUT: Seconds a caller waits for a slot (default 10)
+    BANK_BCRYPT_ROUNDS: bcrypt work factor for new hashes (default 12)
+"""
+import os
+import threading
+
+BCRYPT_ROUNDS = int(os.environ.get("BANK_BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.environ.get("BANK_HASH_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+HASH_QUEUE_TIMEOUT = float(os.environ.get("BANK_HASH_QUEUE_TIMEOUT", "10"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+
+class HashingBusy(Exception):
+    """Raised when no hashing slot frees up within HASH_QUEUE_TIMEOUT"""
+
+def _hashpw(secret: bytes, rounds: int) -> str:
+    import bcrypt
+    return bcrypt.hashpw(secret, bcrypt.gensalt(rounds)).decode()
+
+def _checkpw(secret: bytes, hashed: bytes) -> bool:
+    import bcrypt
+    return bcrypt.checkpw(secret, hashed)
+
+def _get_slots() -> threading.BoundedSemaphore:
+    global _slots
+    with _pool_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(HASH_WORKERS)
+        return _slots
+
+def _get_pool():
+    # Imported here: multiprocessing is only needed once something is hashed
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that already runs Tk or DB threads is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+def _run(func, *args):
+    from concurrent.futures.process import BrokenProcessPool
+    global _pool
+    slots = _get_slots()
+    if not slots.acquire(timeout=HASH_QUEUE_TIMEOUT):
+        raise HashingBusy("Too many requests in progress, please try again")
+    try:
+        return _get_pool().submit(func, *args).result()
+    except (BrokenProcessPool, OSError, RuntimeError):
+        # Pool unavailable (e.g. interpreter shutdown or process limits): hash inline
+        with _pool_lock:
+            _pool = None
+        return func(*args)
+    finally:
+        slots.release()
+
+def is_hashed(value: str) -> bool:
+    """True if a stored secret is a bcrypt hash rather than legacy plaintext"""
+    return value.startswith(("$2a$", "$2b$", "$2y$"))
+
+def hash_secret(secret: str) -> str:
+    """Hash a PIN or password with the configured work factor"""
+    return _run(_hashpw, secret.encode(), BCRYPT_ROUNDS)
+
+def verify_secret(secret: str, hashed: str) -> bool:
+    """Check a PIN or password against a stored bcrypt hash"""
+    try:
+        return _run(_checkpw, secret.encode(), hashed.encode())
+    except ValueError:
+        return False
+
+def get_work_factor(hashed: str) -> int:
+    """Return the cost encoded in a bcrypt hash such as $2b$12$..."""
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+def needs_rehash(hashed: str) -> bool:
+    """True if a stored hash was made with a different work factor than the current one"""
+    return get_work_factor(hashed) != BCRYPT_ROUNDS
+
+def set_work_factor(rounds: int) -> None:
+    """Change the bcrypt cost; existing hashes are upgraded the next time they verify"""
+    global BCRYPT_ROUNDS
+    if not 4 <= rounds <= 31:
+        raise ValueError("bcrypt rounds must be between 4 and 31")
+    BCRYPT_ROUNDS = rounds
+
+def set_workers(workers: int) -> None:
+    """Change how many hashes may run at once; takes effect for the next pool"""
+    global HASH_WORKERS
+    if workers < 1:
+        raise ValueError("At least one hashing worker is required")
+    shutdown()
+    HASH_WORKERS = workers
+
+def shutdown() -> None:
+    """Stop the worker processes"""
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+        _slots = None
@@ -0,0 +1,104 @@
+"""
+Log-linear latency histogram in the style of HdrHistogram
+
+Values are bucketed by their power of two and then split into linear
+sub-buckets (SUB_BUCKET_BITS significant bits), so every value keeps under 1% relative
+precision whatever its magnitude. Buckets are stored sparsely, which keeps a
+histogram for a rarely used statement or operation to a few dict entries.
+"""
+import threading
+from typing import Dict, Iterable, Tuple
+
+SUB_BUCKET_BITS = 8  # values keep 8 significant bits: < 1% relative error
+
+class Histogram:
+    def __init__(self):
+        self._counts: Dict[Tuple[int, int], int] = {}
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def _bucket(value: int) -> Tuple[int, int]:
+        exponent = max(0, value.bit_length() - SUB_BUCKET_BITS)
+        return exponent, value >> exponent
+
+    def record(self, value: int) -> None:
+        """Record a non-negative integer value (e.g. microseconds)"""
+        value = max(0, int(value))
+        bucket = self._bucket(value)
+        with self._lock:
+            self._counts[bucket] = self._counts.get(bucket, 0) + 1
+            self.count += 1
+            self.total += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if value > self.max:
+                self.max = value
+
+    def merge(self, other: "Histogram") -> None:
+        """Add the counts of another histogram to this one"""
+        for (exponent, sub), count in other.buckets():
+            bucket = (exponent, sub)
+            with self._lock:
+                self._counts[bucket] = self._counts.get(bucket, 0) + count
+        with self._lock:
+            self.count += other.count
+            self.total += other.total
+            if other.min is not None and (self.min is None or other.min < self.min):
+                self.min = other.min
+            self.max = max(self.max, other.max)
+
+    def buckets(self) -> Iterable[Tuple[Tuple[int, int], int]]:
+        """(exponent, sub-bucket) and count pairs in ascending value order"""
+        with self._lock:
+            return sorted(self._counts.items(), key=lambda item: item[0][1] << item[0][0])
+
+    @staticmethod
+    def bucket_upper_bound(bucket: Tuple[int, int]) -> int:
+        exponent, sub = bucket
+        return ((sub + 1) << exponent) - 1
+
+    def percentile(self, pct: float) -> int:
+        """Return the value at or below which pct percent of recordings fall"""
+        if not self.count:
+            return 0
+        target = max(1, round(self.count * pct / 100))
+        seen = 0
+        for bucket, count in self.buckets():
+            seen += count
+            if seen >= target:
+                return min(self.bucket_upper_bound(bucket), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> dict:
+        """Plain-data form, e.g. to send a worker process's histogram to its parent"""
+        with self._lock:
+            return {
+                "buckets": [[exponent, sub, count] for (exponent, sub), count in self._counts.items()],
+                "count": self.count, "total": self.total, "min": self.min, "max": self.max,
+            }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Histogram":
+        histogram = cls()
+        histogram._counts = {(exponent, sub): count for exponent, sub, count in data["buckets"]}
+        histogram.count, histogram.total = data["count"], data["total"]
+        histogram.min, histogram.max = data["min"], data["max"]
+        return histogram
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 1),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
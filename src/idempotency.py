@@ -0,0 +1,97 @@
+from collections import OrderedDict
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+from src import database
+from src.database import get_db_connection
+
+IDEMPOTENCY_RETENTION_SECONDS = 24 * 60 * 60
+CACHE_SIZE = 10000
+
+_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _cache_key(key: str) -> tuple:
+    return (str(database.DB_PATH), key)
+
+def get_cached_result(key: str, operation: str) -> Optional[Tuple[bool, str]]:
+    """Return the remembered result for a key from the in-memory front cache"""
+    with _cache_lock:
+        entry = _cache.get(_cache_key(key))
+        if entry is None:
+            return None
+        cached_operation, result, created_at = entry
+        if created_at < time.time() - IDEMPOTENCY_RETENTION_SECONDS:
+            del _cache[_cache_key(key)]
+            return None
+        _cache.move_to_end(_cache_key(key))
+    if cached_operation != operation:
+        return False, "Idempotency key was already used for a different operation"
+    return result
+
+def remember_result(key: str, operation: str, result: Tuple[bool, str], created_at: Optional[float] = None) -> None:
+    """Put a committed result into the front cache, evicting the oldest entries"""
+    with _cache_lock:
+        _cache[_cache_key(key)] = (operation, result, created_at or time.time())
+        _cache.move_to_end(_cache_key(key))
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def find_result(cursor: sqlite3.Cursor, key: str, operation: str) -> Optional[Tuple[bool, str]]:
+    """
+    Look up a key inside the caller's posting transaction
+    Args:
+        cursor: Cursor of the open posting transaction
+        key: The client supplied idempotency key
+        operation: Name of the posting function being called
+    Returns:
+        Tuple[bool, str]: The original result if the key was already committed, None otherwise
+    """
+    cursor.execute(
+        """SELECT operation, success, message, created_at FROM idempotency_keys
+        WHERE key = ? AND created_at >= ?""",
+        (key, int(time.time() - IDEMPOTENCY_RETENTION_SECONDS))
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None
+    result = (bool(row["success"]), row["message"])
+    remember_result(key, row["operation"], result, row["created_at"])
+    if row["operation"] != operation:
+        return False, "Idempotency key was already used for a different operation"
+    return result
+
+def record_result(cursor: sqlite3.Cursor, key: str, operation: str, result: Tuple[bool, str]) -> None:
+    """Store a result inside the caller's posting transaction so it commits atomically with it"""
+    cursor.execute(
+        """INSERT OR REPLACE INTO idempotency_keys (key, operation, success, message, created_at)
+        VALUES (?, ?, ?, ?, ?)""",
+        (key, operation, int(result[0]), result[1], int(time.time()))
+    )
+
+def purge_expired_keys() -> int:
+    """
+    Delete idempotency keys older than the retention window
+    Returns:
+        int: Number of keys deleted
+    """
+    cutoff = int(time.time() - IDEMPOTENCY_RETENTION_SECONDS)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (cutoff,))
+            conn.commit()
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"Purge idempotency keys error: {e}")
+            return 0
+
+def commit_result(conn: sqlite3.Connection, key: Optional[str], operation: str, result: Tuple[bool, str]) -> Tuple[bool, str]:
+    """Commit a successful posting, recording its result under the key if one was given"""
+    if key:
+        record_result(conn.cursor(), key, operation, result)
+    conn.commit()
+    if key:
+        remember_result(key, operation, result)
+    return result
@@ -0,0 +1,411 @@
+"""
+Bulk import of accounts and transactions from CSV or JSONL files
+
+Usage:
+    python -m src.importer accounts branch_users.csv --fast
+    python -m src.importer transactions branch_history.jsonl
+
+import_accounts() creates a user with one account per row, with an optional
+opening balance posted as an "Opening deposit" journal entry.
+import_transactions() posts deposit, withdraw and transfer rows to existing
+accounts. Rows are checked with the same rules as the interactive paths
+(validate_amount, the MAX_* limits, sanitize_description, the registration
+form's username, password and email rules, sufficient funds) and written with
+executemany in one transaction per IMPORT_CHUNK_SIZE rows, so a failed chunk
+leaves no partial rows behind. Rows that fail a check are skipped and written,
+with their line number and the reason, to a JSONL rejects file next to the
+input.
+
+Fast mode additionally drops the journal indexes for the duration of the load
+and rebuilds them afterwards, and turns off fsync per commit. It is meant for
+onboarding with the application offline; readers running meanwhile lose the
+indexes on the journal.
+
+Passwords that are already bcrypt hashes are stored as they are. Plaintext
+passwords are hashed on the hashing pool (src/hashing.py), which is orders of
+magnitude slower than the load itself, so large migrations should carry hashes.
+Imported entries are stamped with the time of the import.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import csv
+from decimal import Decimal
+import json
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+from src import database, hashing
+from src.database import get_db_connection
+from src.session import invalidate_user
+from src.sharding import fold_shards
+from src.transactions import MAX_DEPOSIT, MAX_TRANSFER, MAX_WITHDRAW, sanitize_description
+from src.utils import generate_account_number, generate_ulid, now_micros, validate_amount
+
+IMPORT_CHUNK_SIZE = int(os.environ.get("BANK_IMPORT_CHUNK_SIZE", "50000"))
+
+# Same rules as the registration form (ui/register.py)
+USERNAME_PATTERN = re.compile(r"^[a-zA-Z0-9_]+$")
+EMAIL_PATTERN = re.compile(r"[^@]+@[^@]+\.[^@]+")
+MIN_PASSWORD_LENGTH = 8
+
+TRANSACTION_LIMITS = {"deposit": MAX_DEPOSIT, "withdraw": MAX_WITHDRAW, "transfer": MAX_TRANSFER}
+TRANSACTION_LABELS = {"deposit": "Deposit", "withdraw": "Withdrawal", "transfer": "Transfer"}
+DEFAULT_DESCRIPTIONS = {"deposit": "Deposit", "withdraw": "Withdrawal", "transfer": None}
+
+ENTRY_SQL = """INSERT INTO journal_entries
+    (type, amount, debit_account_id, credit_account_id, description, reference, status,
+     created_at, created_at_us, txn_ref)
+    VALUES (?, ?, ?, ?, ?, ?, 'completed', datetime(? / 1000000, 'unixepoch'), ?, ?)"""
+
+class _Rejects:
+    """Writes rejected rows to a JSONL file, created on the first reject"""
+    def __init__(self, path: Path):
+        self.path = path
+        self.count = 0
+        self._file = None
+
+    def add(self, line: int, reason: str, row: dict) -> None:
+        if self._file is None:
+            self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write(json.dumps({"line": line, "reason": reason, "row": row}) + "\n")
+        self.count += 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+def read_rows(path: Path) -> Iterator[Tuple[int, dict]]:
+    """
+    Stream (line number, row) pairs from a .csv file with a header row or a .jsonl file
+    Malformed JSON lines are yielded as a row holding only the key "_error".
+    """
+    path = Path(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.suffix.lower() == ".csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_num, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = {"_error": f"Invalid JSON: {e}"}
+            yield line_num, row if isinstance(row, dict) else {"_error": "Expected a JSON object"}
+
+def _chunks(rows: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _text(row: dict, key: str) -> str:
+    value = row.get(key)
+    if value.__class__ is str:
+        return value.strip()
+    return "" if value is None else str(value).strip()
+
+def _amount(text: str, limit: Decimal, label: str) -> Tuple[Optional[Decimal], Optional[str]]:
+    amount = validate_amount(text)
+    if amount is None:
+        return None, "Please enter a positive amount"
+    if amount > limit:
+        return None, f"{label} exceeds maximum limit of ₹{limit:,.2f}"
+    if amount != amount.quantize(Decimal("0.01")):
+        return None, "Amount has more than two decimal places"
+    return amount, None
+
+def _report(kind: str, rows: int, imported: int, rejects: _Rejects, chunks: int, started: float,
+            **extra) -> dict:
+    seconds = time.perf_counter() - started
+    report = {
+        "kind": kind,
+        "rows": rows,
+        "imported": imported,
+        "rejected": rejects.count,
+        "rejects_path": str(rejects.path) if rejects.count else None,
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds) if seconds else None,
+    }
+    report.update(extra)
+    return report
+
+class _Loader:
+    """Connection set up for a bulk load, restoring indexes and settings afterwards"""
+    def __init__(self, fast: bool):
+        self.fast = fast
+        self.conn = get_db_connection()
+        self.cursor = self.conn.cursor()
+
+    def __enter__(self) -> "_Loader":
+        if self.fast:
+            self.conn.execute("PRAGMA synchronous = OFF")
+            self.conn.execute("PRAGMA cache_size = -262144")
+            database.drop_journal_indexes(self.cursor)
+            self.conn.commit()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        try:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            if self.fast:
+                database.create_journal_indexes(self.cursor)
+                self.conn.commit()
+        finally:
+            self.conn.close()
+
+def _insert_accounts(cursor: sqlite3.Cursor, valid: List[tuple]) -> List[Tuple[int, tuple]]:
+    """Insert validated account rows inside the caller's transaction; returns (user id, row) per row inserted"""
+    # Explicit ids let executemany insert users and accounts without a lastrowid per row
+    cursor.execute(
+        """SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'users'), 0),
+                      (SELECT COALESCE(MAX(id), 0) FROM users)),
+                  MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'accounts'), 0),
+                      (SELECT COALESCE(MAX(id), 0) FROM accounts))"""
+    )
+    last_user, last_account = cursor.fetchone()
+    next_user, next_account = last_user + 1, last_account + 1
+    users, accounts, entries = [], [], []
+    for offset, fields in enumerate(valid):
+        _, _, username, password_hash, full_name, email, account_type, opening = fields
+        user_id, account_id = next_user + offset, next_account + offset
+        users.append((user_id, username, password_hash, full_name, email))
+        accounts.append((account_id, user_id, generate_account_number(user_id), str(opening or 0), account_type))
+        if opening:
+            created_at_us = now_micros()
+            entries.append(("deposit", str(opening), None, account_id, "Opening deposit", None,
+                            created_at_us, created_at_us, generate_ulid(created_at_us)))
+    cursor.execute("SAVEPOINT import_accounts")
+    try:
+        cursor.executemany(
+            "INSERT INTO users (id, username, password, full_name, email) VALUES (?, ?, ?, ?, ?)", users
+        )
+        cursor.executemany(
+            "INSERT INTO accounts (id, user_id, account_number, balance, account_type) VALUES (?, ?, ?, ?, ?)",
+            accounts
+        )
+        cursor.executemany(ENTRY_SQL, entries)
+    except sqlite3.IntegrityError:
+        cursor.execute("ROLLBACK TO import_accounts")
+        cursor.execute("RELEASE import_accounts")
+        raise
+    cursor.execute("RELEASE import_accounts")
+    return [(user[0], fields) for user, fields in zip(users, valid)]
+
+def import_accounts(path: Path, rejects_path: Optional[Path] = None, fast: bool = False,
+                    chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+    """
+    Create a user and a savings account for every row of a file
+    Columns: username, password, full_name, email, and optionally opening_balance
+    and account_type. Usernames must be new; passwords are bcrypt hashes or
+    plaintext that passes the registration rules.
+    Args:
+        path: .csv or .jsonl file
+        rejects_path: Where to write rejected rows (default: <path>.rejects.jsonl)
+        fast: Defer the journal indexes and skip fsync per chunk (application offline)
+        chunk_size: Rows per transaction
+    Returns:
+        dict: Row, import and reject counts, the money deposited, time taken and rows per second
+    """
+    started = time.perf_counter()
+    path = Path(path)
+    rejects = _Rejects(Path(rejects_path or f"{path}.rejects.jsonl"))
+    rows = imported = chunks = 0
+    deposited = Decimal("0")
+    hasher = None
+    try:
+        with _Loader(fast) as loader:
+            cursor = loader.cursor
+            cursor.execute("SELECT username FROM users")
+            usernames = {row[0] for row in cursor.fetchall()}
+            for chunk in _chunks(read_rows(path), chunk_size):
+                rows += len(chunk)
+                valid = []
+                for line, row in chunk:
+                    error = row.get("_error")
+                    username = _text(row, "username")
+                    password = _text(row, "password")
+                    email = _text(row, "email")
+                    opening = None
+                    if error:
+                        pass
+                    elif not USERNAME_PATTERN.match(username):
+                        error = "Username may only contain letters, digits and underscores"
+                    elif username in usernames:
+                        error = f"Username {username} already exists"
+                    elif not hashing.is_hashed(password) and (
+                        len(password) < MIN_PASSWORD_LENGTH or not any(c.isupper() for c in password)
+                    ):
+                        error = f"Password must have at least {MIN_PASSWORD_LENGTH} characters and an uppercase letter"
+                    elif email and not EMAIL_PATTERN.match(email):
+                        error = "Invalid email address"
+                    elif _text(row, "opening_balance") not in ("", "0", "0.00"):
+                        opening, error = _amount(_text(row, "opening_balance"), MAX_DEPOSIT, "Deposit")
+                    if error:
+                        rejects.add(line, error, row)
+                        continue
+                    usernames.add(username)
+                    valid.append((line, row, username, password, _text(row, "full_name") or None,
+                                  email or None, _text(row, "account_type") or "savings", opening))
+
+                plaintext = [i for i, fields in enumerate(valid) if not hashing.is_hashed(fields[3])]
+                if plaintext:
+                    hasher = hasher or ThreadPoolExecutor(max_workers=hashing.HASH_WORKERS)
+                    hashes = hasher.map(hashing.hash_secret, [valid[i][3] for i in plaintext])
+                    for i, password_hash in zip(plaintext, hashes):
+                        valid[i] = valid[i][:3] + (password_hash,) + valid[i][4:]
+                if not valid:
+                    continue
+
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    created = _insert_accounts(cursor, valid)
+                except sqlite3.IntegrityError:
+                    # Someone registered one of the usernames since they were read: go row by row
+                    loader.conn.rollback()
+                    cursor.execute("BEGIN IMMEDIATE")
+                    created = []
+                    for fields in valid:
+                        try:
+                            created += _insert_accounts(cursor, [fields])
+                        except sqlite3.IntegrityError as e:
+                            rejects.add(fields[0], f"Could not create user: {e}", fields[1])
+                loader.conn.commit()
+                for user_id, _ in created:
+                    invalidate_user(user_id)
+                imported += len(created)
+                deposited += sum((fields[7] or 0 for _, fields in created), Decimal("0"))
+                chunks += 1
+    finally:
+        rejects.close()
+        if hasher is not None:
+            hasher.shutdown()
+    return _report("accounts", rows, imported, rejects, chunks, started, deposited=str(deposited))
+
+def import_transactions(path: Path, rejects_path: Optional[Path] = None, fast: bool = False,
+                        chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+    """
+    Post deposit, withdraw and transfer rows to existing accounts
+    Columns: type, account (account number), amount, and optionally description
+    and to_account (receiver account number, transfers only). Rows are applied in
+    file order, so a withdrawal may spend a deposit from an earlier row.
+    Args:
+        path: .csv or .jsonl file
+        rejects_path: Where to write rejected rows (default: <path>.rejects.jsonl)
+        fast: Defer the journal indexes and skip fsync per chunk (application offline)
+        chunk_size: Rows per transaction
+    Returns:
+        dict: Row, import and reject counts, per-type counts, time taken and rows per second
+    """
+    started = time.perf_counter()
+    path = Path(path)
+    rejects = _Rejects(Path(rejects_path or f"{path}.rejects.jsonl"))
+    rows = imported = chunks = 0
+    by_type = dict.fromkeys(TRANSACTION_LIMITS, 0)
+    try:
+        with _Loader(fast) as loader:
+            cursor = loader.cursor
+            cursor.execute("SELECT account_number, id FROM accounts")
+            account_ids = dict(cursor.fetchall())
+            for chunk in _chunks(read_rows(path), chunk_size):
+                rows += len(chunk)
+                valid = []
+                for line, row in chunk:
+                    error = row.get("_error")
+                    kind = _text(row, "type").lower()
+                    number, receiver_number = _text(row, "account"), _text(row, "to_account")
+                    account_id = account_ids.get(number)
+                    receiver_id = account_ids.get(receiver_number) if kind == "transfer" else None
+                    amount = None
+                    if error:
+                        pass
+                    elif kind not in TRANSACTION_LIMITS:
+                        error = f"Unsupported transaction type {kind!r}"
+                    elif account_id is None:
+                        error = f"Account number {number} not found"
+                    elif kind == "transfer" and receiver_id is None:
+                        error = f"Receiver account number {receiver_number} not found"
+                    elif receiver_id == account_id:
+                        error = "Cannot transfer to the same account"
+                    else:
+                        amount, error = _amount(_text(row, "amount"), TRANSACTION_LIMITS[kind], TRANSACTION_LABELS[kind])
+                    if error:
+                        rejects.add(line, error, row)
+                        continue
+                    description = row.get("description")
+                    description = (description and sanitize_description(str(description))) or DEFAULT_DESCRIPTIONS[kind]
+                    valid.append((line, row, kind, account_id, receiver_id, receiver_number, amount, description))
+                if not valid:
+                    continue
+
+                cursor.execute("BEGIN IMMEDIATE")
+                debited = {fields[3] for fields in valid if fields[2] != "deposit"}
+                cursor.execute("SELECT DISTINCT account_id FROM balance_shards WHERE amount != 0")
+                for (account_id,) in cursor.fetchall():
+                    if account_id in debited:
+                        fold_shards(cursor, account_id)
+                cursor.execute(
+                    "SELECT id, balance FROM accounts WHERE id IN (SELECT value FROM json_each(?))",
+                    (json.dumps(sorted(debited)),)
+                )
+                balances = {account_id: Decimal(str(balance)) for account_id, balance in cursor.fetchall()}
+                deltas, entries = {}, []
+                for line, row, kind, account_id, receiver_id, receiver_number, amount, description in valid:
+                    if kind != "deposit":
+                        if balances[account_id] < amount:
+                            rejects.add(line, f"Insufficient funds in account ID {account_id}", row)
+                            continue
+                        balances[account_id] -= amount
+                        deltas[account_id] = deltas.get(account_id, 0) - amount
+                    credit_id = account_id if kind == "deposit" else receiver_id
+                    if credit_id is not None:
+                        deltas[credit_id] = deltas.get(credit_id, 0) + amount
+                        if credit_id in balances:
+                            balances[credit_id] += amount
+                    created_at_us = now_micros()
+                    entries.append((
+                        kind, str(amount),
+                        None if kind == "deposit" else account_id, credit_id,
+                        description, receiver_number if kind == "transfer" else None,
+                        created_at_us, created_at_us, generate_ulid(created_at_us),
+                    ))
+                    by_type[kind] += 1
+                cursor.executemany(ENTRY_SQL, entries)
+                cursor.executemany(
+                    "UPDATE accounts SET balance = balance + ? WHERE id = ?",
+                    ((str(delta), account_id) for account_id, delta in deltas.items() if delta)
+                )
+                loader.conn.commit()
+                imported += len(entries)
+                chunks += 1
+    finally:
+        rejects.close()
+    return _report("transactions", rows, imported, rejects, chunks, started, by_type=by_type)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("kind", choices=("accounts", "transactions"))
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--rejects", type=Path, help="rejects file (default: <path>.rejects.jsonl)")
+    parser.add_argument("--fast", action="store_true", help="defer journal indexes; run with the app offline")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    database.initialize_database()
+    load = import_accounts if args.kind == "accounts" else import_transactions
+    print(json.dumps(load(args.path, args.rejects, args.fast, args.chunk_size), indent=2))
+    hashing.shutdown()
+
+if __name__ == "__main__":
+    main()
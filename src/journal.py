@@ -0,0 +1,155 @@
+from decimal import Decimal
+import sqlite3
+from typing import Optional
+from src.models import Transaction
+from src.utils import generate_ulid, now_micros
+
+# Bounds used when a history query has no time range
+MIN_TIMESTAMP_US = 0
+MAX_TIMESTAMP_US = 2 ** 63 - 1
+
+# Legacy transaction types that moved money into the account
+CREDIT_TYPES = ("deposit", "unlock")
+
+# Per-account view of the journal: each entry appears once per leg that touches the account.
+# Both arms are range scans on the (account, created_at_us) indexes; the counterpart of a
+# transfer is the other account column of the same row.
+ACCOUNT_POSTINGS_SQL = """
+    SELECT j.id, j.debit_account_id AS account_id,
+           CASE j.type WHEN 'transfer' THEN 'transfer_out' ELSE j.type END AS type,
+           j.amount,
+           CASE WHEN j.type = 'transfer' AND j.description IS NULL
+                THEN 'Transfer to ' || j.reference ELSE j.description END AS description,
+           j.reference, j.status, j.created_at, j.created_at_us, j.txn_ref,
+           j.credit_account_id AS counterparty_account_id
+    FROM {schema}journal_entries j
+    WHERE j.debit_account_id = :account_id
+      AND j.created_at_us >= :start_us AND j.created_at_us < :end_us
+    UNION ALL
+    SELECT j.id, j.credit_account_id AS account_id,
+           CASE j.type WHEN 'transfer' THEN 'transfer_in' ELSE j.type END AS type,
+           j.amount,
+           CASE WHEN j.type = 'transfer' AND j.description IS NULL
+                THEN 'Transfer from ' || COALESCE(s.account_number, 'sender') ELSE j.description END AS description,
+           j.reference, j.status, j.created_at, j.created_at_us, j.txn_ref,
+           j.debit_account_id AS counterparty_account_id
+    FROM {schema}journal_entries j
+    LEFT JOIN accounts s ON s.id = j.debit_account_id
+    WHERE j.credit_account_id = :account_id
+      AND j.created_at_us >= :start_us AND j.created_at_us < :end_us
+"""
+
+def account_postings_sql(schema: str = "") -> str:
+    """Return the per-account postings query for a schema prefix such as 'main.'"""
+    return ACCOUNT_POSTINGS_SQL.format(schema=schema)
+
+def posting_from_row(row: sqlite3.Row) -> Transaction:
+    """Build a Transaction from a row of the per-account postings query"""
+    return Transaction(
+        id=row["id"],
+        account_id=row["account_id"],
+        type=row["type"],
+        amount=Decimal(row["amount"]),
+        description=row["description"],
+        reference=row["reference"],
+        status=row["status"],
+        created_at=row["created_at"],
+        counterparty_account_id=row["counterparty_account_id"],
+        created_at_us=row["created_at_us"],
+        txn_ref=row["txn_ref"]
+    )
+
+def post_entry(cursor: sqlite3.Cursor, type: str, amount: Decimal,
+               debit_account_id: Optional[int] = None,
+               credit_account_id: Optional[int] = None,
+               description: Optional[str] = None,
+               reference: Optional[str] = None) -> int:
+    """
+    Write one journal entry inside the caller's transaction
+    A transfer is a single row with both legs; deposits and unlocks only have a
+    credit leg, withdrawals and locks only a debit leg. Each entry is stamped with
+    a monotonic epoch-microsecond timestamp and a time-sortable ULID reference.
+    Returns:
+        int: The journal entry ID
+    """
+    created_at_us = now_micros()
+    cursor.execute(
+        """INSERT INTO journal_entries
+        (type, amount, debit_account_id, credit_account_id, description, reference, status,
+         created_at_us, txn_ref)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (type, str(amount), debit_account_id, credit_account_id, description, reference, "completed",
+         created_at_us, generate_ulid(created_at_us))
+    )
+    return cursor.lastrowid
+
+def migrate_legacy_transactions(cursor: sqlite3.Cursor) -> int:
+    """
+    Copy rows from the old two-rows-per-transfer transactions table into the journal
+    transfer_out/transfer_in pairs linked by the 'sender_txn_<id>' reference are
+    merged into one entry; everything else maps to a single-leg entry.
+    Returns:
+        int: Number of journal entries written
+    """
+    cursor.execute(
+        """SELECT id, account_id, type, amount, description, reference, status, created_at
+        FROM transactions ORDER BY id"""
+    )
+    rows = cursor.fetchall()
+    transfer_out_ids = {row["id"] for row in rows if row["type"] == "transfer_out"}
+    receivers = {}
+    for row in rows:
+        reference = row["reference"] or ""
+        if row["type"] == "transfer_in" and reference.startswith("sender_txn_"):
+            sender_txn_id = reference[len("sender_txn_"):]
+            if sender_txn_id.isdigit() and int(sender_txn_id) in transfer_out_ids:
+                receivers[int(sender_txn_id)] = row
+    merged_ids = {row["id"] for row in receivers.values()}
+
+    entries = []
+    for row in rows:
+        debit_id, credit_id, type = row["account_id"], None, row["type"]
+        description = row["description"]
+        if type == "transfer_out":
+            receiver = receivers.get(row["id"])
+            credit_id = receiver["account_id"] if receiver else None
+            type = "transfer"
+            # Default descriptions are derived per leg when reading
+            if description == f"Transfer to {row['reference']}":
+                description = None
+        elif type == "transfer_in":
+            if row["id"] in merged_ids:
+                continue
+            debit_id, credit_id, type = None, row["account_id"], "transfer"
+        elif type in CREDIT_TYPES:
+            debit_id, credit_id = None, row["account_id"]
+        entries.append((
+            type, row["amount"], debit_id, credit_id, description,
+            row["reference"], row["status"] or "completed", row["created_at"]
+        ))
+
+    cursor.executemany(
+        """INSERT INTO journal_entries
+        (type, amount, debit_account_id, credit_account_id, description, reference, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        entries
+    )
+    return len(entries)
+
+
+def backfill_entry_timestamps(cursor: sqlite3.Cursor) -> int:
+    """
+    Fill created_at_us and txn_ref for entries written before those columns existed
+    The microsecond timestamp is derived from the one-second created_at text.
+    Returns:
+        int: Number of entries updated
+    """
+    cursor.execute(
+        """UPDATE journal_entries
+        SET created_at_us = COALESCE(CAST(strftime('%s', created_at) AS INTEGER), 0) * 1000000
+        WHERE created_at_us IS NULL"""
+    )
+    cursor.execute("SELECT id, created_at_us FROM journal_entries WHERE txn_ref IS NULL")
+    refs = [(generate_ulid(row["created_at_us"]), row["id"]) for row in cursor.fetchall()]
+    cursor.executemany("UPDATE journal_entries SET txn_ref = ? WHERE id = ?", refs)
+    return len(refs)
@@ -0,0 +1,160 @@
+"""
+In-process operation metrics
+
+Every instrumented ledger, auth and admin call records its latency in a
+log-linear histogram and bumps a counter, both labelled with the operation
+name and its outcome (success, insufficient_funds, limit_exceeded, db_error,
+rejected, ...). The registry can be exported in the Prometheus text format,
+either to a file for a textfile collector or over a local HTTP endpoint.
+"""
+import functools
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Tuple
+from src.histogram import Histogram
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_lock = threading.Lock()
+_histograms: Dict[Tuple[str, str], Histogram] = {}
+_counters: Dict[Tuple[str, str], int] = {}
+
+# Failure messages of the posting functions, mapped to an outcome label
+_OUTCOMES = (
+    ("Insufficient funds", "insufficient_funds"),
+    ("exceeds maximum limit", "limit_exceeded"),
+    ("exceeds locked funds", "limit_exceeded"),
+    ("Database error", "db_error"),
+    ("Incorrect PIN", "invalid_pin"),
+    ("not found", "not_found"),
+)
+
+def classify(result) -> str:
+    """Map an operation's return value to an outcome label"""
+    if isinstance(result, tuple) and len(result) == 2 and isinstance(result[0], bool):
+        success, message = result
+        if success:
+            return "success"
+        for fragment, outcome in _OUTCOMES:
+            if fragment in message:
+                return outcome
+        return "rejected"
+    if result is None or result is False:
+        return "rejected"
+    return "success"
+
+def observe(operation: str, outcome: str, seconds: float) -> None:
+    """Record one call of an operation"""
+    key = (operation, outcome)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        _counters[key] = _counters.get(key, 0) + 1
+    histogram.record(seconds * 1_000_000)
+
+def instrumented(operation: str):
+    """Decorator recording latency and outcome of every call under the given name"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            begin = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except sqlite3.Error:
+                observe(operation, "db_error", time.perf_counter() - begin)
+                raise
+            except Exception:
+                observe(operation, "error", time.perf_counter() - begin)
+                raise
+            observe(operation, classify(result), time.perf_counter() - begin)
+            return result
+        return wrapper
+    return decorator
+
+def reset() -> None:
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+def snapshot() -> Dict[str, Dict[str, dict]]:
+    """
+    Return the recorded metrics
+    Returns:
+        dict: {operation: {outcome: {count, mean, p50, p95, p99, max}}} with latencies in microseconds
+    """
+    with _lock:
+        items = list(_histograms.items())
+    result = {}
+    for (operation, outcome), histogram in sorted(items):
+        result.setdefault(operation, {})[outcome] = histogram.summary()
+    return result
+
+def _labels(operation: str, outcome: str) -> str:
+    return f'operation="{operation}",outcome="{outcome}"'
+
+def export_prometheus() -> str:
+    """Render counters and latency summaries in the Prometheus text exposition format"""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted(_histograms.items())
+    lines = [
+        "# HELP bank_operations_total Ledger, auth and admin calls by outcome.",
+        "# TYPE bank_operations_total counter",
+    ]
+    for (operation, outcome), count in counters:
+        lines.append(f"bank_operations_total{{{_labels(operation, outcome)}}} {count}")
+    lines += [
+        "# HELP bank_operation_duration_seconds Call latency by operation and outcome.",
+        "# TYPE bank_operation_duration_seconds summary",
+    ]
+    for (operation, outcome), histogram in histograms:
+        labels = _labels(operation, outcome)
+        for quantile in QUANTILES:
+            value = histogram.percentile(quantile * 100) / 1_000_000
+            lines.append(f'bank_operation_duration_seconds{{{labels},quantile="{quantile}"}} {value:.6f}')
+        lines.append(f"bank_operation_duration_seconds_sum{{{labels}}} {histogram.total / 1_000_000:.6f}")
+        lines.append(f"bank_operation_duration_seconds_count{{{labels}}} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path: str) -> None:
+    """Atomically write the exposition to a file, e.g. for node_exporter's textfile collector"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(export_prometheus())
+    os.replace(tmp_path, path)
+
+def serve_metrics(port: int = 9464, host: str = "127.0.0.1"):
+    """
+    Serve /metrics on a background thread
+    Args:
+        port: TCP port to listen on (0 picks a free port)
+        host: Interface to bind; defaults to loopback only
+    Returns:
+        ThreadingHTTPServer: Call shutdown() on it to stop serving
+    """
+    # Imported here: metrics is loaded on the login path and http.server is slow to import
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = export_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="bank-metrics", daemon=True).start()
+    return server
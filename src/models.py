@@ -28,7 +28,10 @@ class Transaction:
     def __init__(self, id: int, account_id: int, type: str, 
                  amount: float, description: Optional[str] = None,
                  reference: Optional[str] = None, status: str = "completed",
-                 created_at: Optional[datetime] = None):
+                 created_at: Optional[datetime] = None,
+                 counterparty_account_id: Optional[int] = None,
+                 created_at_us: Optional[int] = None,
+                 txn_ref: Optional[str] = None):
         self.id = id
         self.account_id = account_id
         self.type = type
@@ -36,4 +39,16 @@ class Transaction:
         self.description = description
         self.reference = reference
         self.status = status
-        self.created_at = created_at
\ No newline at end of file
+        self.created_at = created_at
+        self.counterparty_account_id = counterparty_account_id
+        self.created_at_us = created_at_us
+        self.txn_ref = txn_ref
+
+class AccountSnapshot:
+    def __init__(self, account_id: int, balance, transactions: list,
+                 locked_funds: list, as_of: Optional[int] = None):
+        self.account_id = account_id
+        self.balance = balance
+        self.transactions = transactions
+        self.locked_funds = locked_funds
+        self.as_of = as_of
@@ -0,0 +1,140 @@
+"""
+Cache of admin listing pages and the detail rows fetched with them
+
+Admin listings fetch each page together with the details their popups show
+(owner, account number, balance, blocked flag), so a page is kept here keyed
+by the query that produced it and reused until a commit changes what it shows.
+
+A long-lived watcher connection per database reads PRAGMA data_version, which
+moves whenever another connection (in this or another process) commits. Only
+then is anything checked, in two steps:
+
+- The reference_version counter (see database.REFERENCE_VERSION_DDL) moves
+  with every change to users, accounts or the archive catalog. Those are rare
+  admin actions that can reorder or refilter any page, so every page is dropped.
+- Otherwise the commits only posted journal entries. The entries written since
+  the last check are scanned, and a page is dropped only if one of them moves
+  the balance of an account the page shows, or sorts into the page's window of
+  the listing (see Scope). Postings to other accounts leave the page cached.
+
+A page that loaded while a commit landed is returned but not cached.
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, Optional, Sequence
+from src import database
+from src.watched_cache import WatchedCache, WatchedStore
+
+CACHE_SIZE = 64
+
+class Scope:
+    """What a cached page depends on besides users, accounts and the archive catalog"""
+    def __init__(self, accounts: Iterable[Optional[int]] = (), columns: Sequence[str] = (),
+                 descending: bool = False, after: Optional[Sequence] = None, last: Optional[Sequence] = None):
+        """
+        Args:
+            accounts: Accounts whose balance or postings the page shows
+            columns: Journal columns the listing is sorted by; empty if new entries can never be listed
+            descending: Whether the listing sorts by columns in descending order
+            after: Sort key the page starts after; None for the first page
+            last: Sort key of the page's last row; None if the page was not full, so it ends the listing
+        """
+        self.accounts = set(accounts) - {None}
+        self.columns = tuple(columns)
+        self.descending = descending
+        self.after = tuple(after) if after is not None else None
+        self.last = tuple(last) if last is not None else None
+
+    def affected_by(self, entry) -> bool:
+        """True if a new journal entry changes the page: it posts to a shown account or may be listed on it"""
+        if entry["debit_account_id"] in self.accounts or entry["credit_account_id"] in self.accounts:
+            return True
+        if not self.columns:
+            return False
+        # Filters are not re-checked here; an entry in the key window is assumed to match them
+        key = tuple(entry[column] for column in self.columns)
+        if self.descending:
+            return (self.after is None or key < self.after) and (self.last is None or key >= self.last)
+        return (self.after is None or key > self.after) and (self.last is None or key <= self.last)
+
+class _Page:
+    def __init__(self, value: Any, scope: Scope):
+        self.value = value
+        self.scope = scope
+
+class _Store(WatchedStore):
+    """Cached pages of one database file"""
+    def __init__(self, stats):
+        super().__init__(stats)
+        self.pages: "OrderedDict[Hashable, _Page]" = OrderedDict()
+        cursor = self.watcher.cursor()
+        self.reference_version = database.reference_version(cursor)
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM journal_entries")
+        # Every cached page is exact at least up to this journal entry id
+        self.checked_through = cursor.fetchone()[0]
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def validate(self) -> int:
+        """Drop the pages the commits since the last call changed; returns the current data_version"""
+        if not self.changed():
+            return self.data_version
+        cursor = self.watcher.cursor()
+        # One read transaction, so the counter and the new entries are from the same commit
+        cursor.execute("BEGIN")
+        try:
+            reference_version = database.reference_version(cursor)
+            cursor.execute(
+                """SELECT id, debit_account_id, credit_account_id, created_at_us, amount
+                FROM journal_entries WHERE id > ? ORDER BY id""",
+                (self.checked_through,)
+            )
+            columns = [col[0] for col in cursor.description]
+            entries = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            self.watcher.rollback()
+        if reference_version != self.reference_version:
+            self.reference_version = reference_version
+            if self.pages:
+                self.pages.clear()
+                self.stats["invalidations"] += 1
+        for entry in entries:
+            for key in [key for key, page in self.pages.items() if page.scope.affected_by(entry)]:
+                del self.pages[key]
+                self.stats["invalidations"] += 1
+            self.checked_through = entry["id"]
+        return self.data_version
+
+_cache = WatchedCache(_Store, "pages")
+_stats = _cache.stats
+clear = _cache.clear
+cache_stats = _cache.cache_stats
+reset_stats = _cache.reset_stats
+
+def get_or_load(key: Hashable, load: Callable[[], Any], scope: Callable[[Any], Scope]) -> Any:
+    """
+    Return the cached page for a key, loading and caching it on a miss
+    Args:
+        key: Hashable description of the query, e.g. its function name and arguments
+        load: Runs the query; called without the cache lock held
+        scope: Builds the Scope of a page load() returned
+    """
+    with _cache.lock:
+        store = _cache.get_store()
+        data_version = store.validate()
+        if key in store.pages:
+            store.pages.move_to_end(key)
+            _stats["hits"] += 1
+            return store.pages[key].value
+        _stats["misses"] += 1
+    page = load()
+    page_scope = scope(page)
+    with _cache.lock:
+        store = _cache.get_store()
+        # Only keep the page if nothing was committed since the version was read
+        if store.validate() == data_version:
+            store.pages[key] = _Page(page, page_scope)
+            if len(store.pages) > CACHE_SIZE:
+                store.pages.popitem(last=False)
+                _stats["evictions"] += 1
+    return page
@@ -0,0 +1,263 @@
+"""
+Opt-in SQL tracing for connections made by get_db_connection()
+
+Enable with the BANK_SQL_TRACE environment variable or `enable()`. Traced
+connections time every statement run through their cursors (execute plus the
+fetches that follow it), count the rows returned and keep a latency histogram
+per normalized statement. Statements slower than SLOW_QUERY_MS are logged to
+the 'bank.sql' logger together with their EXPLAIN QUERY PLAN. A trace
+callback additionally counts every statement the engine runs, including
+implicit BEGINs and trigger bodies that never pass through a cursor.
+
+When tracing is disabled get_db_connection() returns plain connections, so
+the only cost is one flag check per connection.
+"""
+from collections import deque
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from src.histogram import Histogram
+
+ENABLED = bool(os.environ.get("BANK_SQL_TRACE"))
+SLOW_QUERY_MS = float(os.environ.get("BANK_SLOW_QUERY_MS", "50"))
+SLOW_QUERY_LOG_SIZE = 200
+
+logger = logging.getLogger("bank.sql")
+
+_lock = threading.Lock()
+_statements: Dict[str, "StatementStats"] = {}
+_engine_counts: Dict[str, int] = {}
+_slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+class StatementStats:
+    def __init__(self):
+        self.latency_us = Histogram()
+        self.rows = 0
+
+def normalize(sql: str) -> str:
+    """Reduce a statement to its shape: literals become ?, whitespace collapses"""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+def _record(conn: sqlite3.Connection, sql: str, parameters, seconds: float, rows: int) -> None:
+    key = normalize(sql)
+    with _lock:
+        stats = _statements.get(key)
+        if stats is None:
+            stats = _statements[key] = StatementStats()
+        stats.rows += rows
+    stats.latency_us.record(seconds * 1_000_000)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        plan = explain(conn, sql, parameters)
+        with _lock:
+            _slow_queries.append({
+                "sql": key, "ms": round(seconds * 1000, 2), "rows": rows, "plan": plan
+            })
+        logger.warning("Slow query (%.1f ms, %d rows): %s%s", seconds * 1000, rows, key,
+                       "".join(f"\n    {step}" for step in plan))
+
+def explain(conn: sqlite3.Connection, sql: str, parameters=()) -> list:
+    """Return the EXPLAIN QUERY PLAN lines for a statement, or [] if it has none"""
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")):
+        return []
+    try:
+        # Base-class execute: the plan lookup itself is not traced
+        rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+        return [row[-1] for row in rows]
+    except (sqlite3.Error, ValueError):
+        return []
+
+class TracedCursor(sqlite3.Cursor):
+    _sql = None
+
+    def _start(self, sql: str, parameters, seconds: float, rows: int = 0) -> None:
+        self._finish()
+        self._sql, self._parameters, self._seconds, self._rows = sql, parameters, seconds, rows
+
+    def _finish(self) -> None:
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            _record(self.connection, sql, self._parameters, self._seconds, self._rows)
+
+    def _timed(self, fetch, *args):
+        begin = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            if self._sql is not None:
+                self._seconds += time.perf_counter() - begin
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        begin = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            self._start(sql, parameters, time.perf_counter() - begin)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        begin = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            self._start(sql, (), time.perf_counter() - begin, max(self.rowcount, 0))
+            self._finish()
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        elif self._sql is not None:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if self._sql is not None:
+            self._rows += len(rows)
+            if len(rows) < (self.arraysize if size is None else size):
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._sql is not None:
+            self._rows += len(rows)
+            self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._sql is not None:
+            self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+class TracedConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_count_engine_statement)
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        begin = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            _record(self, "COMMIT", (), time.perf_counter() - begin, 0)
+
+def _count_engine_statement(sql: str) -> None:
+    key = normalize(sql)
+    with _lock:
+        _engine_counts[key] = _engine_counts.get(key, 0) + 1
+
+def connect(database, **kwargs) -> sqlite3.Connection:
+    """Open a traced connection"""
+    return sqlite3.connect(database, factory=TracedConnection, **kwargs)
+
+def enable(slow_query_ms: Optional[float] = None) -> None:
+    """Trace connections opened from now on"""
+    global ENABLED, SLOW_QUERY_MS
+    if slow_query_ms is not None:
+        SLOW_QUERY_MS = slow_query_ms
+    ENABLED = True
+
+def disable() -> None:
+    global ENABLED
+    ENABLED = False
+
+def reset() -> None:
+    """Forget all recorded statistics"""
+    with _lock:
+        _statements.clear()
+        _engine_counts.clear()
+        _slow_queries.clear()
+
+def statement_stats() -> Dict[str, dict]:
+    """Per normalized statement: latency summary in microseconds and total rows"""
+    with _lock:
+        items = list(_statements.items())
+    return {sql: dict(stats.latency_us.summary(), rows=stats.rows) for sql, stats in items}
+
+def statement_histograms() -> Dict[str, Histogram]:
+    """Per normalized statement: a copy of its latency histogram in microseconds"""
+    with _lock:
+        items = list(_statements.items())
+    result = {}
+    for sql, stats in items:
+        result[sql] = Histogram()
+        result[sql].merge(stats.latency_us)
+    return result
+
+def slow_queries() -> list:
+    with _lock:
+        return list(_slow_queries)
+
+def engine_statement_counts() -> Dict[str, int]:
+    with _lock:
+        return dict(_engine_counts)
+
+def report(top: int = 20) -> str:
+    """Format the statements with the highest total time as a text table"""
+    stats = sorted(
+        statement_stats().items(), key=lambda item: item[1]["mean"] * item[1]["count"], reverse=True
+    )[:top]
+    lines = [f"{'count':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'rows':>9}  statement"]
+    for sql, s in stats:
+        lines.append(
+            f"{s['count']:>8} {s['p50'] / 1000:>9.2f} {s['p95'] / 1000:>9.2f} {s['p99'] / 1000:>9.2f} "
+            f"{s['max'] / 1000:>9.2f} {s['rows']:>9}  {sql[:120]}"
+        )
+    slow = slow_queries()
+    if slow:
+        lines.append("")
+        lines.append(f"Slow queries (>= {SLOW_QUERY_MS:g} ms), most recent last:")
+        for query in slow[-top:]:
+            lines.append(f"  {query['ms']:.1f} ms, {query['rows']} rows: {query['sql'][:120]}")
+            lines.extend(f"      {step}" for step in query["plan"])
+    return "\n".join(lines)
+
+def dump_report(path: str) -> None:
+    """Write statement statistics, engine statement counts and slow queries as JSON"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "statements": statement_stats(),
+            "engine_statements": engine_statement_counts(),
+            "slow_queries": slow_queries(),
+        }, f, indent=2)
@@ -0,0 +1,134 @@
+"""
+Ledger reconciliation
+
+Checks that the stored balances and locks agree with the journal, which every
+posting function writes in the same transaction as the balance change:
+
+* no account balance (including parked shard credits) or active lock is negative
+* each account's balance equals its journal credits minus its journal debits
+* active locked funds equal the journal's locks minus its unlocks
+* balances plus locked funds equal all deposits minus all withdrawals
+"""
+import sqlite3
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+from src import archive
+from src.database import get_db_connection
+from src.sharding import TOTAL_BALANCE_SQL
+
+# Differences below half a paisa are floating point noise of the REAL columns
+TOLERANCE = Decimal("0.005")
+MAX_REPORTED = 20
+
+# Per-account credit and debit totals and per-type totals of one journal table
+CREDIT_TOTALS_SQL = """SELECT credit_account_id, SUM(amount) FROM {schema}journal_entries
+    WHERE credit_account_id IS NOT NULL GROUP BY credit_account_id"""
+DEBIT_TOTALS_SQL = """SELECT debit_account_id, SUM(amount) FROM {schema}journal_entries
+    WHERE debit_account_id IS NOT NULL GROUP BY debit_account_id"""
+TYPE_TOTALS_SQL = """SELECT type, SUM(amount) FROM {schema}journal_entries
+    WHERE type IN ('deposit', 'withdraw', 'lock', 'unlock') GROUP BY type"""
+
+def _money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
+def check_ledger(conn: Optional[sqlite3.Connection] = None, check_archives: bool = True) -> dict:
+    """
+    Reconcile balances and locks against the journal
+    Args:
+        conn: Connection to check, e.g. to a backup file; defaults to the current database
+        check_archives: Include the current database's cold-storage partitions in the journal totals
+    Returns:
+        dict: Money totals and a list of violations (empty when the ledger is consistent)
+    """
+    if conn is None:
+        with get_db_connection() as own_conn:
+            return check_ledger(own_conn, check_archives)
+
+    cursor = conn.cursor()
+    cursor.execute("BEGIN")
+    try:
+        violations = []
+        cursor.execute(
+            f"""SELECT COUNT(*), COALESCE(SUM({TOTAL_BALANCE_SQL}), 0) FROM accounts a"""
+        )
+        accounts, balances = cursor.fetchone()
+        cursor.execute(
+            f"SELECT a.id, {TOTAL_BALANCE_SQL} FROM accounts a WHERE {TOTAL_BALANCE_SQL} < -{TOLERANCE} LIMIT ?",
+            (MAX_REPORTED,)
+        )
+        for account_id, balance in cursor.fetchall():
+            violations.append(f"Account ID {account_id} has negative balance {_money(balance)}")
+
+        cursor.execute(
+            "SELECT COALESCE(SUM(CAST(amount AS REAL)), 0), COALESCE(MIN(CAST(amount AS REAL)), 0) "
+            "FROM locked_funds WHERE is_unlocked = 0"
+        )
+        locked, smallest_lock = cursor.fetchone()
+        if smallest_lock < 0:
+            violations.append(f"Active lock with negative amount {_money(smallest_lock)}")
+
+        cursor.execute(f"SELECT a.id, {TOTAL_BALANCE_SQL} FROM accounts a")
+        account_balances = cursor.fetchall()
+        sources = [_journal_totals(cursor, "")]
+        archived = check_archives and archive.has_archives(cursor)
+    finally:
+        conn.rollback()
+
+    if archived:
+        # Partitions are immutable; do not run this while archive_entries() is moving rows
+        sources.append(_archived_totals())
+    ledger, totals = {}, {}
+    for legs, type_totals in sources:
+        for account_id, amount in legs.items():
+            ledger[account_id] = ledger.get(account_id, 0) + amount
+        for type, amount in type_totals.items():
+            totals[type] = totals.get(type, 0) + amount
+
+    mismatched = [
+        (account_id, balance, ledger.get(account_id, 0)) for account_id, balance in account_balances
+        if abs(_money(balance) - _money(ledger.get(account_id, 0))) >= TOLERANCE
+    ]
+    for account_id, balance, journal in mismatched[:MAX_REPORTED]:
+        violations.append(
+            f"Account ID {account_id} balance {_money(balance)} does not match journal {_money(journal)}"
+        )
+
+    deposited, withdrawn = _money(totals.get("deposit")), _money(totals.get("withdraw"))
+    journal_locked = _money(totals.get("lock")) - _money(totals.get("unlock"))
+    balances, locked = _money(balances), _money(locked)
+    if abs(locked - journal_locked) >= TOLERANCE:
+        violations.append(f"Locked funds {locked} do not match journal locks {journal_locked}")
+    if abs(balances + locked - (deposited - withdrawn)) >= TOLERANCE:
+        violations.append(
+            f"Balances {balances} plus locked {locked} do not equal deposits {deposited} "
+            f"minus withdrawals {withdrawn}"
+        )
+    return {
+        "accounts": accounts,
+        "balances": balances,
+        "locked": locked,
+        "deposited": deposited,
+        "withdrawn": withdrawn,
+        "violations": violations,
+    }
+
+def _journal_totals(cursor: sqlite3.Cursor, schema: str) -> Tuple[Dict[int, float], Dict[str, float]]:
+    legs: Dict[int, float] = {}
+    for sql, sign in ((CREDIT_TOTALS_SQL, 1), (DEBIT_TOTALS_SQL, -1)):
+        cursor.execute(sql.format(schema=schema))
+        for account_id, amount in cursor.fetchall():
+            legs[account_id] = legs.get(account_id, 0) + sign * amount
+    cursor.execute(TYPE_TOTALS_SQL.format(schema=schema))
+    return legs, dict(cursor.fetchall())
+
+def _archived_totals() -> Tuple[Dict[int, float], Dict[str, float]]:
+    legs: Dict[int, float] = {}
+    totals: Dict[str, float] = {}
+    for sql, sign in ((CREDIT_TOTALS_SQL, 1), (DEBIT_TOTALS_SQL, -1)):
+        for _, rows in archive.query_partitions(sql):
+            for account_id, amount in rows:
+                legs[account_id] = legs.get(account_id, 0) + sign * amount
+    for _, rows in archive.query_partitions(TYPE_TOTALS_SQL):
+        for type, amount in rows:
+            totals[type] = totals.get(type, 0) + amount
+    return legs, totals
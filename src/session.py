@@ -0,0 +1,111 @@
+"""
+Per-user session cache
+
+Holds the logged-in user, their accounts and blocked status so the login
+screen and dashboards do not re-query them. A session is loaded with one
+joined query, expires after SESSION_TTL_SECONDS and is dropped whenever one of
+its accounts is blocked, unblocked or created.
+"""
+import threading
+import time
+from typing import Dict, List, Optional
+from src import database
+from src.database import get_db_connection
+from src.models import Account, User
+from src.sharding import TOTAL_BALANCE_SQL
+
+SESSION_TTL_SECONDS = 5 * 60
+
+_sessions: Dict[tuple, "Session"] = {}
+_sessions_lock = threading.Lock()
+
+class Session:
+    def __init__(self, user: User, accounts: List[Account]):
+        self.user = user
+        self.accounts = accounts
+        self.loaded_at = time.monotonic()
+
+    @property
+    def is_blocked(self) -> bool:
+        """True if any of the user's accounts is blocked"""
+        return any(account.is_blocked for account in self.accounts)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() - self.loaded_at > SESSION_TTL_SECONDS
+
+    def get_account(self, account_id: int) -> Optional[Account]:
+        for account in self.accounts:
+            if account.id == account_id:
+                return account
+        return None
+
+def _session_key(user_id: int) -> tuple:
+    return (str(database.DB_PATH), user_id)
+
+def load_session(user_id: int) -> Optional[Session]:
+    """
+    Load a user and all their accounts with a single query and cache the result
+    Args:
+        user_id: ID of the user
+    Returns:
+        Session: The fresh session, or None if the user does not exist
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""SELECT u.id AS user_id, u.username, u.role, u.full_name, u.email, u.created_at,
+            a.id AS account_id, a.account_number, a.account_type, a.is_blocked,
+            {TOTAL_BALANCE_SQL} AS balance
+            FROM users u
+            LEFT JOIN accounts a ON a.user_id = u.id
+            WHERE u.id = ?
+            ORDER BY a.id""",
+            (user_id,)
+        )
+        rows = cursor.fetchall()
+
+    if not rows:
+        return None
+    first = rows[0]
+    user = User(
+        id=first["user_id"], username=first["username"], role=first["role"],
+        full_name=first["full_name"], email=first["email"], created_at=first["created_at"]
+    )
+    accounts = [
+        Account(
+            id=row["account_id"], user_id=row["user_id"], account_number=row["account_number"],
+            balance=row["balance"], account_type=row["account_type"], is_blocked=bool(row["is_blocked"])
+        )
+        for row in rows if row["account_id"] is not None
+    ]
+    session = Session(user, accounts)
+    with _sessions_lock:
+        _sessions[_session_key(user_id)] = session
+    return session
+
+def get_session(user_id: int) -> Optional[Session]:
+    """Return the cached session for a user, reloading it if missing or expired"""
+    with _sessions_lock:
+        session = _sessions.get(_session_key(user_id))
+    if session is None or session.expired:
+        return load_session(user_id)
+    return session
+
+def invalidate_user(user_id: int) -> None:
+    """Drop a user's cached session"""
+    with _sessions_lock:
+        _sessions.pop(_session_key(user_id), None)
+
+def invalidate_account(account_id: int) -> None:
+    """Drop every cached session that includes the given account"""
+    db_key = str(database.DB_PATH)
+    with _sessions_lock:
+        for key, session in list(_sessions.items()):
+            if key[0] == db_key and session.get_account(account_id):
+                del _sessions[key]
+
+def clear() -> None:
+    """Drop all cached sessions"""
+    with _sessions_lock:
+        _sessions.clear()
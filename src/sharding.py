@@ -0,0 +1,206 @@
+"""
+Balance sharding for hot accounts
+
+Usage:
+    python -m src.sharding enable 42 --shards 8
+    python -m src.sharding disable 42
+    python -m src.sharding fold --every 60
+
+A sharded account receives credits on one of shard_count balance_shards rows
+instead of its accounts row, so concurrent senders do not all rewrite the same
+row. Debits fold the pending shard credits back into the main balance first.
+fold_all_shards() does the same for every sharded account; run it periodically
+(the fold command above) so the main balance column stays close to the total.
+"""
+from decimal import Decimal
+import argparse
+import random
+import sqlite3
+import time
+from typing import Optional, Tuple
+from src import database
+from src.database import get_db_connection
+
+DEFAULT_SHARD_COUNT = 8
+MAX_SHARD_COUNT = 64
+
+# Exact balance of accounts row `a`: main balance plus any credits still parked in shards
+TOTAL_BALANCE_SQL = (
+    "a.balance + COALESCE((SELECT SUM(s.amount) FROM balance_shards s "
+    "WHERE s.account_id = a.id), 0)"
+)
+
+def get_shard_count(cursor: sqlite3.Cursor, account_id: int) -> int:
+    """Return the number of credit shards for an account (0 if not sharded or not found)"""
+    cursor.execute("SELECT shard_count FROM accounts WHERE id = ?", (account_id,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def credit_account(cursor: sqlite3.Cursor, account_id: int, amount: Decimal) -> bool:
+    """
+    Credit an account inside the caller's transaction
+    Sharded accounts receive the credit on a random shard row so concurrent
+    senders do not all rewrite the same accounts row.
+    Args:
+        cursor: Cursor of the open posting transaction
+        account_id: The account ID to credit
+        amount: The amount to credit
+    Returns:
+        bool: False if the account does not exist
+    """
+    # Unsharded accounts, nearly all of them, are credited by this one statement
+    cursor.execute(
+        "UPDATE accounts SET balance = balance + ? WHERE id = ? AND shard_count = 0",
+        (str(amount), account_id)
+    )
+    if cursor.rowcount:
+        return True
+    shards = get_shard_count(cursor, account_id)
+    if not shards:
+        return False
+    cursor.execute(
+        "UPDATE balance_shards SET amount = amount + ? WHERE account_id = ? AND shard = ?",
+        (str(amount), account_id, random.randrange(shards))
+    )
+    return cursor.rowcount > 0
+
+def fold_shards(cursor: sqlite3.Cursor, account_id: int) -> Decimal:
+    """
+    Move pending shard credits into the main balance inside the caller's transaction
+    Debit paths call this before reading the balance so the check sees the exact total.
+    Returns:
+        Decimal: The amount that was folded
+    """
+    cursor.execute(
+        "SELECT COALESCE(SUM(amount), 0) FROM balance_shards WHERE account_id = ?",
+        (account_id,)
+    )
+    pending = Decimal(cursor.fetchone()[0])
+    if pending:
+        cursor.execute(
+            "UPDATE accounts SET balance = balance + ? WHERE id = ?",
+            (str(pending), account_id)
+        )
+        cursor.execute(
+            "UPDATE balance_shards SET amount = 0 WHERE account_id = ? AND amount != 0",
+            (account_id,)
+        )
+    return pending
+
+def read_debit_balance(cursor: sqlite3.Cursor, account_id: int) -> Optional[Decimal]:
+    """
+    Read an account's balance for a debit inside the caller's transaction
+    Pending shard credits of a sharded account are folded in first so the check
+    sees the exact total; unsharded accounts, nearly all of them, cost one query.
+    Returns:
+        Decimal: The balance, or None if the account does not exist
+    """
+    cursor.execute("SELECT balance, shard_count FROM accounts WHERE id = ?", (account_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    if row[1] and fold_shards(cursor, account_id):
+        cursor.execute("SELECT balance FROM accounts WHERE id = ?", (account_id,))
+        row = cursor.fetchone()
+    return Decimal(row[0])
+
+def enable_balance_sharding(account_id: int, shard_count: int = DEFAULT_SHARD_COUNT) -> Tuple[bool, str]:
+    """
+    Spread incoming credits for a hot account across sub-balance rows
+    Args:
+        account_id: The account ID to shard
+        shard_count: Number of sub-balance rows to spread credits over
+    Returns:
+        Tuple[bool, str]: (success, message)
+    """
+    if not 1 <= shard_count <= MAX_SHARD_COUNT:
+        return False, f"Shard count must be between 1 and {MAX_SHARD_COUNT}"
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT id FROM accounts WHERE id = ?", (account_id,))
+            if not cursor.fetchone():
+                conn.rollback()
+                return False, f"Account ID {account_id} not found"
+
+            fold_shards(cursor, account_id)
+            cursor.execute("DELETE FROM balance_shards WHERE account_id = ?", (account_id,))
+            cursor.executemany(
+                "INSERT INTO balance_shards (account_id, shard, amount) VALUES (?, ?, 0)",
+                [(account_id, shard) for shard in range(shard_count)]
+            )
+            cursor.execute("UPDATE accounts SET shard_count = ? WHERE id = ?", (shard_count, account_id))
+
+            conn.commit()
+            return True, f"Account ID {account_id} now uses {shard_count} balance shards"
+        except sqlite3.Error as e:
+            conn.rollback()
+            return False, f"Sharding failed for account ID {account_id}: Database error ({str(e)})"
+
+def disable_balance_sharding(account_id: int) -> Tuple[bool, str]:
+    """Fold all shards into the main balance and return the account to a single row"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            fold_shards(cursor, account_id)
+            cursor.execute("DELETE FROM balance_shards WHERE account_id = ?", (account_id,))
+            cursor.execute("UPDATE accounts SET shard_count = 0 WHERE id = ?", (account_id,))
+            conn.commit()
+            return True, f"Balance sharding disabled for account ID {account_id}"
+        except sqlite3.Error as e:
+            conn.rollback()
+            return False, f"Unsharding failed for account ID {account_id}: Database error ({str(e)})"
+
+def fold_all_shards() -> int:
+    """
+    Fold pending shard credits for every sharded account
+    Meant to be run periodically so the main balance column stays close to the total.
+    Returns:
+        int: Number of accounts that had pending credits
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(
+                "SELECT DISTINCT account_id FROM balance_shards WHERE amount != 0"
+            )
+            account_ids = [row[0] for row in cursor.fetchall()]
+            for account_id in account_ids:
+                fold_shards(cursor, account_id)
+            conn.commit()
+            return len(account_ids)
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Fold shards error: {e}")
+            return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    enable = commands.add_parser("enable", help="shard an account's incoming credits")
+    enable.add_argument("account_id", type=int)
+    enable.add_argument("--shards", type=int, default=DEFAULT_SHARD_COUNT)
+    disable = commands.add_parser("disable", help="fold an account's shards and stop sharding it")
+    disable.add_argument("account_id", type=int)
+    fold = commands.add_parser("fold", help="fold pending shard credits of every sharded account")
+    fold.add_argument("--every", type=float, help="keep folding at this interval in seconds")
+    args = parser.parse_args()
+
+    database.initialize_database()
+    if args.command == "enable":
+        print(enable_balance_sharding(args.account_id, args.shards)[1])
+    elif args.command == "disable":
+        print(disable_balance_sharding(args.account_id)[1])
+    else:
+        while True:
+            print(f"Folded pending credits of {fold_all_shards()} accounts")
+            if not args.every:
+                break
+            time.sleep(args.every)
+
+if __name__ == "__main__":
+    main()
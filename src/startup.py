@@ -0,0 +1,43 @@
+"""
+Startup phase timing
+
+Import this module first so its clock starts with the process. Phases are
+recorded with `phase()` or `mark()` and printed by `report()` when the
+BANK_STARTUP_PROFILE environment variable is set. For a per-module import
+breakdown run the app with `python -X importtime main.py`.
+"""
+from contextlib import contextmanager
+import os
+import time
+
+PROFILE_ENABLED = bool(os.environ.get("BANK_STARTUP_PROFILE"))
+
+_started = time.perf_counter()
+_phases = []
+
+@contextmanager
+def phase(name: str):
+    """Time a startup phase"""
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, time.perf_counter() - begin))
+
+def mark(name: str) -> float:
+    """Record a milestone measured from process start and return it in seconds"""
+    elapsed = time.perf_counter() - _started
+    _phases.append((name, elapsed))
+    return elapsed
+
+def phases() -> list:
+    return list(_phases)
+
+def report() -> str:
+    """Format the recorded phases, one per line, in milliseconds"""
+    width = max((len(name) for name, _ in _phases), default=0)
+    return "\n".join(f"{name:<{width}}  {seconds * 1000:8.1f} ms" for name, seconds in _phases)
+
+def print_report() -> None:
+    if PROFILE_ENABLED:
+        print(report())
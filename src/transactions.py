@@ -2,8 +2,13 @@ from decimal import Decimal
 import sqlite3
 from typing import List, Optional, Tuple
 from src.database import get_db_connection
-from src.models import Transaction
-import bcrypt
+from src.models import AccountSnapshot, Transaction
+from src.idempotency import commit_result, find_result, get_cached_result
+from src.metrics import instrumented
+from src.journal import ACCOUNT_POSTINGS_SQL, MAX_TIMESTAMP_US, MIN_TIMESTAMP_US, account_postings_sql, post_entry, posting_from_row
+from src import account_cache, archive
+from src.hashing import HashingBusy, hash_secret, needs_rehash, verify_secret
+from src.sharding import TOTAL_BALANCE_SQL, credit_account, read_debit_balance
 import re
 
 MAX_DEPOSIT = Decimal("1000000")  # ₹10,00,000
@@ -18,6 +23,17 @@ def sanitize_description(description: Optional[str]) -> Optional[str]:
     description = re.sub(r'[;\"\'\\]', '', description.strip())
     return description[:100] if description else None
 
+ACCOUNT_BY_NUMBER_SQL = f"""SELECT a.id, a.user_id, a.account_number, {TOTAL_BALANCE_SQL} AS balance, a.account_type 
+                   FROM accounts a WHERE a.account_number = ?"""
+
+def _account_by_number(cursor: sqlite3.Cursor, account_number: str) -> Optional[dict]:
+    cursor.execute(ACCOUNT_BY_NUMBER_SQL, (account_number,))
+    result = cursor.fetchone()
+    if result:
+        columns = [col[0] for col in cursor.description]
+        return dict(zip(columns, result))
+    return None
+
 def get_account_by_number(account_number: str) -> Optional[dict]:
     """
     Get an account by its account number
@@ -29,30 +45,28 @@ def get_account_by_number(account_number: str) -> Optional[dict]:
     with get_db_connection() as conn:
         cursor = conn.cursor()
         try:
-            cursor.execute(
-                """SELECT id, user_id, account_number, balance, account_type 
-                   FROM accounts WHERE account_number = ?""",
-                (account_number,)
-            )
-            result = cursor.fetchone()
-            if result:
-                columns = [col[0] for col in cursor.description]
-                return dict(zip(columns, result))
-            return None
+            return _account_by_number(cursor, account_number)
         except sqlite3.Error as e:
             print(f"Get account error for account number {account_number}: {e}")
             return None
 
-def deposit(account_id: int, amount: Decimal, description: Optional[str] = None) -> Tuple[bool, str]:
+@instrumented("deposit")
+def deposit(account_id: int, amount: Decimal, description: Optional[str] = None,
+            idempotency_key: Optional[str] = None) -> Tuple[bool, str]:
     """
     Deposit funds into an account
     Args:
         account_id: The account ID to deposit to
         amount: The amount to deposit (must be positive)
         description: Optional description of the deposit
+        idempotency_key: Optional client key; a retry with the same key returns the original result
     Returns:
         Tuple[bool, str]: (success, message)
     """
+    if idempotency_key:
+        cached = get_cached_result(idempotency_key, "deposit")
+        if cached:
+            return cached
     if not isinstance(amount, Decimal) or amount <= 0:
         return False, "Please enter a positive amount"
     if amount > MAX_DEPOSIT:
@@ -63,38 +77,46 @@ def deposit(account_id: int, amount: Decimal, description: Optional[str] = None)
     with get_db_connection() as conn:
         cursor = conn.cursor()
         try:
-            cursor.execute("BEGIN TRANSACTION")
-            cursor.execute(
-                "UPDATE accounts SET balance = balance + ? WHERE id = ?",
-                (str(amount), account_id)
-            )
-            if cursor.rowcount == 0:
+            cursor.execute("BEGIN IMMEDIATE")
+            if idempotency_key:
+                previous = find_result(cursor, idempotency_key, "deposit")
+                if previous:
+                    conn.rollback()
+                    return previous
+            if not credit_account(cursor, account_id, amount):
                 conn.rollback()
                 return False, f"Account ID {account_id} not found"
             
-            cursor.execute(
-                """INSERT INTO transactions 
-                (account_id, type, amount, description, status)
-                VALUES (?, ?, ?, ?, ?)""",
-                (account_id, "deposit", str(amount), description or "Deposit", "completed")
+            entry_id = post_entry(
+                cursor, "deposit", amount,
+                credit_account_id=account_id,
+                description=description or "Deposit"
             )
             
-            conn.commit()
-            return True, f"Successfully deposited ₹{amount:,.2f}"
+            result = commit_result(conn, idempotency_key, "deposit", (True, f"Successfully deposited ₹{amount:,.2f}"))
+            account_cache.record_posting(entry_id, account_id)
+            return result
         except sqlite3.Error as e:
             conn.rollback()
             return False, f"Deposit failed for account ID {account_id}: Database error ({str(e)})"
 
-def withdraw(account_id: int, amount: Decimal, description: Optional[str] = None) -> Tuple[bool, str]:
+@instrumented("withdraw")
+def withdraw(account_id: int, amount: Decimal, description: Optional[str] = None,
+             idempotency_key: Optional[str] = None) -> Tuple[bool, str]:
     """
     Withdraw funds from an account
     Args:
         account_id: The account ID to withdraw from
         amount: The amount to withdraw (must be positive)
         description: Optional description of the withdrawal
+        idempotency_key: Optional client key; a retry with the same key returns the original result
     Returns:
         Tuple[bool, str]: (success, message)
     """
+    if idempotency_key:
+        cached = get_cached_result(idempotency_key, "withdraw")
+        if cached:
+            return cached
     if not isinstance(amount, Decimal) or amount <= 0:
         return False, "Please enter a positive amount"
     if amount > MAX_WITHDRAW:
@@ -105,17 +127,17 @@ def withdraw(account_id: int, amount: Decimal, description: Optional[str] = None
     with get_db_connection() as conn:
         cursor = conn.cursor()
         try:
-            cursor.execute("BEGIN TRANSACTION")
-            cursor.execute(
-                "SELECT balance FROM accounts WHERE id = ?",
-                (account_id,)
-            )
-            result = cursor.fetchone()
-            if not result:
+            cursor.execute("BEGIN IMMEDIATE")
+            if idempotency_key:
+                previous = find_result(cursor, idempotency_key, "withdraw")
+                if previous:
+                    conn.rollback()
+                    return previous
+            balance = read_debit_balance(cursor, account_id)
+            if balance is None:
                 conn.rollback()
                 return False, f"Account ID {account_id} not found"
                 
-            balance = Decimal(result["balance"])
             if balance < amount:
                 conn.rollback()
                 return False, f"Insufficient funds in account ID {account_id}"
@@ -125,20 +147,22 @@ def withdraw(account_id: int, amount: Decimal, description: Optional[str] = None
                 (str(amount), account_id)
             )
             
-            cursor.execute(
-                """INSERT INTO transactions 
-                (account_id, type, amount, description, status)
-                VALUES (?, ?, ?, ?, ?)""",
-                (account_id, "withdraw", str(amount), description or "Withdrawal", "completed")
+            entry_id = post_entry(
+                cursor, "withdraw", amount,
+                debit_account_id=account_id,
+                description=description or "Withdrawal"
             )
             
-            conn.commit()
-            return True, f"Successfully withdrawn ₹{amount:,.2f}"
+            result = commit_result(conn, idempotency_key, "withdraw", (True, f"Successfully withdrawn ₹{amount:,.2f}"))
+            account_cache.record_posting(entry_id, account_id)
+            return result
         except sqlite3.Error as e:
             conn.rollback()
             return False, f"Withdrawal failed for account ID {account_id}: Database error ({str(e)})"
 
-def transfer_funds(sender_account_id: int, receiver_account_number: str, amount: Decimal, description: Optional[str] = None) -> Tuple[bool, str]:
+@instrumented("transfer_funds")
+def transfer_funds(sender_account_id: int, receiver_account_number: str, amount: Decimal, description: Optional[str] = None,
+                   idempotency_key: Optional[str] = None) -> Tuple[bool, str]:
     """
     Transfer funds from one account to another
     Args:
@@ -146,9 +170,14 @@ def transfer_funds(sender_account_id: int, receiver_account_number: str, amount:
         receiver_account_number: The account number of the receiver
         amount: The amount to transfer (must be positive)
         description: Optional description of the transfer
+        idempotency_key: Optional client key; a retry with the same key returns the original result
     Returns:
         Tuple[bool, str]: (success, message)
     """
+    if idempotency_key:
+        cached = get_cached_result(idempotency_key, "transfer_funds")
+        if cached:
+            return cached
     if not isinstance(amount, Decimal) or amount <= 0:
         return False, "Please enter a positive amount"
     if amount > MAX_TRANSFER:
@@ -159,25 +188,24 @@ def transfer_funds(sender_account_id: int, receiver_account_number: str, amount:
     with get_db_connection() as conn:
         cursor = conn.cursor()
         try:
-            cursor.execute("BEGIN TRANSACTION")
+            cursor.execute("BEGIN IMMEDIATE")
+            if idempotency_key:
+                previous = find_result(cursor, idempotency_key, "transfer_funds")
+                if previous:
+                    conn.rollback()
+                    return previous
 
             # Check sender's balance
-            cursor.execute(
-                "SELECT balance FROM accounts WHERE id = ?",
-                (sender_account_id,)
-            )
-            sender_result = cursor.fetchone()
-            if not sender_result:
+            sender_balance = read_debit_balance(cursor, sender_account_id)
+            if sender_balance is None:
                 conn.rollback()
                 return False, f"Sender account ID {sender_account_id} not found"
-            
-            sender_balance = Decimal(sender_result["balance"])
             if sender_balance < amount:
                 conn.rollback()
                 return False, f"Insufficient funds in sender account ID {sender_account_id}"
 
             # Get receiver's account
-            receiver = get_account_by_number(receiver_account_number)
+            receiver = _account_by_number(cursor, receiver_account_number)
             if not receiver:
                 conn.rollback()
                 return False, f"Receiver account number {receiver_account_number} not found"
@@ -199,75 +227,64 @@ def transfer_funds(sender_account_id: int, receiver_account_number: str, amount:
                 return False, f"Failed to update sender account ID {sender_account_id}"
 
             # Update receiver's balance
-            cursor.execute(
-                "UPDATE accounts SET balance = balance + ? WHERE id = ?",
-                (str(amount), receiver_account_id)
-            )
-            if cursor.rowcount == 0:
+            if not credit_account(cursor, receiver_account_id, amount):
                 conn.rollback()
                 return False, f"Failed to update receiver account ID {receiver_account_id}"
 
-            # Record sender's transaction
-            sender_desc = description or f"Transfer to {receiver_account_number}"
-            cursor.execute(
-                """INSERT INTO transactions 
-                (account_id, type, amount, description, reference, status)
-                VALUES (?, ?, ?, ?, ?, ?)""",
-                (sender_account_id, "transfer_out", str(amount), sender_desc, receiver_account_number, "completed")
-            )
-            sender_txn_id = cursor.lastrowid
-
-            # Record receiver's transaction
-            receiver_desc = description or f"Transfer from sender"
-            cursor.execute(
-                """INSERT INTO transactions 
-                (account_id, type, amount, description, reference, status)
-                VALUES (?, ?, ?, ?, ?, ?)""",
-                (receiver_account_id, "transfer_in", str(amount), receiver_desc, f"sender_txn_{sender_txn_id}", "completed")
+            # Record both legs in one journal entry
+            entry_id = post_entry(
+                cursor, "transfer", amount,
+                debit_account_id=sender_account_id,
+                credit_account_id=receiver_account_id,
+                description=description,
+                reference=receiver_account_number
             )
 
-            conn.commit()
-            return True, f"Successfully transferred ₹{amount:,.2f} to {receiver_account_number}"
+            result = commit_result(conn, idempotency_key, "transfer_funds", (True, f"Successfully transferred ₹{amount:,.2f} to {receiver_account_number}"))
+            account_cache.record_posting(entry_id, sender_account_id, receiver_account_id)
+            return result
         except sqlite3.Error as e:
             conn.rollback()
             return False, f"Transfer failed: Database error ({str(e)})"
 
-def get_account_transactions(account_id: int, limit: int = None) -> List[Transaction]:
+def get_account_transactions(account_id: int, limit: int = None,
+                             start_us: Optional[int] = None, end_us: Optional[int] = None) -> List[Transaction]:
     """
-    Get transactions for an account
+    Get transactions for an account, newest first
     Args:
         account_id: The account ID to get transactions for
         limit: Optional limit on number of transactions to return
+        start_us: Optional inclusive lower bound (epoch microseconds)
+        end_us: Optional exclusive upper bound (epoch microseconds)
     Returns:
         List[Transaction]: List of transaction objects
     """
+    if start_us is None and end_us is None and limit and limit <= account_cache.HISTORY_SIZE:
+        entry = account_cache.get_entry(account_id)
+        if entry is not None:
+            return entry.history[:limit]
     with get_db_connection() as conn:
         cursor = conn.cursor()
         try:
-            query = """
-                SELECT id, account_id, type, amount, description, status, created_at
-                FROM transactions
-                WHERE account_id = ?
-                ORDER BY created_at DESC
-            """
-            params = [account_id]
+            query = account_postings_sql() + " ORDER BY created_at_us DESC, id DESC"
+            params = {
+                "account_id": account_id,
+                "start_us": MIN_TIMESTAMP_US if start_us is None else start_us,
+                "end_us": MAX_TIMESTAMP_US if end_us is None else end_us,
+            }
             if limit:
-                query += " LIMIT ?"
-                params.append(limit)
+                query += " LIMIT :limit"
+                params["limit"] = limit
             
             cursor.execute(query, params)
-            transactions = [
-                Transaction(
-                    id=row[0],
-                    account_id=row[1],
-                    type=row[2],
-                    amount=Decimal(row[3]),
-                    description=row[4],
-                    status=row[5],
-                    created_at=row[6]
-                ) for row in cursor.fetchall()
-            ]
-            return transactions
+            rows = cursor.fetchall()
+            if (not limit or len(rows) < limit) and archive.has_archives(cursor):
+                # Older entries may have moved to cold storage
+                rows += archive.read_archived(
+                    ACCOUNT_POSTINGS_SQL, params, limit - len(rows) if limit else None,
+                    params["start_us"], params["end_us"], [row["id"] for row in rows]
+                )
+            return [posting_from_row(row) for row in rows]
         except sqlite3.Error as e:
             print(f"Get transactions error for account ID {account_id}: {e}")
             return []
@@ -280,11 +297,14 @@ def get_account_balance(account_id: int) -> Decimal:
     Returns:
         Decimal: The account balance
     """
+    entry = account_cache.get_entry(account_id)
+    if entry is not None:
+        return entry.balance
     with get_db_connection() as conn:
         cursor = conn.cursor()
         try:
             cursor.execute(
-                "SELECT balance FROM accounts WHERE id = ?",
+                f"SELECT {TOTAL_BALANCE_SQL} AS balance FROM accounts a WHERE a.id = ?",
                 (account_id,)
             )
             result = cursor.fetchone()
@@ -293,7 +313,39 @@ def get_account_balance(account_id: int) -> Decimal:
             print(f"Get balance error for account ID {account_id}: {e}")
             return Decimal("0")
 
-def lock_funds(account_id: int, amount: Decimal, pin: str, description: Optional[str] = None) -> Tuple[bool, str]:
+@instrumented("get_account_snapshot")
+def get_account_snapshot(account_id: int, history_limit: int = 50) -> Optional[AccountSnapshot]:
+    """
+    Get balance, recent transactions and active locks as of the same moment
+    Args:
+        account_id: The account ID to read
+        history_limit: Number of most recent transactions to include
+    Returns:
+        AccountSnapshot: One consistent view of the account, None if not found
+    """
+    if history_limit <= account_cache.HISTORY_SIZE:
+        entry = account_cache.get_entry(account_id)
+    else:
+        entry = None
+    if entry is None:
+        try:
+            entry = account_cache.read_account_state(account_id, history_limit)
+        except sqlite3.Error as e:
+            print(f"Get snapshot error for account ID {account_id}: {e}")
+            return None
+    if entry is None:
+        return None
+    return AccountSnapshot(
+        account_id=account_id,
+        balance=entry.balance,
+        transactions=entry.history[:history_limit],
+        locked_funds=[dict(fund) for fund in entry.locks],
+        as_of=entry.as_of
+    )
+
+@instrumented("lock_funds")
+def lock_funds(account_id: int, amount: Decimal, pin: str, description: Optional[str] = None,
+               idempotency_key: Optional[str] = None) -> Tuple[bool, str]:
     """
     Lock funds from account balance with a PIN
     Args:
@@ -301,9 +353,14 @@ def lock_funds(account_id: int, amount: Decimal, pin: str, description: Optional
         amount: The amount to lock (must be positive)
         pin: The PIN to secure the locked funds
         description: Optional description of the lock
+        idempotency_key: Optional client key; a retry with the same key returns the original result
     Returns:
         Tuple[bool, str]: (success, message)
     """
+    if idempotency_key:
+        cached = get_cached_result(idempotency_key, "lock_funds")
+        if cached:
+            return cached
     if not isinstance(amount, Decimal) or amount <= 0:
         return False, "Please enter a positive amount"
     if amount > MAX_LOCK:
@@ -312,21 +369,26 @@ def lock_funds(account_id: int, amount: Decimal, pin: str, description: Optional
         return False, "PIN must be at least 4 characters"
     
     description = sanitize_description(description)
+    # Hash before taking the write lock so other writers are not blocked by bcrypt
+    try:
+        pin_hash = hash_secret(pin)
+    except HashingBusy as e:
+        return False, str(e)
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
         try:
-            cursor.execute("BEGIN TRANSACTION")
-            cursor.execute(
-                "SELECT balance FROM accounts WHERE id = ?",
-                (account_id,)
-            )
-            result = cursor.fetchone()
-            if not result:
+            cursor.execute("BEGIN IMMEDIATE")
+            if idempotency_key:
+                previous = find_result(cursor, idempotency_key, "lock_funds")
+                if previous:
+                    conn.rollback()
+                    return previous
+            balance = read_debit_balance(cursor, account_id)
+            if balance is None:
                 conn.rollback()
                 return False, f"Account ID {account_id} not found"
                 
-            balance = Decimal(result["balance"])
             if balance < amount:
                 conn.rollback()
                 return False, f"Insufficient funds in account ID {account_id}"
@@ -336,15 +398,12 @@ def lock_funds(account_id: int, amount: Decimal, pin: str, description: Optional
                 (str(amount), account_id)
             )
             
-            cursor.execute(
-                """INSERT INTO transactions 
-                (account_id, type, amount, description, status)
-                VALUES (?, ?, ?, ?, ?)""",
-                (account_id, "lock", str(amount), description or "Funds locked", "completed")
+            entry_id = post_entry(
+                cursor, "lock", amount,
+                debit_account_id=account_id,
+                description=description or "Funds locked"
             )
             
-            pin_hash = bcrypt.hashpw(pin.encode(), bcrypt.gensalt()).decode()
-            
             cursor.execute(
                 """
                 INSERT INTO locked_funds 
@@ -354,8 +413,9 @@ def lock_funds(account_id: int, amount: Decimal, pin: str, description: Optional
                 (account_id, str(amount), pin_hash, description)
             )
             
-            conn.commit()
-            return True, f"Successfully locked ₹{amount:,.2f}"
+            result = commit_result(conn, idempotency_key, "lock_funds", (True, f"Successfully locked ₹{amount:,.2f}"))
+            account_cache.record_posting(entry_id, account_id)
+            return result
         except sqlite3.Error as e:
             conn.rollback()
             return False, f"Locking failed for account ID {account_id}: Database error ({str(e)})"
@@ -368,18 +428,13 @@ def get_locked_funds(account_id: int) -> List[dict]:
     Returns:
         List[dict]: List of locked funds as dictionaries
     """
+    entry = account_cache.get_entry(account_id)
+    if entry is not None:
+        return [dict(fund) for fund in entry.locks]
     with get_db_connection() as conn:
         cursor = conn.cursor()
         try:
-            cursor.execute(
-                """
-                SELECT id, amount, description, created_at 
-                FROM locked_funds 
-                WHERE account_id = ? AND is_unlocked = 0
-                ORDER BY created_at DESC
-                """,
-                (account_id,)
-            )
+            cursor.execute(account_cache.ACTIVE_LOCKS_SQL, (account_id,))
             columns = [col[0] for col in cursor.description]
             funds = [dict(zip(columns, row)) for row in cursor.fetchall()]
             for fund in funds:
@@ -389,7 +444,9 @@ def get_locked_funds(account_id: int) -> List[dict]:
             print(f"Error getting locked funds for account ID {account_id}: {e}")
             return []
 
-def unlock_funds(lock_id: int, account_id: int, pin: str, amount_to_unlock: Optional[Decimal] = None) -> Tuple[bool, str]:
+@instrumented("unlock_funds")
+def unlock_funds(lock_id: int, account_id: int, pin: str, amount_to_unlock: Optional[Decimal] = None,
+                 idempotency_key: Optional[str] = None) -> Tuple[bool, str]:
     """
     Unlock funds with the correct PIN
     Args:
@@ -397,19 +454,28 @@ def unlock_funds(lock_id: int, account_id: int, pin: str, amount_to_unlock: Opti
         account_id: The account ID associated with the lock
         pin: The PIN to verify
         amount_to_unlock: Optional amount to unlock (if None, unlocks all)
+        idempotency_key: Optional client key; a retry with the same key returns the original result
     Returns:
         Tuple[bool, str]: (success, message)
     """
+    if idempotency_key:
+        cached = get_cached_result(idempotency_key, "unlock_funds")
+        if cached:
+            return cached
     if not pin:
         return False, "PIN is required"
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
         try:
-            cursor.execute("BEGIN TRANSACTION")
+            # Verify the PIN outside any transaction: bcrypt must not hold database locks
+            if idempotency_key:
+                previous = find_result(cursor, idempotency_key, "unlock_funds")
+                if previous:
+                    return previous
             cursor.execute(
                 """
-                SELECT amount, pin_hash 
+                SELECT pin_hash 
                 FROM locked_funds 
                 WHERE id = ? AND account_id = ? AND is_unlocked = 0
                 """,
@@ -417,15 +483,39 @@ def unlock_funds(lock_id: int, account_id: int, pin: str, amount_to_unlock: Opti
             )
             result = cursor.fetchone()
             if not result:
-                conn.rollback()
                 return False, "Locked funds not found or already unlocked"
             
-            locked_amount = Decimal(result["amount"])
             stored_pin_hash = result["pin_hash"]
+            if not verify_secret(pin, stored_pin_hash):
+                return False, "Incorrect PIN"
+            new_pin_hash = hash_secret(pin) if needs_rehash(stored_pin_hash) else None
             
-            if not bcrypt.checkpw(pin.encode(), stored_pin_hash.encode()):
+            cursor.execute("BEGIN IMMEDIATE")
+            if idempotency_key:
+                previous = find_result(cursor, idempotency_key, "unlock_funds")
+                if previous:
+                    conn.rollback()
+                    return previous
+            # Re-read under the write lock; the PIN hash must be the one just verified
+            cursor.execute(
+                """
+                SELECT amount 
+                FROM locked_funds 
+                WHERE id = ? AND account_id = ? AND is_unlocked = 0 AND pin_hash = ?
+                """,
+                (lock_id, account_id, stored_pin_hash)
+            )
+            result = cursor.fetchone()
+            if not result:
                 conn.rollback()
-                return False, "Incorrect PIN"
+                return False, "Locked funds not found or already unlocked"
+            
+            locked_amount = Decimal(result["amount"])
+            if new_pin_hash:
+                cursor.execute(
+                    "UPDATE locked_funds SET pin_hash = ? WHERE id = ?",
+                    (new_pin_hash, lock_id)
+                )
             
             amount_to_unlock = amount_to_unlock or locked_amount
             if not isinstance(amount_to_unlock, Decimal) or amount_to_unlock <= 0:
@@ -447,20 +537,20 @@ def unlock_funds(lock_id: int, account_id: int, pin: str, amount_to_unlock: Opti
                     (lock_id,)
                 )
             
-            cursor.execute(
-                "UPDATE accounts SET balance = balance + ? WHERE id = ?",
-                (str(amount_to_unlock), account_id)
-            )
+            credit_account(cursor, account_id, amount_to_unlock)
             
-            cursor.execute(
-                """INSERT INTO transactions 
-                (account_id, type, amount, description, status)
-                VALUES (?, ?, ?, ?, ?)""",
-                (account_id, "unlock", str(amount_to_unlock), f"Funds unlocked from lock #{lock_id}", "completed")
+            entry_id = post_entry(
+                cursor, "unlock", amount_to_unlock,
+                credit_account_id=account_id,
+                description=f"Funds unlocked from lock #{lock_id}"
             )
             
-            conn.commit()
-            return True, f"Successfully unlocked ₹{amount_to_unlock:,.2f}"
+            result = commit_result(conn, idempotency_key, "unlock_funds", (True, f"Successfully unlocked ₹{amount_to_unlock:,.2f}"))
+            account_cache.record_posting(entry_id, account_id)
+            return result
+        except HashingBusy as e:
+            # Raised by the PIN check, before the write transaction begins
+            return False, str(e)
         except sqlite3.Error as e:
             conn.rollback()
             return False, f"Unlocking failed for lock ID {lock_id}: Database error ({str(e)})"
\ No newline at end of file
@@ -1,4 +1,7 @@
 from decimal import Decimal, InvalidOperation
+import os
+import threading
+import time
 from typing import Optional
 
 def validate_amount(amount_str: str) -> Optional[Decimal]:
@@ -17,4 +20,38 @@ def format_currency(amount: Decimal) -> str:
 
 def generate_account_number(user_id: int) -> str:
     """Generate account number from user ID"""
-    return f"AC{user_id:08d}"
\ No newline at end of file
+    return f"AC{user_id:08d}"
+
+_CROCKFORD_BASE32 = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+# Every pair of digits, so a reference is encoded 10 bits at a time
+_CROCKFORD_PAIRS = [high + low for high in _CROCKFORD_BASE32 for low in _CROCKFORD_BASE32]
+_PAIR_SHIFTS = range(120, -1, -10)
+
+_clock_lock = threading.Lock()
+_last_micros = 0
+
+def now_micros() -> int:
+    """Current epoch time in microseconds, strictly increasing within this process"""
+    global _last_micros
+    with _clock_lock:
+        _last_micros = max(time.time_ns() // 1000, _last_micros + 1)
+        return _last_micros
+
+def generate_ulid(timestamp_us: Optional[int] = None, randomness: Optional[int] = None) -> str:
+    """
+    Generate a 26 character ULID-style reference
+    Layout: 48-bit millisecond timestamp, 10 bits of sub-millisecond microseconds,
+    70 random bits. References taken from now_micros() therefore sort in creation order.
+    Pass randomness (e.g. from a seeded generator) to make the reference reproducible.
+    """
+    if timestamp_us is None:
+        timestamp_us = now_micros()
+    if randomness is None:
+        randomness = int.from_bytes(os.urandom(9), "big")
+    timestamp_ms, micros = divmod(timestamp_us, 1000)
+    value = (
+        ((timestamp_ms & 0xFFFFFFFFFFFF) << 80)
+        | (micros << 70)
+        | (randomness & ((1 << 70) - 1))
+    )
+    return "".join([_CROCKFORD_PAIRS[(value >> shift) & 0x3FF] for shift in _PAIR_SHIFTS])
@@ -0,0 +1,81 @@
+"""
+Building blocks of the per-database caches invalidated by PRAGMA data_version
+
+account_cache and page_cache keep one store per database file. Each store
+owns a long-lived watcher connection whose PRAGMA data_version moves whenever
+another connection (in this or another process) commits, so a store can tell
+cheaply whether anything changed since it last looked and only then decide
+what to drop. WatchedStore is that store's base class; WatchedCache is the
+registry of stores together with the lock guarding them and the
+hit/miss/eviction/invalidation counters.
+"""
+import threading
+from typing import Callable, Dict, Optional
+from src import database
+
+class WatchedStore:
+    """
+    Cached items of one database file plus the watcher connection that tracks its commits
+    Subclasses hold the items and define __len__ as their number, which cache_stats() sums.
+    """
+    def __init__(self, stats: Dict[str, int]):
+        self.stats = stats
+        self.watcher = database.connect(check_same_thread=False)
+        self.data_version = self.watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def changed(self) -> bool:
+        """True if another connection committed since the last call (or since the store opened)"""
+        data_version = self.watcher.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self.data_version:
+            return False
+        self.data_version = data_version
+        return True
+
+    def close(self) -> None:
+        self.watcher.close()
+
+class WatchedCache:
+    """One store per database file, created on first use, plus the shared lock and counters"""
+    def __init__(self, store_factory: Callable[[Dict[str, int]], WatchedStore], size_key: str):
+        """
+        Args:
+            store_factory: Builds a store for the current DB_PATH from the counters dict
+            size_key: Name cache_stats() reports the total number of cached items under
+        """
+        self.lock = threading.Lock()
+        self.stores: Dict[str, WatchedStore] = {}
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self.store_factory = store_factory
+        self.size_key = size_key
+
+    def get_store(self) -> WatchedStore:
+        """The store of the current database, opened if needed; call with lock held"""
+        db_key = str(database.DB_PATH)
+        store = self.stores.get(db_key)
+        if store is None:
+            store = self.stores[db_key] = self.store_factory(self.stats)
+        return store
+
+    def current_store(self) -> Optional[WatchedStore]:
+        """The store of the current database if one is open; call with lock held"""
+        return self.stores.get(str(database.DB_PATH))
+
+    def clear(self) -> None:
+        """Drop everything cached and close the watcher connections"""
+        with self.lock:
+            for store in self.stores.values():
+                store.close()
+            self.stores.clear()
+
+    def cache_stats(self) -> dict:
+        """Return hit/miss/eviction/invalidation counters and the number of cached items"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats[self.size_key] = sum(len(store) for store in self.stores.values())
+        return stats
+
+    def reset_stats(self) -> None:
+        """Zero the counters"""
+        with self.lock:
+            for key in self.stats:
+                self.stats[key] = 0
@@ -0,0 +1,40 @@
+import os
+import shutil
+import uuid
+import pytest
+from src import account_cache, auth, database, hashing, page_cache
+
+# BANK_TEST_DB=memory runs every test against its own shared in-memory database
+IN_MEMORY = os.environ.get("BANK_TEST_DB") == "memory"
+
+@pytest.fixture(autouse=True)
+def fast_hashing(monkeypatch):
+    """Use the cheapest bcrypt cost so PIN and password tests stay fast"""
+    monkeypatch.setattr(hashing, "BCRYPT_ROUNDS", 4)
+
+@pytest.fixture(scope="session")
+def template_db(tmp_path_factory):
+    """Database with the current schema, migrated once per test session (or xdist worker)"""
+    path = tmp_path_factory.mktemp("template") / "bank.db"
+    database.initialize_database(seed_admin=False, target=path)
+    # The schema is in the write-ahead log until a checkpoint moves it into the file tests copy
+    with database.get_db_connection(path) as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return path
+
+@pytest.fixture(autouse=True)
+def isolated_db(template_db, tmp_path, monkeypatch):
+    """Point every test at its own copy of the template database"""
+    if IN_MEMORY:
+        target = f"file:/test-{uuid.uuid4().hex}?vfs=memdb"
+        database.copy_database(template_db, target)
+    else:
+        target = tmp_path / "bank.db"
+        shutil.copyfile(template_db, target)
+    monkeypatch.setattr(database, "DB_PATH", target)
+    yield
+    auth.wait_for_rehashes()
+    account_cache.clear()
+    page_cache.clear()
+    if IN_MEMORY:
+        database.release_memory_database(target)
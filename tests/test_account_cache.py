@@ -0,0 +1,71 @@
+import sqlite3
+import pytest
+from decimal import Decimal
+from src import account_cache, database
+from src.database import get_db_connection
+from src.transactions import deposit, get_account_balance, get_account_transactions, get_locked_funds, lock_funds
+
+@pytest.fixture
+def account_id():
+    """Account with a starting balance of 1000"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", ("cacheuser", "x"))
+        cursor.execute(
+            "INSERT INTO accounts (user_id, account_number, balance) VALUES (?, ?, ?)",
+            (cursor.lastrowid, "ACCACHE01", 1000)
+        )
+        conn.commit()
+        account_id = cursor.lastrowid
+    account_cache.reset_stats()
+    return account_id
+
+def test_reads_hit_after_first_load(account_id):
+    """Test balance, history and locks are served from one cached entry"""
+    assert get_account_balance(account_id) == Decimal("1000")
+    assert get_account_transactions(account_id, limit=50) == []
+    assert get_locked_funds(account_id) == []
+    stats = account_cache.cache_stats()
+    assert (stats["misses"], stats["hits"]) == (1, 2)
+
+def test_postings_write_through(account_id):
+    """Test a committed posting updates the cached entry instead of dropping it"""
+    get_account_balance(account_id)
+    assert deposit(account_id, Decimal("250.00"), "Salary")[0]
+    assert lock_funds(account_id, Decimal("100.00"), "1234")[0]
+    assert get_account_balance(account_id) == Decimal("1150")
+    assert [txn.type for txn in get_account_transactions(account_id, limit=5)] == ["lock", "deposit"]
+    assert get_locked_funds(account_id)[0]["amount"] == Decimal("100.00")
+    stats = account_cache.cache_stats()
+    assert stats["misses"] == 1 and stats["invalidations"] == 0
+
+def test_external_commit_invalidates(account_id):
+    """Test a journal entry written by another connection drops the entry"""
+    get_account_balance(account_id)
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.execute("UPDATE accounts SET balance = balance + 5 WHERE id = ?", (account_id,))
+    conn.execute(
+        """INSERT INTO journal_entries (type, amount, credit_account_id, created_at_us, txn_ref)
+        VALUES ('deposit', 5, ?, 1, 'EXTERNAL')""",
+        (account_id,)
+    )
+    conn.commit()
+    conn.close()
+    assert get_account_balance(account_id) == Decimal("1005")
+    assert account_cache.cache_stats()["invalidations"] == 1
+
+def test_lru_eviction(account_id, monkeypatch):
+    """Test the least recently used account is evicted when the cache is full"""
+    monkeypatch.setattr(account_cache, "CACHE_SIZE", 1)
+    get_account_balance(account_id)
+    get_account_balance(9999)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO accounts (user_id, account_number) VALUES (1, 'ACCACHE02')"
+        )
+        conn.commit()
+        other_id = cursor.lastrowid
+    get_account_balance(other_id)
+    get_account_balance(account_id)
+    assert account_cache.cache_stats()["evictions"] == 2
@@ -1,6 +1,13 @@
+from decimal import Decimal
 import pytest
-from src.admin import get_all_users, get_all_transactions, get_user_accounts
+from src import page_cache, query_trace
+from src.admin import (
+    block_unblock_account, find_transaction_details, find_transactions, find_users, find_users_with_accounts,
+    get_all_users, get_all_transactions, get_transaction_details, get_user_accounts, get_user_by_username,
+    search_transactions, transaction_page_key, user_page_key
+)
 from src.database import get_db_connection
+from src.journal import backfill_entry_timestamps
 
 @pytest.fixture
 def setup_db():
@@ -28,16 +35,16 @@ def setup_db():
         ]
     )
     
-    # Create test transactions
+    # Create test journal entries
     cursor.executemany(
-        """INSERT INTO transactions 
-        (account_id, type, amount, description) 
-        VALUES (?, ?, ?, ?)""",
+        """INSERT INTO journal_entries 
+        (type, amount, debit_account_id, credit_account_id, description) 
+        VALUES (?, ?, ?, ?, ?)""",
         [
-            (1, "deposit", 5000.00, "Initial deposit"),
-            (2, "deposit", 1000.00, "Initial deposit"),
-            (3, "deposit", 2000.00, "Initial deposit"),
-            (2, "withdrawal", 200.00, "ATM withdrawal")
+            ("deposit", 5000.00, None, 1, "Initial deposit"),
+            ("deposit", 1000.00, None, 2, "Initial deposit"),
+            ("deposit", 2000.00, None, 3, "Initial deposit"),
+            ("withdrawal", 200.00, 2, None, "ATM withdrawal")
         ]
     )
     
@@ -62,4 +69,204 @@ def test_get_user_accounts(setup_db):
     """Test retrieving user accounts"""
     accounts = get_user_accounts(2)
     assert len(accounts) == 1
-    assert accounts[0].account_number == "ACUSER001"
\ No newline at end of file
+    assert accounts[0].account_number == "ACUSER001"
+
+def test_search_transactions(setup_db):
+    """Test full-text search ranks, filters, pages and follows edits"""
+    with get_db_connection() as conn:
+        conn.executemany(
+            """INSERT INTO journal_entries
+            (type, amount, debit_account_id, credit_account_id, description, reference, created_at_us)
+            VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            [
+                ("transfer", 150.00, 2, 3, "Rent for March", "ACUSER002", 1_000),
+                ("transfer", 75.00, 3, 2, "Rent share", "ACUSER001", 2_000),
+            ]
+        )
+        conn.commit()
+    assert {txn.description for txn in search_transactions("initial")} == {"Initial deposit"}
+    assert len(search_transactions("deposit initial")) == 3
+    assert [txn.amount for txn in search_transactions("rent marc")] == [150.00]
+    assert {txn.reference for txn in search_transactions("ACUSER00", account_id=3)} == {"ACUSER002", "ACUSER001"}
+    assert search_transactions("ACUSER002", account_id=1) == []
+    assert [txn.amount for txn in search_transactions("rent", date_range=(1_500, None))] == [75.00]
+    assert len(search_transactions("initial", limit=2)) == 2
+    assert len(search_transactions("initial", limit=2, offset=2)) == 1
+    assert search_transactions('"') == []
+    assert [txn.amount for txn in search_transactions('rent (march" NOT')] == []
+    assert [txn.amount for txn in search_transactions("rent (march")] == [150.00]
+
+    with get_db_connection() as conn:
+        conn.execute("UPDATE journal_entries SET description = 'Cash at ATM' WHERE description = 'ATM withdrawal'")
+        conn.execute("DELETE FROM journal_entries WHERE description = 'Rent share'")
+        conn.commit()
+    assert [txn.type for txn in search_transactions("cash")] == ["withdrawal"]
+    assert search_transactions("withdrawal") == []
+    assert [txn.amount for txn in search_transactions("rent")] == [150.00]
+
+def test_find_transactions_filters_and_sorts(setup_db):
+    """Test each filter and sort of the server-side transaction listing"""
+    with get_db_connection() as conn:
+        conn.executemany(
+            """INSERT INTO journal_entries
+            (type, amount, debit_account_id, credit_account_id, status, created_at_us)
+            VALUES (?, ?, ?, ?, ?, ?)""",
+            [
+                ("transfer", 150.00, 2, 3, "completed", 1_000),
+                ("transfer", 75.00, 3, 2, "pending", 2_000),
+            ]
+        )
+        conn.execute("UPDATE accounts SET is_blocked = 1 WHERE id = 3")
+        conn.commit()
+    assert [txn.amount for txn in find_transactions(sort="amount_desc", limit=3)] == [5000.00, 2000.00, 1000.00]
+    assert [txn.amount for txn in find_transactions(sort="amount_asc", limit=2)] == [75.00, 150.00]
+    assert [txn.amount for txn in find_transactions(start_us=1_000, end_us=2_000)] == [150.00]
+    assert [txn.amount for txn in find_transactions(start_us=0, sort="oldest")] == [150.00, 75.00]
+    assert {txn.type for txn in find_transactions(types=["transfer", "withdrawal"])} == {"transfer", "withdrawal"}
+    amounts = sorted(txn.amount for txn in find_transactions(min_amount=Decimal("100"), max_amount=Decimal("1000")))
+    assert amounts == [150.00, 200.00, 1000.00]
+    assert [txn.status for txn in find_transactions(status="pending")] == ["pending"]
+    # user2 owns account 2: its deposit, withdrawal and both transfers, each once
+    assert sorted(txn.amount for txn in find_transactions(user_id=2)) == [75.00, 150.00, 200.00, 1000.00]
+    assert sorted(txn.amount for txn in find_transactions(user_id=2, blocked=True)) == []
+    assert sorted(txn.amount for txn in find_transactions(blocked=True)) == [75.00, 150.00, 2000.00]
+    assert sorted(txn.amount for txn in find_transactions(blocked=False)) == [75.00, 150.00, 200.00, 1000.00, 5000.00]
+    page = find_transactions(start_us=0, limit=1)
+    assert [txn.amount for txn in find_transactions(start_us=0, after=transaction_page_key(page[-1]))] == [150.00]
+    with pytest.raises(ValueError):
+        find_transactions(sort="type")
+
+def test_keyset_pages_cover_every_entry_once(setup_db):
+    """Test walking pages by the last row's key visits every entry once, ties broken by id"""
+    with get_db_connection() as conn:
+        # As the migration does for entries written before created_at_us existed
+        backfill_entry_timestamps(conn.cursor())
+        conn.executemany(
+            """INSERT INTO journal_entries (type, amount, debit_account_id, credit_account_id, created_at_us)
+            VALUES (?, ?, ?, ?, ?)""",
+            [("transfer", 150.00, 2, 3, 1_000), ("transfer", 150.00, 3, 2, 1_000), ("deposit", 150.00, None, 2, 1_000)]
+        )
+        conn.commit()
+    for filters in ({}, {"user_id": 2}):
+        for sort in ("newest", "oldest", "amount_desc", "amount_asc"):
+            expected = [txn.id for txn in find_transactions(sort=sort, **filters)]
+            seen, after = [], None
+            while True:
+                page = find_transaction_details(sort=sort, limit=2, after=after, **filters)
+                if not page:
+                    break
+                seen += [row["id"] for row in page]
+                after = transaction_page_key(page[-1], sort)
+            assert seen == expected, (filters, sort)
+    with pytest.raises(ValueError):
+        find_transactions(sort="newest", after=(1_000,))
+
+def test_find_transactions_uses_indexes(setup_db, monkeypatch):
+    """Test user, time and amount queries are answered from indexes, not a journal scan"""
+    monkeypatch.setattr(query_trace, "ENABLED", True)
+    monkeypatch.setattr(query_trace, "SLOW_QUERY_MS", 0)
+    query_trace.reset()
+    find_transactions(user_id=2, start_us=0)
+    find_transactions(min_amount=Decimal("100"), sort="amount_desc")
+    find_transactions(start_us=0, end_us=5_000, types=["deposit"])
+    find_transactions(after=(5_000, 100))
+    plans = [query["plan"] for query in query_trace.slow_queries() if "journal_entries" in query["sql"]]
+    query_trace.reset()
+    assert len(plans) == 4
+    for plan in plans:
+        assert not any(step.startswith("SCAN journal_entries") for step in plan), plan
+    # Amount and time orders come straight from their indexes
+    for plan in plans[1:]:
+        assert "USE TEMP B-TREE FOR ORDER BY" not in plan, plan
+
+def test_find_users(setup_db):
+    """Test user listing filters and sorts"""
+    with get_db_connection() as conn:
+        conn.execute("UPDATE accounts SET is_blocked = 1 WHERE id = 3")
+        conn.commit()
+    assert [user.username for user in find_users(sort="username")] == ["admin1", "user1", "user2"]
+    assert [user.username for user in find_users(sort="newest", limit=1)] == ["user2"]
+    assert [user.username for user in find_users(username_prefix="user")] == ["user1", "user2"]
+    assert [user.username for user in find_users(role="admin")] == ["admin1"]
+    assert [user.username for user in find_users(blocked=True)] == ["user2"]
+    first = find_users(blocked=False, limit=1)
+    assert [user.username for user in find_users(blocked=False, after=user_page_key(first[-1]))] == ["user1"]
+    first = find_users(sort="username", limit=2)
+    assert [user.username for user in find_users(sort="username", after=user_page_key(first[-1], "username"))] == ["user2"]
+
+def test_get_user_by_username_is_exact(setup_db):
+    """Test an exact lookup finds 'bob' even when 'bobby' sorts first among the prefix matches"""
+    with get_db_connection() as conn:
+        conn.executemany("INSERT INTO users (username, password) VALUES (?, 'x')", [("bobby",), ("bob",)])
+        conn.commit()
+    assert [user.username for user in find_users(username_prefix="bob", limit=1)] == ["bobby"]
+    assert get_user_by_username("bob").username == "bob"
+    assert get_user_by_username("bo") is None and get_user_by_username("BOB") is None
+
+def test_transaction_details_prefetched_and_cached(setup_db):
+    """Test a details page carries owner and account columns and is reused until a commit"""
+    page_cache.reset_stats()
+    page = find_transaction_details(sort="amount_desc", limit=2)
+    assert [(row["username"], row["account_number"], row["balance"]) for row in page] == [
+        ("admin1", "ACADMIN01", 5000.00), ("user2", "ACUSER002", 2000.00)
+    ]
+    assert page[0]["counterparty_account_number"] is None and page[0]["is_blocked"] == 0
+    assert find_transaction_details(sort="amount_desc", limit=2) is page
+    assert page_cache.cache_stats()["hits"] == 1
+
+    assert block_unblock_account(3, True)
+    fresh = find_transaction_details(sort="amount_desc", limit=2)
+    assert fresh is not page and fresh[1]["is_blocked"] == 1
+    assert page_cache.cache_stats()["invalidations"] == 1
+    assert get_transaction_details(fresh[1]["id"]) == fresh[1]
+    assert get_transaction_details(10_000) is None
+
+def test_users_with_accounts_prefetched(setup_db):
+    """Test each listed user comes with its accounts and an account change refreshes the page"""
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO accounts (user_id, account_number, balance) VALUES (2, 'ACUSER001B', 10)")
+        conn.commit()
+    page = find_users_with_accounts(sort="username")
+    assert [(user.username, [account.account_number for account in accounts]) for user, accounts in page] == [
+        ("admin1", ["ACADMIN01"]), ("user1", ["ACUSER001", "ACUSER001B"]), ("user2", ["ACUSER002"])
+    ]
+    assert find_users_with_accounts(sort="username") is page
+    assert block_unblock_account(2, True)
+    user, accounts = find_users_with_accounts(blocked=True)[0]
+    assert user.username == "user1" and accounts[0].is_blocked
+
+def test_page_survives_unrelated_postings(setup_db):
+    """Test a cached page is only reloaded by postings to its accounts or into its window"""
+    with get_db_connection() as conn:
+        backfill_entry_timestamps(conn.cursor())
+        conn.execute("INSERT INTO users (username, password) VALUES ('user3', 'x')")
+        conn.execute("INSERT INTO accounts (user_id, account_number, balance) VALUES (4, 'ACUSER003', 0)")
+        conn.commit()
+    page_cache.reset_stats()
+
+    def post(amount, account_id, created_at_us):
+        with get_db_connection() as conn:
+            conn.execute(
+                """INSERT INTO journal_entries (type, amount, credit_account_id, created_at_us)
+                VALUES ('deposit', ?, ?, ?)""",
+                (amount, account_id, created_at_us)
+            )
+            conn.commit()
+
+    top = find_transaction_details(sort="amount_desc", limit=2)
+    users = find_users_with_accounts(username_prefix="user1")
+    assert [row["amount"] for row in top] == [5000.00, 2000.00]
+    # A small deposit to an account neither page shows is below the amount window
+    post(10.00, 4, 1)
+    assert find_transaction_details(sort="amount_desc", limit=2) is top
+    assert find_users_with_accounts(username_prefix="user1") is users
+    assert page_cache.cache_stats()["invalidations"] == 0
+
+    # A deposit to user1's account moves a balance the users page shows
+    post(10.00, 2, 2)
+    assert find_users_with_accounts(username_prefix="user1") is not users
+    assert find_transaction_details(sort="amount_desc", limit=2) is top
+    # A large deposit sorts into the top page
+    post(3000.00, 4, 3)
+    assert [row["amount"] for row in find_transaction_details(sort="amount_desc", limit=2)] == [5000.00, 3000.00]
+    assert page_cache.cache_stats()["invalidations"] == 2
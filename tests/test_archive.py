@@ -0,0 +1,110 @@
+from decimal import Decimal
+from pathlib import Path
+import pytest
+from src import account_cache, archive, database
+from src.admin import get_all_transactions, get_transactions_with_user_details
+from src.database import get_db_connection
+from src.reconcile import check_ledger
+from src.transactions import deposit, get_account_snapshot, get_account_transactions
+
+# 2024-03-10 and 2025-06-15 (UTC), both long before "now"
+OLD_US = 1_710_028_800_000_000
+OLDER_YEAR_US = 1_749_945_600_000_000
+
+@pytest.fixture(autouse=True)
+def file_database():
+    if database.is_memory_database():
+        pytest.skip("archive partitions are files next to the main database")
+
+def _account_with_history():
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO users (username, password) VALUES ('archive', 'x')")
+        cursor.execute("INSERT INTO accounts (user_id, account_number) VALUES (?, 'ACARC0001')", (cursor.lastrowid,))
+        conn.commit()
+        account_id = cursor.lastrowid
+    for amount in range(1, 7):
+        assert deposit(account_id, Decimal(amount))[0]
+    # Backdate the first four entries: two into 2024, two into 2025
+    with get_db_connection() as conn:
+        ids = [row[0] for row in conn.execute("SELECT id FROM journal_entries ORDER BY id")]
+        for offset, entry_id in enumerate(ids[:4]):
+            base = OLD_US if offset < 2 else OLDER_YEAR_US
+            conn.execute("UPDATE journal_entries SET created_at_us = ? WHERE id = ?", (base + offset, entry_id))
+        conn.commit()
+    account_cache.clear()
+    return account_id, ids
+
+def test_archive_moves_old_entries_into_period_files():
+    """Test entries before the horizon move into one file per year and leave the main journal"""
+    account_id, ids = _account_with_history()
+    success, message = archive.archive_entries(before_us=OLDER_YEAR_US + 1_000_000)
+    assert success, message
+    db_path = Path(database.DB_PATH)
+    assert (db_path.parent / f"{db_path.stem}_2024.db").exists()
+    assert (db_path.parent / f"{db_path.stem}_2025.db").exists()
+    assert [p["row_count"] for p in archive.list_partitions()] == [2, 2]
+    with get_db_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM journal_entries").fetchone()[0] == 2
+
+    # History reads union the partitions transparently, newest first
+    history = get_account_transactions(account_id)
+    assert [txn.id for txn in history] == ids[::-1]
+    assert [txn.id for txn in get_account_transactions(account_id, limit=3)] == ids[::-1][:3]
+    assert [txn.id for txn in get_account_snapshot(account_id).transactions] == ids[::-1]
+    assert len(get_all_transactions()) == 6
+    assert len(get_transactions_with_user_details(limit=5)) == 5
+    assert check_ledger()["violations"] == []
+
+def test_date_range_reads_only_needed_partitions(monkeypatch):
+    """Test a range inside the hot period never touches the archive"""
+    account_id, ids = _account_with_history()
+    assert archive.archive_entries(before_us=OLDER_YEAR_US + 1_000_000)[0]
+    old = [txn.id for txn in get_account_transactions(account_id, start_us=OLD_US, end_us=OLD_US + 10)]
+    assert old == [ids[1], ids[0]]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("archive should not be read")
+    monkeypatch.setattr(archive, "_attach", fail)
+    recent = get_account_transactions(account_id, start_us=OLDER_YEAR_US + 1_000_000)
+    assert [txn.id for txn in recent] == ids[:3:-1]
+
+def test_monthly_partitions_and_repeat_runs():
+    """Test monthly partition labels and that a second run appends to the same partition"""
+    _account_with_history()
+    assert archive.archive_entries(before_us=OLD_US + 1, period="month")[0]
+    assert archive.archive_entries(before_us=OLD_US + 2, period="month")[0]
+    partitions = archive.list_partitions()
+    assert [(p["period"], p["row_count"]) for p in partitions] == [("2024_03", 2)]
+    assert archive.archive_entries(before_us=OLD_US)[1] == "No entries older than the horizon"
+
+def test_interrupted_move_is_finished_by_next_run():
+    """Test entries left in both files by a run stopped after the copy are moved exactly once"""
+    account_id, ids = _account_with_history()
+    _label, start_us, end_us = archive.period_bounds(OLD_US, "year")
+    with get_db_connection() as conn:
+        archive._attach(conn, archive.partition_path("2024"))
+        for ddl in archive.PARTITION_DDL:
+            conn.execute(ddl.format(schema=archive.ARCHIVE_SCHEMA))
+        conn.execute(
+            f"""INSERT INTO {archive.ARCHIVE_SCHEMA}.journal_entries ({archive.JOURNAL_COLUMNS})
+            SELECT {archive.JOURNAL_COLUMNS} FROM main.journal_entries WHERE id = ?""", (ids[0],)
+        )
+        conn.commit()
+        archive._detach(conn)
+    assert archive.archive_entries(before_us=OLD_US + 10)[0]
+    assert [(p["period"], p["row_count"]) for p in archive.list_partitions()] == [("2024", 2)]
+    assert [txn.id for txn in get_account_transactions(account_id)] == ids[::-1]
+    assert check_ledger()["violations"] == []
+
+def test_uri_database_archives_next_to_its_file(monkeypatch):
+    """Test a file: URI with query parameters names partitions after the file, not the URI"""
+    db_path = Path(database.DB_PATH)
+    monkeypatch.setattr(database, "DB_PATH", f"file:{db_path}?mode=rw")
+    assert database.database_file() == db_path
+    _account_with_history()
+    assert archive.archived_through() is None
+    success, message = archive.archive_entries(before_us=OLD_US + 1_000_000)
+    assert success, message
+    assert (db_path.parent / f"{db_path.stem}_2024.db").exists()
+    assert archive.archived_through() == OLD_US + 1_000_000
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+from decimal import Decimal
+import pytest
+from src import async_api
+from src.database import get_db_connection
+
+@pytest.fixture
+def setup_db():
+    """Setup test database with an account"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO users (username, password) VALUES (?, ?)",
+        ("asyncuser", "asyncpass")
+    )
+    cursor.execute(
+        "INSERT INTO accounts (user_id, account_number, balance) VALUES (?, ?, ?)",
+        (cursor.lastrowid, "ACASYNC01", 0)
+    )
+    account_id = cursor.lastrowid
+    conn.commit()
+    yield account_id
+    conn.close()
+
+def test_concurrent_deposits(setup_db):
+    """Test many concurrent async deposits all commit"""
+    account_id = setup_db
+
+    async def run():
+        results = await asyncio.gather(*(
+            async_api.deposit(account_id, Decimal("1.00")) for _ in range(50)
+        ))
+        return results, await async_api.get_account_balance(account_id)
+
+    results, balance = asyncio.run(run())
+    assert all(success for success, _ in results)
+    assert balance == Decimal("50")
+
+def test_per_database_limit(monkeypatch):
+    """Test no more than MAX_CONCURRENT_PER_DB calls run at once"""
+    monkeypatch.setattr(async_api, "MAX_CONCURRENT_PER_DB", 2)
+    running, peak = 0, 0
+    lock = threading.Lock()
+
+    def slow_call():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+
+    async def run():
+        await asyncio.gather(*(async_api.run_blocking(slow_call) for _ in range(8)))
+
+    asyncio.run(run())
+    assert peak == 2
+
+def test_cancel_before_start(monkeypatch):
+    """Test a queued call that is cancelled never runs"""
+    monkeypatch.setattr(async_api, "MAX_CONCURRENT_PER_DB", 1)
+    calls = []
+
+    async def run():
+        first = asyncio.create_task(async_api.run_blocking(time.sleep, 0.05))
+        second = asyncio.create_task(async_api.run_blocking(calls.append, "ran"))
+        await asyncio.sleep(0.01)
+        second.cancel()
+        await first
+        with pytest.raises(asyncio.CancelledError):
+            await second
+        assert all(running == 0 for running in async_api.in_flight().values())
+
+    asyncio.run(run())
+    assert calls == []
+
+def test_call_outliving_its_loop_releases_slots(caplog):
+    """Test a timed-out call that finishes after its loop closed still frees its slots"""
+    started, finish = threading.Event(), threading.Event()
+
+    def blocking():
+        started.set()
+        finish.wait(5)
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(async_api.run_blocking(blocking), 0.05)
+        return asyncio.get_running_loop()
+
+    loop = asyncio.run(run())
+    assert started.is_set() and loop.is_closed()
+    finish.set()
+    running = async_api._loop_limits[loop]["running"]
+    deadline = time.time() + 5
+    while any(running.values()) and time.time() < deadline:
+        time.sleep(0.01)
+    assert not any(running.values())
+    assert "exception calling callback" not in caplog.text
@@ -1,5 +1,7 @@
 import pytest
-from src.auth import authenticate_user, register_user
+from src import hashing
+from src.auth import authenticate_user, register_user, wait_for_rehashes
+from src.hashing import is_hashed
 from src.database import get_db_connection
 
 @pytest.fixture
@@ -50,24 +52,77 @@ def setup_db():
 
 def test_authenticate_user_success(setup_db):
     """Test successful authentication"""
-    user = authenticate_user("testuser", "testpass")
-    assert user is not None
+    user, message = authenticate_user("testuser", "testpass")
+    assert user is not None and message == ""
     assert user.username == "testuser"
     assert user.full_name == "Test User"
 
 def test_authenticate_user_failure(setup_db):
     """Test failed authentication"""
-    assert authenticate_user("testuser", "wrongpass") is None
-    assert authenticate_user("nonexistent", "testpass") is None
+    assert authenticate_user("testuser", "wrongpass") == (None, "Incorrect username or password")
+    assert authenticate_user("nonexistent", "testpass") == (None, "Incorrect username or password")
 
 def test_register_user_success(setup_db):
     """Test successful user registration"""
-    user = register_user("newuser", "newpass", "New User", "new@example.com")
-    assert user is not None
+    user, message = register_user("newuser", "newpass", "New User", "new@example.com")
+    assert user is not None and message == ""
     assert user.username == "newuser"
     assert user.email == "new@example.com"
 
 def test_register_user_duplicate(setup_db):
     """Test duplicate username registration"""
     register_user("duplicate", "pass", "Duplicate User")
-    assert register_user("duplicate", "pass") is None
\ No newline at end of file
+    assert register_user("duplicate", "pass") == (None, "Username already exists")
+
+def test_plaintext_password_is_rehashed_on_login(setup_db):
+    """Test legacy plaintext passwords are upgraded after a successful login"""
+    assert authenticate_user("testuser", "testpass")[0] is not None
+    wait_for_rehashes()
+    with get_db_connection() as conn:
+        stored = conn.execute("SELECT password FROM users WHERE username = 'testuser'").fetchone()[0]
+    assert is_hashed(stored)
+    assert authenticate_user("testuser", "testpass")[0] is not None
+    assert authenticate_user("testuser", stored)[0] is None
+
+def test_register_stores_hash(setup_db):
+    """Test new registrations never store the plaintext password"""
+    register_user("hasheduser", "Secret123")
+    with get_db_connection() as conn:
+        stored = conn.execute("SELECT password FROM users WHERE username = 'hasheduser'").fetchone()[0]
+    assert stored != "Secret123" and is_hashed(stored)
+    assert authenticate_user("hasheduser", "Secret123")[0].username == "hasheduser"
+
+def test_login_burst_is_capped(setup_db, monkeypatch):
+    """Test logins beyond the worker cap wait for a slot or fail as busy"""
+    monkeypatch.setattr(hashing, "HASH_QUEUE_TIMEOUT", 0)
+    slots = hashing._get_slots()
+    for _ in range(hashing.HASH_WORKERS):
+        slots.acquire()
+    try:
+        user, message = register_user("burstuser", "Secret123")
+        assert user is None and "try again" in message
+    finally:
+        for _ in range(hashing.HASH_WORKERS):
+            slots.release()
+
+def test_busy_login_is_reported_as_busy(setup_db, monkeypatch):
+    """Test a login that finds every hashing slot taken says so instead of rejecting the password"""
+    register_user("busyuser", "Secret123")
+    monkeypatch.setattr(hashing, "HASH_QUEUE_TIMEOUT", 0)
+    slots = hashing._get_slots()
+    for _ in range(hashing.HASH_WORKERS):
+        slots.acquire()
+    try:
+        user, message = authenticate_user("busyuser", "Secret123")
+    finally:
+        for _ in range(hashing.HASH_WORKERS):
+            slots.release()
+    assert user is None and message == "Too many requests in progress, please try again"
+    assert authenticate_user("busyuser", "Secret123")[0] is not None
+
+def test_duplicate_registration_skips_hashing(setup_db, monkeypatch):
+    """Test a taken username is rejected before any bcrypt work is done"""
+    def fail(secret):
+        raise AssertionError("hashed a password for a taken username")
+    monkeypatch.setattr("src.auth.hash_secret", fail)
+    assert register_user("testuser", "Secret123") == (None, "Username already exists")
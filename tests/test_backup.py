@@ -0,0 +1,93 @@
+import gzip
+import threading
+import time
+from decimal import Decimal
+import pytest
+from src import backup, database
+from src.database import get_db_connection
+from src.transactions import deposit
+
+def _account():
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO users (username, password) VALUES ('backup', 'x')")
+        cursor.execute("INSERT INTO accounts (user_id, account_number) VALUES (?, 'ACBAK0001')", (cursor.lastrowid,))
+        conn.commit()
+        return cursor.lastrowid
+
+def test_backup_is_verified_and_compressed(tmp_path):
+    """Test a backup taken while a writer keeps posting is complete and consistent"""
+    account_id = _account()
+    for _ in range(20):
+        deposit(account_id, Decimal("1.00"))
+    stop = threading.Event()
+    posted = []
+
+    def writer():
+        while not stop.is_set():
+            posted.append(deposit(account_id, Decimal("1.00"))[0])
+            time.sleep(0.001)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        report = backup.backup_database(tmp_path / "backups", pages_per_step=1, step_sleep=0.001)
+    finally:
+        stop.set()
+        thread.join()
+    assert report["ok"], report["problems"]
+    assert report["path"].endswith(".db.gz") and report["steps"] >= 1
+    assert all(posted)
+    assert backup.verify_backup(report["path"]) == []
+
+def test_stepped_copy_is_not_restarted_by_writers(tmp_path):
+    """Test a throttled backup reads one snapshot, so writers neither wait for it nor restart it"""
+    if database.is_memory_database():
+        pytest.skip("in-memory databases have no write-ahead log")
+    account_id = _account()
+    for _ in range(200):
+        deposit(account_id, Decimal("1.00"))
+    stop = threading.Event()
+    posted = []
+
+    def writer():
+        while not stop.is_set():
+            posted.append(deposit(account_id, Decimal("1.00"))[0])
+            time.sleep(0.001)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        report = backup.backup_database(tmp_path, compress=False, pages_per_step=1, step_sleep=0.005)
+        during = len(posted)
+    finally:
+        stop.set()
+        thread.join()
+    assert report["ok"], report["problems"]
+    assert report["restarts"] == 0 and report["steps"] == report["pages"]
+    assert during > 0 and all(posted)
+
+def test_corrupt_backup_is_detected(tmp_path):
+    """Test verification rejects a file that is not a sound database"""
+    _account()
+    report = backup.backup_database(tmp_path, compress=False)
+    assert report["ok"]
+    with open(report["path"], "r+b") as f:
+        f.seek(200)
+        f.write(b"\xff" * 4000)
+    assert backup.verify_backup(report["path"])
+    broken = tmp_path / "bank-broken.db.gz"
+    with gzip.open(broken, "wb") as f:
+        f.write(b"not a database" * 100)
+    assert backup.verify_backup(broken)
+
+def test_retention_and_scheduler(tmp_path):
+    """Test scheduled backups keep only the newest ones"""
+    _account()
+    scheduler = backup.BackupScheduler(0.05, keep=2, directory=tmp_path).start()
+    deadline = time.time() + 10
+    while len(scheduler.reports) < 3 and time.time() < deadline:
+        time.sleep(0.05)
+    scheduler.stop()
+    assert len(scheduler.reports) >= 3 and all(r["ok"] for r in scheduler.reports)
+    assert len(backup.list_backups(tmp_path)) == 2
@@ -0,0 +1,94 @@
+from decimal import Decimal
+import pytest
+from src import archive, column_store, database
+from src.column_store import ColumnStore, account_totals, monthly_volumes, top_accounts
+from src.database import get_db_connection
+from src.transactions import deposit, get_account_balance, transfer_funds, withdraw
+
+def _accounts():
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        ids = []
+        for i in range(2):
+            cursor.execute("INSERT INTO users (username, password) VALUES (?, 'x')", (f"colstore{i}",))
+            cursor.execute("INSERT INTO accounts (user_id, account_number) VALUES (?, ?)",
+                           (cursor.lastrowid, f"ACCOL000{i}"))
+            ids.append(cursor.lastrowid)
+        conn.commit()
+    return ids
+
+def test_incremental_refresh_and_reports(tmp_path):
+    """Test refresh appends only new entries and the reports match the ledger"""
+    a, b = _accounts()
+    store = ColumnStore(tmp_path / "columns")
+    assert deposit(a, Decimal("100.00"))[0]
+    assert withdraw(a, Decimal("10.25"))[0]
+    assert store.refresh() == 2
+    assert store.refresh() == 0
+
+    assert transfer_funds(a, "ACCOL0001", Decimal("30.00"))[0]
+    assert deposit(b, Decimal("5.00"))[0]
+    assert store.refresh() == 2
+    with store.open() as view:
+        # The transfer is one row naming both accounts
+        assert view.rows == 4
+        totals = account_totals(view)
+        assert totals[a] == {"credits": Decimal("100.00"), "debits": Decimal("40.25"), "net": Decimal("59.75")}
+        assert totals[a]["net"] == get_account_balance(a) and totals[b]["net"] == get_account_balance(b) == Decimal("35.00")
+        volumes = {row["type"]: (row["count"], row["amount"]) for row in monthly_volumes(view)}
+        assert volumes == {"deposit": (2, Decimal("105.00")), "withdraw": (1, Decimal("10.25")),
+                           "transfer": (1, Decimal("30.00"))}
+        assert len({row["month"] for row in monthly_volumes(view)}) == 1
+        assert top_accounts(view, 1) == [(a, Decimal("140.25"))]
+
+def test_unlisted_segment_is_replaced_and_segments_merge(tmp_path, monkeypatch):
+    """Test a segment left by an interrupted refresh is overwritten and many segments merge into one"""
+    a, _ = _accounts()
+    store = ColumnStore(tmp_path / "columns")
+    assert deposit(a, Decimal("12.00"))[0]
+    store.refresh()
+    # A segment written without its meta.json update
+    (tmp_path / "columns" / f"entries-{store.meta()['last_id'] + 1:012d}.col").write_bytes(b"partial")
+    monkeypatch.setattr(column_store, "MAX_SEGMENTS", 2)
+    for amount in ("2.00", "3.00"):
+        assert withdraw(a, Decimal(amount))[0]
+        store.refresh()
+    assert [segment["rows"] for segment in store.meta()["segments"]] == [3]
+    assert sorted(path.name for path in (tmp_path / "columns").glob("*.col")) == [store.meta()["segments"][0]["file"]]
+    with store.open() as view:
+        assert account_totals(view)[a]["net"] == get_account_balance(a) == Decimal("7.00")
+        assert [row["count"] for row in monthly_volumes(view)] == [1, 2]
+
+def test_refresh_reads_archived_entries(tmp_path):
+    """Test a store built after archiving still holds the archived entries"""
+    if database.is_memory_database():
+        pytest.skip("archive partitions are files next to the main database")
+    a, _ = _accounts()
+    for amount in ("1.00", "2.00", "3.00"):
+        assert deposit(a, Decimal(amount))[0]
+    with get_db_connection() as conn:
+        first = conn.execute("SELECT MIN(id) FROM journal_entries").fetchone()[0]
+        conn.execute("UPDATE journal_entries SET created_at_us = 1710028800000000 + id WHERE id < ?", (first + 2,))
+        conn.commit()
+    assert archive.archive_entries(before_us=1710028800000000 + 1_000_000)[0]
+    store = ColumnStore(tmp_path / "columns")
+    assert store.refresh() == 3
+    with store.open() as view:
+        assert account_totals(view)[a]["net"] == Decimal("6.00")
+        assert [row["month"] for row in monthly_volumes(view)][0] == "2024-03"
+
+def test_numpy_columns_share_the_mapped_file(tmp_path):
+    """Test a single-segment column is a read-only array over the mmap, not a copy"""
+    np = pytest.importorskip("numpy")
+    a, _ = _accounts()
+    for amount in ("1.00", "2.50", "3.25"):
+        assert deposit(a, Decimal(amount))[0]
+    store = ColumnStore(tmp_path / "columns")
+    assert store.refresh() == 3
+    with store.open() as view:
+        amounts = view["amount_paise"]
+        mapped = np.frombuffer(view._files[0]._mmap, dtype=np.uint8)
+        assert np.shares_memory(amounts, mapped)
+        assert not amounts.flags.writeable and not amounts.flags.owndata
+        assert amounts.tolist() == [100, 250, 325]
+        del amounts, mapped
@@ -0,0 +1,69 @@
+from src import database
+from src.database import get_db_connection, initialize_database, schema_is_current
+
+def _index_names():
+    with get_db_connection() as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+def test_current_schema_skips_initialization():
+    """Test a database at the current user_version is not touched again"""
+    assert schema_is_current()
+    with get_db_connection() as conn:
+        conn.execute("DROP INDEX idx_journal_time")
+    initialize_database(seed_admin=False)
+    assert "idx_journal_time" not in _index_names()
+
+def test_outdated_schema_is_initialized():
+    """Test a lower user_version runs the DDL and migrations again"""
+    with get_db_connection() as conn:
+        conn.execute("DROP INDEX idx_journal_time")
+        conn.execute("PRAGMA user_version = 1")
+    initialize_database(seed_admin=False)
+    assert "idx_journal_time" in _index_names()
+    assert schema_is_current()
+
+def test_search_index_built_for_existing_entries():
+    """Test upgrading to the search schema indexes entries written before it"""
+    with get_db_connection() as conn:
+        for trigger in ("journal_search_insert", "journal_search_delete", "journal_search_update"):
+            conn.execute(f"DROP TRIGGER {trigger}")
+        conn.execute("DROP TABLE journal_search")
+        conn.execute("INSERT INTO journal_entries (type, amount, description) VALUES ('deposit', 1, 'Opening float')")
+        conn.execute("PRAGMA user_version = 3")
+        conn.commit()
+    initialize_database(seed_admin=False)
+    with get_db_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM journal_search WHERE journal_search MATCH 'float'").fetchone()[0] == 1
+
+def test_shared_memory_database(monkeypatch):
+    """Test a shared in-memory URI keeps its data across connections until released"""
+    monkeypatch.setattr(database, "DB_PATH", database.DB_PATH)
+    database.set_db_path(":memory:")
+    assert database.DB_PATH == database.SHARED_MEMORY_URI
+    try:
+        initialize_database(seed_admin=False)
+        with get_db_connection() as conn:
+            conn.execute("INSERT INTO users (username, password) VALUES ('mem', 'x')")
+            conn.commit()
+        with get_db_connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 1
+        assert schema_is_current()
+    finally:
+        database.release_memory_database()
+
+def test_explicit_target_and_copy(tmp_path):
+    """Test initializing and copying a database other than DB_PATH"""
+    other = tmp_path / "other.db"
+    initialize_database(seed_admin=False, target=other)
+    with get_db_connection(other) as conn:
+        conn.execute("INSERT INTO users (username, password) VALUES ('other', 'x')")
+        conn.commit()
+    copy = "file:copy-test?mode=memory&cache=shared"
+    try:
+        database.copy_database(other, copy)
+        with get_db_connection(copy) as conn:
+            assert conn.execute("SELECT username FROM users").fetchone()[0] == "other"
+        with get_db_connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+    finally:
+        database.release_memory_database(copy)
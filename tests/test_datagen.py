@@ -0,0 +1,45 @@
+from decimal import Decimal
+from benchmarks.datagen import generate_bank
+from benchmarks.suite import compare
+from src import database
+from src.transactions import get_account_balance, get_account_transactions
+
+def _dump(db_path):
+    database.DB_PATH = db_path
+    with database.get_db_connection() as conn:
+        return (
+            conn.execute("SELECT * FROM journal_entries ORDER BY id").fetchall(),
+            conn.execute("SELECT id, balance FROM accounts ORDER BY id").fetchall(),
+        )
+
+def test_generate_bank_is_reproducible(tmp_path):
+    """Same seed and sizes produce identical journals and balances"""
+    generate_bank(tmp_path / "a.db", users=20, transactions=500, seed=7)
+    generate_bank(tmp_path / "b.db", users=20, transactions=500, seed=7)
+    first, second = _dump(tmp_path / "a.db"), _dump(tmp_path / "b.db")
+    assert [tuple(row) for row in first[0]] == [tuple(row) for row in second[0]]
+    assert [tuple(row) for row in first[1]] == [tuple(row) for row in second[1]]
+
+def test_generated_bank_conserves_money(tmp_path):
+    """Balances plus locked funds equal deposits minus withdrawals"""
+    stats = generate_bank(tmp_path / "gen.db", users=30, transactions=2000, seed=3)
+    with database.get_db_connection() as conn:
+        balances = conn.execute("SELECT COALESCE(SUM(balance), 0), MIN(balance) FROM accounts").fetchone()
+        locked = conn.execute("SELECT COALESCE(SUM(CAST(amount AS REAL)), 0) FROM locked_funds").fetchone()[0]
+        entries = conn.execute("SELECT COUNT(*) FROM journal_entries").fetchone()[0]
+    assert entries == stats["entries"] == 2030
+    assert balances[1] >= 0
+    assert round(balances[0] + locked, 2) == round(stats["deposited"] - stats["withdrawn"], 2)
+
+    # Generated rows are readable through the normal APIs
+    account_id = 1
+    history = get_account_transactions(account_id)
+    assert history and get_account_balance(account_id) >= Decimal("0")
+
+def test_compare_flags_regressions():
+    """Only changes beyond the tolerance are reported as regressions"""
+    baseline = {"results": {"deposit": {"p95_us": 1000, "throughput": 1000.0}}}
+    steady = {"results": {"deposit": {"p95_us": 1100, "throughput": 950.0}}}
+    slower = {"results": {"deposit": {"p95_us": 2000, "throughput": 500.0}}}
+    assert compare(steady, baseline, 0.25) == []
+    assert len(compare(slower, baseline, 0.25)) == 2
@@ -0,0 +1,70 @@
+import csv
+import gzip
+import json
+from decimal import Decimal
+import pytest
+from src import archive, database
+from src.columnar import ColumnarFile
+from src.database import get_db_connection
+from src.exporter import export_journal, iter_entries
+from src.transactions import deposit, transfer_funds, withdraw
+
+def _accounts():
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        ids = []
+        for i in range(2):
+            cursor.execute("INSERT INTO users (username, password) VALUES (?, 'x')", (f"export{i}",))
+            cursor.execute("INSERT INTO accounts (user_id, account_number) VALUES (?, ?)",
+                           (cursor.lastrowid, f"ACEXP000{i}"))
+            ids.append(cursor.lastrowid)
+        conn.commit()
+    a, b = ids
+    for amount in ("100.00", "20.50", "7.25"):
+        assert deposit(a, Decimal(amount))[0]
+    assert withdraw(a, Decimal("10.00"))[0]
+    assert transfer_funds(a, "ACEXP0001", Decimal("30.00"))[0]
+    assert deposit(b, Decimal("5.00"))[0]
+    return a, b
+
+def test_export_formats_and_filters(tmp_path):
+    """Test CSV, gzipped JSONL and columnar exports hold the same filtered rows"""
+    a, b = _accounts()
+    report = export_journal(tmp_path / "all.csv", page_size=2)
+    assert report["ok"] and report["rows"] == 6
+    with open(tmp_path / "all.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["type"] for row in rows] == ["deposit"] * 3 + ["withdraw", "transfer", "deposit"]
+    assert [int(row["created_at_us"]) for row in rows] == sorted(int(row["created_at_us"]) for row in rows)
+
+    report = export_journal(tmp_path / "b.jsonl.gz", account_id=b)
+    with gzip.open(tmp_path / "b.jsonl.gz", "rt") as f:
+        entries = [json.loads(line) for line in f]
+    assert report["rows"] == 2 and [entry["type"] for entry in entries] == ["transfer", "deposit"]
+
+    start_us = int(rows[1]["created_at_us"])
+    end_us = int(rows[4]["created_at_us"])
+    report = export_journal(tmp_path / "a.col", account_id=a, start_us=start_us, end_us=end_us,
+                            types=["deposit", "transfer"], page_size=1)
+    assert report["rows"] == 2
+    with ColumnarFile(tmp_path / "a.col") as columns:
+        assert list(columns.column("amount_paise")) == [2050, 725]
+        assert [columns.types[code] for code in columns.column("type_code")] == ["deposit", "deposit"]
+        assert list(columns.column("credit_account_id")) == [a, a]
+
+    assert not export_journal(tmp_path / "out.xlsx")["ok"]
+
+def test_export_includes_archived_entries(tmp_path):
+    """Test archived partitions are exported before the live journal"""
+    if database.is_memory_database():
+        pytest.skip("archive partitions are files next to the main database")
+    _accounts()
+    with get_db_connection() as conn:
+        first = conn.execute("SELECT MIN(id) FROM journal_entries").fetchone()[0]
+        conn.execute("UPDATE journal_entries SET created_at_us = 1710028800000000 + id WHERE id < ?", (first + 2,))
+        conn.commit()
+    assert archive.archive_entries(before_us=1710028800000000 + 1_000_000)[0]
+    batches = list(iter_entries(("id", "created_at_us")))
+    assert [row[0] for batch in batches for row in batch] == sorted(row[0] for batch in batches for row in batch)
+    assert export_journal(tmp_path / "all.csv")["rows"] == 6
+    assert export_journal(tmp_path / "live.csv", include_archives=False)["rows"] == 4
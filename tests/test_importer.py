@@ -0,0 +1,86 @@
+import csv
+import json
+from decimal import Decimal
+import pytest
+from src.auth import authenticate_user
+from src.database import get_db_connection
+from src.hashing import hash_secret
+from src.importer import import_accounts, import_transactions
+from src.reconcile import check_ledger
+from src.transactions import get_account_balance, get_account_by_number
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+def _rejects(report):
+    with open(report["rejects_path"], encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_import_accounts_and_transactions(tmp_path, fast):
+    """Test a branch is loaded in chunks, bad rows are rejected and the ledger still reconciles"""
+    password_hash = hash_secret("Branch123")
+    _write_csv(tmp_path / "users.csv", [
+        {"username": "branch_a", "password": password_hash, "full_name": "A", "email": "a@x.in", "opening_balance": "1000.00"},
+        {"username": "branch_b", "password": "Plaintext1", "full_name": "B", "email": "", "opening_balance": ""},
+        {"username": "bad name", "password": password_hash, "full_name": "C", "email": "", "opening_balance": ""},
+        {"username": "branch_a", "password": password_hash, "full_name": "Dup", "email": "", "opening_balance": ""},
+        {"username": "branch_c", "password": "short", "full_name": "D", "email": "", "opening_balance": ""},
+        {"username": "branch_d", "password": password_hash, "full_name": "E", "email": "", "opening_balance": "2000000"},
+    ])
+    report = import_accounts(tmp_path / "users.csv", fast=fast, chunk_size=2)
+    assert (report["rows"], report["imported"], report["rejected"]) == (6, 2, 4)
+    assert Decimal(report["deposited"]) == Decimal("1000.00")
+    assert [reject["line"] for reject in _rejects(report)] == [4, 5, 6, 7]
+    assert authenticate_user("branch_b", "Plaintext1")[0] is not None
+
+    a = get_account_by_number(next(
+        row["account_number"] for row in _numbers() if row["username"] == "branch_a"))
+    b_number = next(row["account_number"] for row in _numbers() if row["username"] == "branch_b")
+    lines = [
+        {"type": "transfer", "account": a["account_number"], "to_account": b_number, "amount": "400"},
+        {"type": "withdraw", "account": b_number, "amount": "100.50", "description": "cash; drop"},
+        {"type": "withdraw", "account": b_number, "amount": "1000"},
+        {"type": "deposit", "account": "AC99999999", "amount": "5"},
+        {"type": "deposit", "account": b_number, "amount": "1.005"},
+        {"type": "lock", "account": b_number, "amount": "5"},
+    ]
+    path = tmp_path / "history.jsonl"
+    path.write_text("\n".join(json.dumps(line) for line in lines) + "\nnot json\n", encoding="utf-8")
+    report = import_transactions(path, fast=fast, chunk_size=3)
+    assert (report["rows"], report["imported"], report["rejected"]) == (7, 2, 5)
+    assert report["by_type"] == {"deposit": 0, "withdraw": 1, "transfer": 1}
+    reasons = [reject["reason"] for reject in _rejects(report)]
+    assert reasons[0].startswith("Insufficient funds") and reasons[-1].startswith("Invalid JSON")
+
+    assert get_account_balance(a["id"]) == Decimal("600.00")
+    assert get_account_balance(get_account_by_number(b_number)["id"]) == Decimal("299.50")
+    with get_db_connection() as conn:
+        description = conn.execute(
+            "SELECT description FROM journal_entries WHERE type = 'withdraw'").fetchone()[0]
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert description == "cash drop"
+    assert "idx_journal_txn_ref" in indexes
+    assert check_ledger()["violations"] == []
+
+def _numbers():
+    with get_db_connection() as conn:
+        return conn.execute(
+            "SELECT u.username, a.account_number FROM users u JOIN accounts a ON a.user_id = u.id"
+        ).fetchall()
+
+def test_import_accounts_invalidates_new_users(tmp_path, monkeypatch):
+    """Test every imported user's cached session is dropped so logins see the new account"""
+    invalidated = []
+    monkeypatch.setattr("src.importer.invalidate_user", invalidated.append)
+    password_hash = hash_secret("Branch123")
+    _write_csv(tmp_path / "users.csv", [
+        {"username": f"branch_{i}", "password": password_hash, "full_name": "", "email": ""} for i in range(3)
+    ])
+    assert import_accounts(tmp_path / "users.csv", chunk_size=2)["imported"] == 3
+    with get_db_connection() as conn:
+        ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE username LIKE 'branch_%' ORDER BY id")]
+    assert invalidated == ids
@@ -0,0 +1,59 @@
+import urllib.request
+import pytest
+from decimal import Decimal
+from src import metrics
+from src.database import get_db_connection
+from src.histogram import Histogram
+from src.transactions import deposit, withdraw, MAX_DEPOSIT
+
+@pytest.fixture
+def account_id():
+    """Account with a starting balance of 100"""
+    metrics.reset()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO users (username, password) VALUES ('metricsuser', 'x')")
+        cursor.execute(
+            "INSERT INTO accounts (user_id, account_number, balance) VALUES (?, 'ACMETRIC1', 100)",
+            (cursor.lastrowid,)
+        )
+        conn.commit()
+        yield cursor.lastrowid
+    metrics.reset()
+
+def test_histogram_percentiles():
+    """Test percentiles stay within the bucket precision"""
+    histogram = Histogram()
+    for value in range(1, 10001):
+        histogram.record(value)
+    assert histogram.count == 10000 and histogram.max == 10000
+    for pct, expected in ((50, 5000), (95, 9500), (99, 9900)):
+        assert abs(histogram.percentile(pct) - expected) <= expected * 0.01
+
+def test_outcomes_are_labelled(account_id):
+    """Test calls are counted by operation and outcome"""
+    assert deposit(account_id, Decimal("10"))[0]
+    assert not deposit(account_id, MAX_DEPOSIT + 1)[0]
+    assert not withdraw(account_id, Decimal("1000"))[0]
+    recorded = metrics.snapshot()
+    assert recorded["deposit"]["success"]["count"] == 1
+    assert recorded["deposit"]["limit_exceeded"]["count"] == 1
+    assert recorded["withdraw"]["insufficient_funds"]["count"] == 1
+
+def test_prometheus_export(account_id, tmp_path):
+    """Test the text exposition is written to a file and served over HTTP"""
+    deposit(account_id, Decimal("10"))
+    expected = 'bank_operations_total{operation="deposit",outcome="success"} 1'
+    path = tmp_path / "bank.prom"
+    metrics.write_prometheus(str(path))
+    assert expected in path.read_text()
+    assert 'bank_operation_duration_seconds_count{operation="deposit",outcome="success"} 1' in path.read_text()
+
+    server = metrics.serve_metrics(port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert expected in response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,47 @@
+import sqlite3
+import pytest
+from src import query_trace
+from src.database import get_db_connection
+
+@pytest.fixture
+def tracing(monkeypatch):
+    """Trace every connection and treat every statement as slow"""
+    monkeypatch.setattr(query_trace, "ENABLED", True)
+    monkeypatch.setattr(query_trace, "SLOW_QUERY_MS", 0)
+    query_trace.reset()
+    yield
+    query_trace.reset()
+
+def test_disabled_returns_plain_connection():
+    """Test no tracing wrapper is installed unless enabled"""
+    with get_db_connection() as conn:
+        assert type(conn) is sqlite3.Connection
+
+def test_statements_are_timed_and_counted(tracing):
+    """Test latency, rows and plans are recorded per normalized statement"""
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO users (username, password) VALUES ('u1', 'x')")
+        conn.execute("INSERT INTO users (username, password) VALUES ('u2', 'x')")
+        conn.commit()
+        rows = conn.execute("SELECT id FROM users WHERE username = 'u1' OR id > 0").fetchall()
+    assert len(rows) == 2
+
+    stats = query_trace.statement_stats()
+    insert = stats["INSERT INTO users (username, password) VALUES (?, ?)"]
+    assert insert["count"] == 2
+    select = stats["SELECT id FROM users WHERE username = ? OR id > ?"]
+    assert select["rows"] == 2 and select["max"] >= select["p50"]
+    assert stats["COMMIT"]["count"] == 1
+    plans = {q["sql"]: q["plan"] for q in query_trace.slow_queries()}
+    assert any("users" in step for step in plans["SELECT id FROM users WHERE username = ? OR id > ?"])
+    assert query_trace.engine_statement_counts()["BEGIN"] == 1
+    assert "SELECT id FROM users" in query_trace.report()
+
+def test_iteration_counts_rows(tracing):
+    """Test rows consumed by iterating the cursor are attributed to the statement"""
+    with get_db_connection() as conn:
+        conn.executemany("INSERT INTO users (username, password) VALUES (?, 'x')", [("a",), ("b",), ("c",)])
+        assert len([row for row in conn.execute("SELECT * FROM users")]) == 3
+    stats = query_trace.statement_stats()
+    assert stats["SELECT * FROM users"]["rows"] == 3
+    assert stats["INSERT INTO users (username, password) VALUES (?, ?)"]["rows"] == 3
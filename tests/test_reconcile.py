@@ -0,0 +1,37 @@
+from decimal import Decimal
+from src.database import get_db_connection
+from src.reconcile import check_ledger
+from src.transactions import deposit, lock_funds, transfer_funds, withdraw
+
+def _account(username, number):
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, "x"))
+        cursor.execute(
+            "INSERT INTO accounts (user_id, account_number) VALUES (?, ?)", (cursor.lastrowid, number)
+        )
+        conn.commit()
+        return cursor.lastrowid
+
+def test_postings_reconcile():
+    """Test balances and locks agree with the journal after every kind of posting"""
+    sender = _account("recon_a", "ACREC0001")
+    _account("recon_b", "ACREC0002")
+    assert deposit(sender, Decimal("1000.00"))[0]
+    assert withdraw(sender, Decimal("100.00"))[0]
+    assert transfer_funds(sender, "ACREC0002", Decimal("250.00"))[0]
+    assert lock_funds(sender, Decimal("50.00"), "1234")[0]
+    report = check_ledger()
+    assert report["violations"] == []
+    assert report["balances"] + report["locked"] == Decimal("900.00")
+
+def test_tampered_balance_is_reported():
+    """Test a balance changed outside the posting functions is flagged"""
+    account_id = _account("recon_c", "ACREC0003")
+    assert deposit(account_id, Decimal("100.00"))[0]
+    with get_db_connection() as conn:
+        conn.execute("UPDATE accounts SET balance = balance + 5 WHERE id = ?", (account_id,))
+        conn.commit()
+    violations = check_ledger()["violations"]
+    assert any(f"Account ID {account_id} balance" in line for line in violations)
+    assert any("do not equal deposits" in line for line in violations)
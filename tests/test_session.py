@@ -0,0 +1,41 @@
+import pytest
+from src import session
+from src.admin import block_unblock_account
+from src.auth import register_user
+from src.database import get_db_connection
+
+@pytest.fixture
+def user():
+    """Registered user with one account"""
+    return register_user("sessionuser", "Secret123", "Session User")[0]
+
+def test_session_loads_user_and_accounts(user):
+    """Test one load returns the user with their accounts"""
+    current = session.load_session(user.id)
+    assert current.user.username == "sessionuser"
+    assert [account.account_number for account in current.accounts] == [f"AC{user.id:08d}"]
+    assert not current.is_blocked
+    assert session.get_session(user.id) is current
+
+def test_block_invalidates_session(user):
+    """Test blocking an account drops the cached session"""
+    current = session.load_session(user.id)
+    assert block_unblock_account(current.accounts[0].id, True)
+    reloaded = session.get_session(user.id)
+    assert reloaded is not current
+    assert reloaded.is_blocked
+
+def test_session_expires(user, monkeypatch):
+    """Test an expired session is reloaded from the database"""
+    current = session.load_session(user.id)
+    with get_db_connection() as conn:
+        conn.execute("UPDATE users SET full_name = 'Renamed' WHERE id = ?", (user.id,))
+        conn.commit()
+    assert session.get_session(user.id).user.full_name == "Session User"
+    monkeypatch.setattr(session, "SESSION_TTL_SECONDS", -1)
+    assert session.get_session(user.id).user.full_name == "Renamed"
+    assert session.get_session(user.id) is not current
+
+def test_missing_user_has_no_session():
+    """Test loading an unknown user returns None"""
+    assert session.load_session(9999) is None
@@ -0,0 +1,10 @@
+from benchmarks.datagen import generate_bank
+from benchmarks.stress import run_stress
+
+def test_concurrent_workers_conserve_money(tmp_path):
+    """Test worker processes hammering hot accounts leave a reconciled ledger"""
+    opening = generate_bank(tmp_path / "stress.db", users=20, transactions=200, seed=5, seed_admin=False)
+    report = run_stress(tmp_path / "stress.db", workers=3, ops=40, hot_accounts=2, hot_share=0.8,
+                        opening=opening)
+    assert report["ops"] == 120
+    assert report["violations"] == []
@@ -29,26 +29,198 @@ def setup_db():
 def test_deposit_success(setup_db):
     """Test successful deposit"""
     account_id = setup_db
-    assert deposit(account_id, Decimal("500.00"), "Test deposit")
+    assert deposit(account_id, Decimal("500.00"), "Test deposit")[0]
     balance = get_account_balance(account_id)
     assert balance == Decimal("1500.00")
 
 def test_deposit_invalid_amount(setup_db):
     """Test deposit with invalid amount"""
     account_id = setup_db
-    assert not deposit(account_id, Decimal("-100.00"))
-    assert not deposit(account_id, Decimal("0.00"))
+    assert not deposit(account_id, Decimal("-100.00"))[0]
+    assert not deposit(account_id, Decimal("0.00"))[0]
 
 def test_withdraw_success(setup_db):
     """Test successful withdrawal"""
     account_id = setup_db
-    assert withdraw(account_id, Decimal("200.00"), "Test withdrawal")
+    assert withdraw(account_id, Decimal("200.00"), "Test withdrawal")[0]
     balance = get_account_balance(account_id)
     assert balance == Decimal("800.00")
 
 def test_withdraw_insufficient_funds(setup_db):
     """Test withdrawal with insufficient funds"""
     account_id = setup_db
-    assert not withdraw(account_id, Decimal("2000.00"))
+    assert not withdraw(account_id, Decimal("2000.00"))[0]
     balance = get_account_balance(account_id)
-    assert balance == Decimal("1000.00")  # Balance unchanged
\ No newline at end of file
+    assert balance == Decimal("1000.00")  # Balance unchanged
+
+def test_sharded_account_balance_is_exact(setup_db):
+    """Test credits spread over shards are visible to reads and debits"""
+    from src.sharding import enable_balance_sharding, fold_all_shards
+    account_id = setup_db
+    assert enable_balance_sharding(account_id, shard_count=4)[0]
+    for _ in range(10):
+        assert deposit(account_id, Decimal("10.00"))[0]
+    assert get_account_balance(account_id) == Decimal("1100.00")
+    assert withdraw(account_id, Decimal("1100.00"))[0]
+    assert get_account_balance(account_id) == Decimal("0")
+    assert deposit(account_id, Decimal("5.00"))[0]
+    assert fold_all_shards() == 1
+    assert get_account_balance(account_id) == Decimal("5.00")
+
+def test_unsharded_postings_skip_the_shard_table(setup_db, monkeypatch):
+    """Test crediting or debiting an unsharded account never looks at the shard table"""
+    from src import query_trace
+    from src.sharding import disable_balance_sharding, enable_balance_sharding
+    account_id = setup_db
+    monkeypatch.setattr(query_trace, "ENABLED", True)
+    query_trace.reset()
+    assert deposit(account_id, Decimal("1.00"))[0]
+    assert withdraw(account_id, Decimal("1.00"))[0]
+    assert not any("balance_shards" in sql for sql in query_trace.statement_stats())
+    assert enable_balance_sharding(account_id, shard_count=2)[0]
+    assert deposit(account_id, Decimal("1.00"))[0]
+    assert disable_balance_sharding(account_id)[0]
+    assert deposit(account_id, Decimal("1.00"))[0]
+    assert get_account_balance(account_id) == Decimal("1002.00")
+    query_trace.reset()
+
+
+def test_deposit_idempotency_key(setup_db):
+    """Test a retried deposit with the same key is applied once"""
+    from src import idempotency
+    account_id = setup_db
+    first = deposit(account_id, Decimal("100.00"), idempotency_key="dep-1")
+    idempotency._cache.clear()  # force the duplicate check to hit the table
+    assert deposit(account_id, Decimal("100.00"), idempotency_key="dep-1") == first
+    assert deposit(account_id, Decimal("100.00"), idempotency_key="dep-1") == first
+    assert get_account_balance(account_id) == Decimal("1100.00")
+    assert not withdraw(account_id, Decimal("1.00"), idempotency_key="dep-1")[0]
+
+
+def test_transfer_writes_one_journal_entry(setup_db):
+    """Test a transfer is one entry seen from both sides"""
+    from src.transactions import transfer_funds, get_account_transactions
+    sender_id = setup_db
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", ("payee", "x"))
+    cursor.execute(
+        "INSERT INTO accounts (user_id, account_number, balance) VALUES (?, ?, ?)",
+        (cursor.lastrowid, "ACTXN0002", 0)
+    )
+    receiver_id = cursor.lastrowid
+    conn.commit()
+
+    assert transfer_funds(sender_id, "ACTXN0002", Decimal("250.00"))[0]
+    assert conn.execute("SELECT COUNT(*) FROM journal_entries").fetchone()[0] == 1
+    sent = get_account_transactions(sender_id)[0]
+    received = get_account_transactions(receiver_id)[0]
+    assert sent.id == received.id
+    assert (sent.type, received.type) == ("transfer_out", "transfer_in")
+    assert sent.counterparty_account_id == receiver_id
+    assert received.description == "Transfer from ACTXN0001"
+    conn.close()
+
+
+def test_legacy_transactions_are_migrated(setup_db):
+    """Test legacy transfer pairs are merged into single journal entries"""
+    from src.database import initialize_database
+    from src.transactions import get_account_transactions
+    account_id = setup_db
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO transactions (account_id, type, amount, reference) VALUES (?, ?, ?, ?)",
+        (account_id, "transfer_out", 10, "ACTXN0001")
+    )
+    cursor.execute(
+        "INSERT INTO transactions (account_id, type, amount, reference) VALUES (?, ?, ?, ?)",
+        (account_id, "transfer_in", 10, f"sender_txn_{cursor.lastrowid}")
+    )
+    cursor.execute(
+        "INSERT INTO transactions (account_id, type, amount) VALUES (?, ?, ?)",
+        (account_id, "deposit", 5)
+    )
+    cursor.execute("PRAGMA user_version = 0")
+    conn.commit()
+    conn.close()
+
+    initialize_database(seed_admin=False)
+    types = sorted(txn.type for txn in get_account_transactions(account_id))
+    assert types == ["deposit", "transfer_in", "transfer_out"]
+    conn = get_db_connection()
+    assert conn.execute("SELECT COUNT(*) FROM journal_entries").fetchone()[0] == 2
+    conn.close()
+
+
+def test_burst_history_order_is_stable(setup_db):
+    """Test postings within the same second come back newest first"""
+    from src.transactions import get_account_transactions
+    account_id = setup_db
+    for i in range(1, 21):
+        assert deposit(account_id, Decimal(i))[0]
+    history = get_account_transactions(account_id)
+    assert [txn.amount for txn in history] == [Decimal(i) for i in range(20, 0, -1)]
+    stamps = [txn.created_at_us for txn in history]
+    assert stamps == sorted(stamps, reverse=True) and len(set(stamps)) == 20
+    assert [txn.txn_ref for txn in history] == sorted((txn.txn_ref for txn in history), reverse=True)
+    window = get_account_transactions(account_id, start_us=stamps[4], end_us=stamps[1])
+    assert [txn.amount for txn in window] == [Decimal(18), Decimal(17), Decimal(16)]
+
+
+def test_lock_unlock_with_rehash(setup_db):
+    """Test unlocking verifies the PIN and upgrades the hash to the current cost"""
+    from src import hashing
+    from src.transactions import lock_funds, unlock_funds, get_locked_funds
+    account_id = setup_db
+    assert lock_funds(account_id, Decimal("300.00"), "4321")[0]
+    assert get_account_balance(account_id) == Decimal("700.00")
+    lock_id = get_locked_funds(account_id)[0]["id"]
+    assert unlock_funds(lock_id, account_id, "0000") == (False, "Incorrect PIN")
+
+    hashing.set_work_factor(5)
+    assert unlock_funds(lock_id, account_id, "4321", Decimal("100.00"))[0]
+    conn = get_db_connection()
+    stored = conn.execute("SELECT pin_hash FROM locked_funds WHERE id = ?", (lock_id,)).fetchone()[0]
+    conn.close()
+    assert hashing.get_work_factor(stored) == 5
+    assert unlock_funds(lock_id, account_id, "4321")[0]
+    assert get_account_balance(account_id) == Decimal("1000.00")
+    assert get_locked_funds(account_id) == []
+
+
+def test_account_snapshot(setup_db, monkeypatch):
+    """Test the snapshot returns balance, history and locks from one read"""
+    from src import account_cache
+    from src.transactions import get_account_snapshot, lock_funds
+    account_id = setup_db
+    assert deposit(account_id, Decimal("50.00"))[0]
+    assert lock_funds(account_id, Decimal("200.00"), "1234")[0]
+    for cache_size in (account_cache.CACHE_SIZE, 0):
+        monkeypatch.setattr(account_cache, "CACHE_SIZE", cache_size)
+        snapshot = get_account_snapshot(account_id, history_limit=1)
+        assert snapshot.balance == Decimal("850.00")
+        assert [txn.type for txn in snapshot.transactions] == ["lock"]
+        assert [fund["amount"] for fund in snapshot.locked_funds] == [Decimal("200.00")]
+    assert get_account_snapshot(9999) is None
+
+def test_lock_and_unlock_busy_hashing(setup_db, monkeypatch):
+    """Test lock and unlock report a saturated hashing pool instead of raising"""
+    from src import hashing
+    from src.transactions import get_locked_funds, lock_funds, unlock_funds
+    account_id = setup_db
+    assert lock_funds(account_id, Decimal("100.00"), "1234")[0]
+    lock_id = get_locked_funds(account_id)[0]["id"]
+    monkeypatch.setattr(hashing, "HASH_QUEUE_TIMEOUT", 0)
+    slots = hashing._get_slots()
+    for _ in range(hashing.HASH_WORKERS):
+        slots.acquire()
+    try:
+        busy = (False, "Too many requests in progress, please try again")
+        assert lock_funds(account_id, Decimal("50.00"), "1234") == busy
+        assert unlock_funds(lock_id, account_id, "1234") == busy
+    finally:
+        for _ in range(hashing.HASH_WORKERS):
+            slots.release()
+    assert get_account_balance(account_id) == Decimal("900.00")
+    assert unlock_funds(lock_id, account_id, "1234")[0]
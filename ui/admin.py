@@ -1,10 +1,33 @@
 import tkinter as tk
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
 from tkinter import ttk, messagebox
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from src.admin import get_all_users, get_all_transactions, get_user_accounts, get_transactions_with_user_details, block_unblock_account
+from src.admin import get_user_accounts, block_unblock_account, search_transactions, get_user_by_username, find_users_with_accounts, find_transaction_details, get_transaction_details, transaction_page_key, user_page_key
+from src.archive import archived_through
 from src.models import User, Transaction
-from src.database import get_db_connection
+from ui.widgets import LazyNotebook
+
+PAGE_SIZE = 50
+ANY = "Any"
+BLOCKED_CHOICES = {ANY: None, "Blocked": True, "Not blocked": False}
+TRANSACTION_TYPES = (ANY, "deposit", "withdraw", "transfer", "lock", "unlock")
+TRANSACTION_STATUSES = (ANY, "completed", "pending", "failed")
+TRANSACTION_SORT_CHOICES = {
+    "Newest first": "newest",
+    "Oldest first": "oldest",
+    "Largest amount": "amount_desc",
+    "Smallest amount": "amount_asc",
+}
+USER_SORT_CHOICES = {"ID": "id", "Username": "username", "Newest first": "newest"}
+
+def _parse_date(text: str, end: bool = False):
+    """Microseconds at the start of a YYYY-MM-DD day (UTC), or of the next day when end is set"""
+    day = datetime.strptime(text, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    if end:
+        day += timedelta(days=1)
+    return int(day.timestamp() * 1_000_000)
 
 class AdminDashboard(ttk.Frame):
     def __init__(self, parent, user: User, on_logout):
@@ -32,19 +55,51 @@ class AdminDashboard(ttk.Frame):
             width=10
         ).pack(side=RIGHT)
         
-        self.notebook = ttk.Notebook(self)
+        # Tabs are built and queried the first time they are selected
+        self.notebook = LazyNotebook(self)
         self.notebook.pack(fill=BOTH, expand=True, pady=10)
         
-        self.users_tab = ttk.Frame(self.notebook)
-        self.notebook.add(self.users_tab, text="Users")
-        self.setup_users_tab()
-        
-        self.transactions_tab = ttk.Frame(self.notebook)
-        self.notebook.add(self.transactions_tab, text="Transactions")
-        self.setup_transactions_tab()
+        self.users_tab = self.notebook.add_lazy("Users", self.setup_users_tab)
+        self.transactions_tab = self.notebook.add_lazy("Transactions", self.setup_transactions_tab)
     
     def setup_users_tab(self):
-        users = get_all_users()
+        # Keyset paging: the `after` key of every page up to the one shown, and the shown page's last key
+        self.users_pages = [None]
+        self.users_last_key = None
+        self.users_sort = None
+        self.user_accounts = {}
+        
+        filter_frame = ttk.Frame(self.users_tab)
+        filter_frame.pack(fill=X, padx=10, pady=(10, 0))
+        
+        ttk.Label(filter_frame, text="Username:").pack(side=LEFT)
+        self.user_prefix_var = tk.StringVar()
+        prefix_entry = ttk.Entry(filter_frame, textvariable=self.user_prefix_var, width=15)
+        prefix_entry.pack(side=LEFT, padx=5)
+        prefix_entry.bind('<Return>', lambda event: self.apply_user_filters())
+        
+        ttk.Label(filter_frame, text="Role:").pack(side=LEFT)
+        self.user_role_var = tk.StringVar(value=ANY)
+        ttk.Combobox(filter_frame, textvariable=self.user_role_var, values=(ANY, "user", "admin"),
+                     state="readonly", width=8).pack(side=LEFT, padx=5)
+        
+        ttk.Label(filter_frame, text="Accounts:").pack(side=LEFT)
+        self.user_blocked_var = tk.StringVar(value=ANY)
+        ttk.Combobox(filter_frame, textvariable=self.user_blocked_var, values=tuple(BLOCKED_CHOICES),
+                     state="readonly", width=11).pack(side=LEFT, padx=5)
+        
+        ttk.Label(filter_frame, text="Sort:").pack(side=LEFT)
+        self.user_sort_var = tk.StringVar(value="ID")
+        ttk.Combobox(filter_frame, textvariable=self.user_sort_var, values=tuple(USER_SORT_CHOICES),
+                     state="readonly", width=12).pack(side=LEFT, padx=5)
+        
+        ttk.Button(
+            filter_frame,
+            text="Apply",
+            command=self.apply_user_filters,
+            bootstyle=PRIMARY,
+            width=8
+        ).pack(side=LEFT, padx=5)
         
         columns = ('id', 'username', 'role', 'full_name', 'email', 'created_at')
         self.users_tree = ttk.Treeview(
@@ -68,16 +123,6 @@ class AdminDashboard(ttk.Frame):
         self.users_tree.column('email', width=150, anchor=W)
         self.users_tree.column('created_at', width=120, anchor=W)
         
-        for user in users:
-            self.users_tree.insert('', END, values=(
-                user.id,
-                user.username,
-                user.role,
-                user.full_name or "",
-                user.email or "",
-                user.created_at
-            ))
-        
         self.users_tree.pack(fill=BOTH, expand=True, padx=10, pady=10)
         
         btn_frame = ttk.Frame(self.users_tab)
@@ -98,9 +143,98 @@ class AdminDashboard(ttk.Frame):
             bootstyle=SECONDARY,
             width=15
         ).pack(side=RIGHT, padx=5)
+        
+        self.users_next_btn = ttk.Button(
+            btn_frame,
+            text="Next",
+            command=lambda: self.page_users(1),
+            bootstyle=SECONDARY,
+            width=8
+        )
+        self.users_next_btn.pack(side=RIGHT, padx=5)
+        
+        self.users_prev_btn = ttk.Button(
+            btn_frame,
+            text="Previous",
+            command=lambda: self.page_users(-1),
+            bootstyle=SECONDARY,
+            width=8
+        )
+        self.users_prev_btn.pack(side=RIGHT, padx=5)
+        
+        self.refresh_users()
     
     def setup_transactions_tab(self):
-        transactions = get_all_transactions(limit=50)
+        self.txn_pages = [None]
+        self.txn_last_key = None
+        self.txn_sort = "newest"
+        self.txn_details = {}
+        
+        # Full-text search over descriptions and references
+        search_frame = ttk.Frame(self.transactions_tab)
+        search_frame.pack(fill=X, padx=10, pady=(10, 0))
+        
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=40)
+        search_entry.pack(side=LEFT, padx=(0, 5))
+        search_entry.bind('<Return>', lambda event: self.search_transactions())
+        
+        ttk.Button(
+            search_frame,
+            text="Search",
+            command=self.search_transactions,
+            bootstyle=PRIMARY,
+            width=10
+        ).pack(side=LEFT, padx=5)
+        
+        self.more_results_btn = ttk.Button(
+            search_frame,
+            text="More Results",
+            command=lambda: self.search_transactions(more=True),
+            bootstyle=INFO,
+            width=12,
+            state=DISABLED
+        )
+        self.more_results_btn.pack(side=LEFT, padx=5)
+        self.search_offset = 0
+        
+        # Filters, applied by the database so every page comes from the whole ledger
+        filter_frame = ttk.Frame(self.transactions_tab)
+        filter_frame.pack(fill=X, padx=10, pady=(10, 0))
+        
+        self.txn_filter_vars = {}
+        for label, key, width in (("From", "start", 11), ("To", "end", 11), ("Min ₹", "min_amount", 9),
+                                  ("Max ₹", "max_amount", 9), ("User", "username", 12)):
+            ttk.Label(filter_frame, text=f"{label}:").pack(side=LEFT)
+            var = self.txn_filter_vars[key] = tk.StringVar()
+            entry = ttk.Entry(filter_frame, textvariable=var, width=width)
+            entry.pack(side=LEFT, padx=(2, 6))
+            entry.bind('<Return>', lambda event: self.apply_transaction_filters())
+        
+        for label, key, values, width in (("Type", "type", TRANSACTION_TYPES, 9),
+                                          ("Status", "status", TRANSACTION_STATUSES, 10),
+                                          ("Accounts", "blocked", tuple(BLOCKED_CHOICES), 11)):
+            ttk.Label(filter_frame, text=f"{label}:").pack(side=LEFT)
+            var = self.txn_filter_vars[key] = tk.StringVar(value=ANY)
+            ttk.Combobox(filter_frame, textvariable=var, values=values,
+                         state="readonly", width=width).pack(side=LEFT, padx=(2, 6))
+        
+        ttk.Label(filter_frame, text="Sort:").pack(side=LEFT)
+        self.txn_sort_var = tk.StringVar(value="Newest first")
+        ttk.Combobox(filter_frame, textvariable=self.txn_sort_var, values=tuple(TRANSACTION_SORT_CHOICES),
+                     state="readonly", width=14).pack(side=LEFT, padx=(2, 6))
+        
+        ttk.Button(
+            filter_frame,
+            text="Apply",
+            command=self.apply_transaction_filters,
+            bootstyle=PRIMARY,
+            width=8
+        ).pack(side=LEFT, padx=5)
+        
+        # Search and filters only read the main database, not the archive partitions
+        self.live_period_label = ttk.Label(self.transactions_tab, text="", bootstyle=SECONDARY)
+        self.live_period_label.pack(anchor=W, padx=10, pady=(5, 0))
         
         columns = ('id', 'account_id', 'type', 'amount', 'status', 'created_at')
         self.txn_tree = ttk.Treeview(
@@ -113,9 +247,9 @@ class AdminDashboard(ttk.Frame):
         self.txn_tree.heading('id', text='ID')
         self.txn_tree.heading('account_id', text='Account ID')
         self.txn_tree.heading('type', text='Type')
-        self.txn_tree.heading('amount', text='Amount')
+        self.txn_tree.heading('amount', text='Amount', command=lambda: self.sort_transactions("amount"))
         self.txn_tree.heading('status', text='Status')
-        self.txn_tree.heading('created_at', text='Date')
+        self.txn_tree.heading('created_at', text='Date', command=lambda: self.sort_transactions("created_at"))
         
         self.txn_tree.column('id', width=50, anchor=CENTER)
         self.txn_tree.column('account_id', width=80, anchor=CENTER)
@@ -124,28 +258,41 @@ class AdminDashboard(ttk.Frame):
         self.txn_tree.column('status', width=100, anchor=CENTER)
         self.txn_tree.column('created_at', width=150, anchor=W)
         
-        for txn in transactions:
-            self.txn_tree.insert('', END, values=(
-                txn.id,
-                txn.account_id,
-                txn.type.capitalize(),
-                f"₹{txn.amount:,.2f}",
-                txn.status.capitalize(),
-                txn.created_at
-            ))
-        
         self.txn_tree.pack(fill=BOTH, expand=True, padx=10, pady=10)
         
         # Bind double-click to show transaction details with user info
         self.txn_tree.bind('<Double-1>', self.show_transaction_details)
         
+        btn_frame = ttk.Frame(self.transactions_tab)
+        btn_frame.pack(fill=X, padx=10, pady=5)
+        
+        self.txn_prev_btn = ttk.Button(
+            btn_frame,
+            text="Previous",
+            command=lambda: self.page_transactions(-1),
+            bootstyle=SECONDARY,
+            width=8
+        )
+        self.txn_prev_btn.pack(side=LEFT, padx=5)
+        
+        self.txn_next_btn = ttk.Button(
+            btn_frame,
+            text="Next",
+            command=lambda: self.page_transactions(1),
+            bootstyle=SECONDARY,
+            width=8
+        )
+        self.txn_next_btn.pack(side=LEFT, padx=5)
+        
         ttk.Button(
-            self.transactions_tab,
+            btn_frame,
             text="Refresh",
             command=self.refresh_transactions,
             bootstyle=SECONDARY,
             width=15
-        ).pack(pady=5)
+        ).pack(side=RIGHT, padx=5)
+        
+        self.refresh_transactions()
     
     def show_transaction_details(self, event):
         selected = self.txn_tree.focus()
@@ -155,22 +302,8 @@ class AdminDashboard(ttk.Frame):
         txn_data = self.txn_tree.item(selected)['values']
         txn_id = txn_data[0]
         
-        # Fetch transaction with user details
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT t.id, t.account_id, t.type, t.amount, t.description, t.status, t.created_at,
-                       u.username, u.full_name
-                FROM transactions t
-                JOIN accounts a ON t.account_id = a.id
-                JOIN users u ON a.user_id = u.id
-                WHERE t.id = ?
-                """,
-                (txn_id,)
-            )
-            result = cursor.fetchone()
-        
+        # Listing pages carry the details; search results are looked up once
+        result = self.txn_details.get(txn_id) or get_transaction_details(txn_id)
         if not result:
             messagebox.showerror("Error", "Transaction details not found")
             return
@@ -178,15 +311,19 @@ class AdminDashboard(ttk.Frame):
         # Create pop-up window
         win = ttk.Toplevel(self)
         win.title(f"Transaction ID: {txn_id}")
-        win.geometry("400x300")
+        win.geometry("420x420")
         
         ttk.Label(win, text="Transaction Details", font=('Helvetica', 14, 'bold')).pack(pady=10)
         
         details = [
             ("ID", result["id"]),
             ("Account ID", result["account_id"]),
-            ("Username", result["username"]),
+            ("Account Number", result["account_number"] or "N/A"),
+            ("Balance", f"₹{result['balance']:,.2f}" if result["balance"] is not None else "N/A"),
+            ("Blocked", "Yes" if result["is_blocked"] else "No"),
+            ("Username", result["username"] or "N/A"),
             ("Full Name", result["full_name"] or "N/A"),
+            ("Counterparty", result["counterparty_account_number"] or "N/A"),
             ("Type", result["type"].capitalize()),
             ("Amount", f"₹{result['amount']:,.2f}"),
             ("Status", result["status"].capitalize()),
@@ -210,7 +347,10 @@ class AdminDashboard(ttk.Frame):
         
         user_data = self.users_tree.item(selected)['values']
         user_id = user_data[0]
-        accounts = get_user_accounts(user_id)
+        # Fetched with the users page
+        accounts = self.user_accounts.get(user_id)
+        if accounts is None:
+            accounts = get_user_accounts(user_id)
         
         win = ttk.Toplevel(self)
         win.title(f"Accounts for User ID: {user_id}")
@@ -296,7 +436,9 @@ class AdminDashboard(ttk.Frame):
             # Refresh the accounts list
             for item in tree.get_children():
                 tree.delete(item)
-            accounts = get_user_accounts(user_id)
+            accounts = self.user_accounts[user_id] = get_user_accounts(user_id)
+            # Transaction popups would show the old blocked flag; look them up afresh
+            self.txn_details = {}
             for acc in accounts:
                 tree.insert('', END, values=(
                     acc.id,
@@ -310,12 +452,39 @@ class AdminDashboard(ttk.Frame):
         else:
             messagebox.showerror("Error", f"Failed to {'block' if block else 'unblock'} account")
     
+    def apply_user_filters(self):
+        self.users_pages = [None]
+        self.refresh_users()
+    
+    def page_users(self, step):
+        if step > 0 and self.users_last_key is not None:
+            self.users_pages.append(self.users_last_key)
+        elif step < 0 and len(self.users_pages) > 1:
+            self.users_pages.pop()
+        self.refresh_users()
+    
     def refresh_users(self):
         for item in self.users_tree.get_children():
             self.users_tree.delete(item)
         
-        users = get_all_users()
-        for user in users:
+        sort = USER_SORT_CHOICES[self.user_sort_var.get()]
+        if sort != self.users_sort:
+            # Page keys only make sense for the sort they were taken under
+            self.users_pages = [None]
+            self.users_sort = sort
+        page = find_users_with_accounts(
+            username_prefix=self.user_prefix_var.get().strip() or None,
+            role=None if self.user_role_var.get() == ANY else self.user_role_var.get(),
+            blocked=BLOCKED_CHOICES[self.user_blocked_var.get()],
+            sort=sort,
+            limit=PAGE_SIZE,
+            after=self.users_pages[-1]
+        )
+        self.users_last_key = user_page_key(page[-1][0], sort) if page else None
+        self.users_prev_btn.configure(state=NORMAL if len(self.users_pages) > 1 else DISABLED)
+        self.users_next_btn.configure(state=NORMAL if len(page) == PAGE_SIZE else DISABLED)
+        self.user_accounts = {user.id: accounts for user, accounts in page}
+        for user, _ in page:
             self.users_tree.insert('', END, values=(
                 user.id,
                 user.username,
@@ -325,17 +494,112 @@ class AdminDashboard(ttk.Frame):
                 user.created_at
             ))
     
+    def _insert_transactions(self, rows):
+        for row in rows:
+            self.txn_tree.insert('', END, values=(
+                row["id"],
+                row["account_id"],
+                row["type"].capitalize(),
+                f"₹{row['amount']:,.2f}",
+                row["status"].capitalize(),
+                row["created_at"]
+            ))
+    
+    def _update_live_period(self):
+        """Say how far back the results go once old entries have been archived"""
+        through_us = archived_through()
+        if through_us is None:
+            self.live_period_label.configure(text="")
+            return
+        since = datetime.fromtimestamp(through_us / 1_000_000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+        self.live_period_label.configure(
+            text=f"Results cover entries from {since} UTC on; older entries are archived and not searched"
+        )
+    
+    def search_transactions(self, more=False):
+        query = self.search_var.get().strip()
+        if not query:
+            self.refresh_transactions()
+            return
+        
+        if not more:
+            self.search_offset = 0
+            for item in self.txn_tree.get_children():
+                self.txn_tree.delete(item)
+        
+        transactions = search_transactions(query, limit=PAGE_SIZE, offset=self.search_offset)
+        self.search_offset += len(transactions)
+        self._insert_transactions([vars(txn) for txn in transactions])
+        self.more_results_btn.configure(state=NORMAL if len(transactions) == PAGE_SIZE else DISABLED)
+        self.txn_prev_btn.configure(state=DISABLED)
+        self.txn_next_btn.configure(state=DISABLED)
+        if not more and not transactions:
+            messagebox.showinfo("Search", f"No transactions match '{query}'")
+    
+    def _transaction_filters(self):
+        """Filter arguments for find_transactions from the filter bar; raises ValueError on bad input"""
+        values = {key: var.get().strip() for key, var in self.txn_filter_vars.items()}
+        filters = {
+            "types": None if values["type"] == ANY else [values["type"]],
+            "status": None if values["status"] == ANY else values["status"],
+            "blocked": BLOCKED_CHOICES[values["blocked"]],
+        }
+        try:
+            filters["start_us"] = _parse_date(values["start"]) if values["start"] else None
+            filters["end_us"] = _parse_date(values["end"], end=True) if values["end"] else None
+        except ValueError:
+            raise ValueError("Dates must be in YYYY-MM-DD format")
+        try:
+            filters["min_amount"] = Decimal(values["min_amount"].replace(",", "")) if values["min_amount"] else None
+            filters["max_amount"] = Decimal(values["max_amount"].replace(",", "")) if values["max_amount"] else None
+        except InvalidOperation:
+            raise ValueError("Amounts must be numbers")
+        filters["user_id"] = None
+        if values["username"]:
+            user = get_user_by_username(values["username"])
+            if user is None:
+                raise ValueError(f"No user named '{values['username']}'")
+            filters["user_id"] = user.id
+        return filters
+    
+    def apply_transaction_filters(self):
+        self.txn_pages = [None]
+        self.txn_sort = TRANSACTION_SORT_CHOICES[self.txn_sort_var.get()]
+        self.refresh_transactions()
+    
+    def sort_transactions(self, column):
+        """Heading click: toggle the server-side sort on that column"""
+        if column == "amount":
+            self.txn_sort = "amount_asc" if self.txn_sort == "amount_desc" else "amount_desc"
+        else:
+            self.txn_sort = "oldest" if self.txn_sort == "newest" else "newest"
+        self.txn_sort_var.set(next(label for label, key in TRANSACTION_SORT_CHOICES.items() if key == self.txn_sort))
+        self.txn_pages = [None]
+        self.refresh_transactions()
+    
+    def page_transactions(self, step):
+        if step > 0 and self.txn_last_key is not None:
+            self.txn_pages.append(self.txn_last_key)
+        elif step < 0 and len(self.txn_pages) > 1:
+            self.txn_pages.pop()
+        self.refresh_transactions()
+    
     def refresh_transactions(self):
+        try:
+            filters = self._transaction_filters()
+        except ValueError as e:
+            messagebox.showerror("Invalid Filter", str(e))
+            return
+        
         for item in self.txn_tree.get_children():
             self.txn_tree.delete(item)
         
-        transactions = get_all_transactions(limit=50)
-        for txn in transactions:
-            self.txn_tree.insert('', END, values=(
-                txn.id,
-                txn.account_id,
-                txn.type.capitalize(),
-                f"₹{txn.amount:,.2f}",
-                txn.status.capitalize(),
-                txn.created_at
-            ))
\ No newline at end of file
+        self._update_live_period()
+        self.search_var.set("")
+        self.more_results_btn.configure(state=DISABLED)
+        transactions = find_transaction_details(**filters, sort=self.txn_sort, limit=PAGE_SIZE, after=self.txn_pages[-1])
+        self.txn_last_key = transaction_page_key(transactions[-1], self.txn_sort) if transactions else None
+        self.txn_details = {row["id"]: row for row in transactions}
+        self._insert_transactions(transactions)
+        self.txn_prev_btn.configure(state=NORMAL if len(self.txn_pages) > 1 else DISABLED)
+        self.txn_next_btn.configure(state=NORMAL if len(transactions) == PAGE_SIZE else DISABLED)
\ No newline at end of file
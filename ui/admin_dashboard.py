@@ -160,10 +160,10 @@ class AdminDashboard(ttk.Frame):
             cursor = conn.cursor()
             cursor.execute(
                 """
-                SELECT t.id, t.account_id, t.type, t.amount, t.description, t.status, t.created_at,
+                SELECT t.id, a.id AS account_id, t.type, t.amount, t.description, t.status, t.created_at,
                        u.username, u.full_name
-                FROM transactions t
-                JOIN accounts a ON t.account_id = a.id
+                FROM journal_entries t
+                JOIN accounts a ON a.id = COALESCE(t.debit_account_id, t.credit_account_id)
                 JOIN users u ON a.user_id = u.id
                 WHERE t.id = ?
                 """,
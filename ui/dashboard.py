@@ -4,33 +4,32 @@ import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from decimal import Decimal
 from typing import Optional
-from src.database import get_db_connection
-from src.models import Account
-from src.transactions import deposit, withdraw, get_account_transactions, get_account_balance, lock_funds, unlock_funds, get_locked_funds, transfer_funds
+from src.models import Account, AccountSnapshot
+from src.session import get_session
+from src.transactions import deposit, withdraw, get_account_snapshot, lock_funds, unlock_funds, transfer_funds
+from ui.widgets import LazyNotebook
 from datetime import datetime
 
+HISTORY_LIMIT = 50
+
 class UserDashboard(ttk.Frame):
     def __init__(self, parent, user, on_logout):
         super().__init__(parent)
         self.user = user
         self.on_logout = on_logout
         self.account = self._get_user_account()
+        # The session's balance until the Account tab is built and reads a snapshot
+        self.snapshot = AccountSnapshot(self.account.id, self.account.balance, [], [])
         self.setup_ui()
     
     def _get_user_account(self) -> Account:
         """Get the user's primary account"""
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT id, user_id, account_number, balance, account_type FROM accounts WHERE user_id = ?",
-                (self.user.id,)
-            )
-            account_data = cursor.fetchone()
-            if account_data:
-                return Account(**account_data)
-            messagebox.showerror("Error", "No account found. Please contact support.")
-            self.on_logout()
-            raise ValueError("No account found for user")
+        session = get_session(self.user.id)
+        if session and session.accounts:
+            return session.accounts[0]
+        messagebox.showerror("Error", "No account found. Please contact support.")
+        self.on_logout()
+        raise ValueError("No account found for user")
     
     def setup_ui(self):
         """Set up the UI"""
@@ -40,7 +39,7 @@ class UserDashboard(ttk.Frame):
         self.container.place(relx=0.5, rely=0.5, anchor=CENTER, relwidth=0.9, relheight=0.9)
         
         self.container.grid_columnconfigure(0, weight=1)
-        self.container.grid_rowconfigure((0, 1, 2, 3), weight=1)
+        self.container.grid_rowconfigure(1, weight=1)
         
         # Header
         self.header = ttk.Frame(self.container)
@@ -63,14 +62,31 @@ class UserDashboard(ttk.Frame):
         )
         logout_btn.pack(side=RIGHT)
         
+        # Tabs are built and queried the first time they are selected
+        self.notebook = LazyNotebook(self.container)
+        self.notebook.grid(row=1, column=0, sticky="nsew")
+        
+        self.account_tab = self.notebook.add_lazy("Account", self.setup_account_tab)
+        self.transactions_tab = self.notebook.add_lazy("Transactions", self.setup_transactions_tab)
+        
+        # Custom styles
+        style = ttk.Style()
+        style.configure("Custom.TButton", font=("Helvetica", 14), padding=10)
+        style.configure("Custom.TLabelframe", relief="groove", borderwidth=2)
+        style.configure("Custom.TLabelframe.Label", font=("Helvetica", 16, "bold"), foreground="#191970")
+    
+    def setup_account_tab(self):
+        """Build the account information and action buttons"""
+        self._load_snapshot()
+        
         # Account info
         self.account_frame = ttk.Labelframe(
-            self.container,
+            self.account_tab,
             text="Account Information",
             padding=20,
             style="Custom.TLabelframe"
         )
-        self.account_frame.grid(row=1, column=0, sticky="ew", padx=150, pady=20)
+        self.account_frame.pack(fill=X, padx=150, pady=20)
         
         ttk.Label(
             self.account_frame,
@@ -80,15 +96,15 @@ class UserDashboard(ttk.Frame):
         
         self.balance_label = ttk.Label(
             self.account_frame,
-            text=f"Balance: ₹{self.account.balance:,.2f}",
+            text=f"Balance: ₹{self.snapshot.balance:,.2f}",
             font=('Helvetica', 18, 'bold'),
             foreground="#191970"
         )
         self.balance_label.pack(anchor="w", pady=8)
         
         # Actions
-        self.actions_frame = ttk.Frame(self.container)
-        self.actions_frame.grid(row=2, column=0, sticky="ew", pady=30)
+        self.actions_frame = ttk.Frame(self.account_tab)
+        self.actions_frame.pack(fill=X, pady=30)
         # Configure the actions_frame to wrap buttons if needed
         self.actions_frame.grid_columnconfigure(0, weight=1)
         
@@ -101,8 +117,7 @@ class UserDashboard(ttk.Frame):
             ("Withdraw", self.handle_withdraw, WARNING),
             ("Lock Funds", self.handle_lock_funds, PRIMARY),
             ("Unlock Funds", self.handle_unlock_funds, INFO),
-            ("Pay", self.handle_pay, SUCCESS),  # Added Pay button
-            ("Transactions", self.show_transactions, SECONDARY)
+            ("Pay", self.handle_pay, SUCCESS)  # Added Pay button
         ]
         
         # Pack buttons in a way that allows wrapping
@@ -116,12 +131,6 @@ class UserDashboard(ttk.Frame):
                 style="Custom.TButton"
             )
             btn.grid(row=i//3, column=i%3, padx=10, pady=5, sticky="ew")
-        
-        # Custom styles
-        style = ttk.Style()
-        style.configure("Custom.TButton", font=("Helvetica", 14), padding=10)
-        style.configure("Custom.TLabelframe", relief="groove", borderwidth=2)
-        style.configure("Custom.TLabelframe.Label", font=("Helvetica", 16, "bold"), foreground="#191970")
     
     def handle_deposit(self):
         """Handle deposit action with custom dialog"""
@@ -139,7 +148,7 @@ class UserDashboard(ttk.Frame):
         amount = self._get_amount("Withdraw Amount", "Enter amount to withdraw (e.g., 1000.00)")
         if not amount:
             return
-        current_balance = get_account_balance(self.account.id)
+        current_balance = self._load_snapshot().balance
         if amount > current_balance:
             messagebox.showerror("Error", f"Insufficient funds. Available: ₹{current_balance:,.2f}")
             return
@@ -154,7 +163,7 @@ class UserDashboard(ttk.Frame):
         amount = self._get_amount("Lock Funds", "Enter amount to lock (e.g., 1000.00)")
         if not amount:
             return
-        current_balance = get_account_balance(self.account.id)
+        current_balance = self._load_snapshot().balance
         if amount > current_balance:
             messagebox.showerror("Error", f"Insufficient funds. Available: ₹{current_balance:,.2f}")
             return
@@ -170,7 +179,7 @@ class UserDashboard(ttk.Frame):
     
     def handle_unlock_funds(self):
         """Handle unlocking funds with improved selection"""
-        locked_funds = get_locked_funds(self.account.id)
+        locked_funds = self._load_snapshot().locked_funds
         if not locked_funds:
             messagebox.showinfo("Info", "No locked funds available to unlock.")
             return
@@ -247,7 +256,7 @@ class UserDashboard(ttk.Frame):
             return
         
         # Check balance
-        current_balance = get_account_balance(self.account.id)
+        current_balance = self._load_snapshot().balance
         if amount > current_balance:
             messagebox.showerror("Error", f"Insufficient funds. Available: ₹{current_balance:,.2f}")
             return
@@ -290,23 +299,16 @@ class UserDashboard(ttk.Frame):
                 self._refresh_balance()
                 win.destroy()
     
-    def show_transactions(self):
-        """Show transaction history with sorting"""
-        transactions = get_account_transactions(self.account.id, limit=50)
-        
-        win = ttk.Toplevel(self)
-        win.title("Transaction History")
-        win.geometry("800x600")
-        win.transient(self)
-        win.grab_set()
-        
+    def setup_transactions_tab(self):
+        """Build the transaction history with sorting"""
         columns = ('date', 'type', 'amount', 'description')
-        tree = ttk.Treeview(
-            win,
+        self.txn_tree = ttk.Treeview(
+            self.transactions_tab,
             columns=columns,
             show='headings',
             bootstyle=PRIMARY
         )
+        tree = self.txn_tree
         
         tree.heading('date', text='Date', command=lambda: self._sort_tree(tree, 'date', False))
         tree.heading('type', text='Type', command=lambda: self._sort_tree(tree, 'type', False))
@@ -318,8 +320,26 @@ class UserDashboard(ttk.Frame):
         tree.column('amount', width=120, anchor=E)
         tree.column('description', width=350, anchor=W)
         
+        self._load_snapshot()
+        self.update_transactions()
+        
+        tree.pack(fill=BOTH, expand=True, padx=10, pady=10)
+        
+        ttk.Button(
+            self.transactions_tab,
+            text="Refresh",
+            command=self._refresh_balance,
+            bootstyle=SECONDARY,
+            style="Custom.TButton"
+        ).pack(pady=10)
+    
+    def update_transactions(self):
+        """Show the history of the last snapshot"""
+        for item in self.txn_tree.get_children():
+            self.txn_tree.delete(item)
+        
         self.transaction_data = []
-        for txn in transactions:
+        for txn in self.snapshot.transactions:
             created_at = datetime.strptime(txn.created_at, "%Y-%m-%d %H:%M:%S").strftime("%d-%m-%Y %H:%M")
             self.transaction_data.append({
                 'date': created_at,
@@ -327,22 +347,12 @@ class UserDashboard(ttk.Frame):
                 'amount': txn.amount,
                 'description': txn.description or "No description"
             })
-            tree.insert('', END, values=(
+            self.txn_tree.insert('', END, values=(
                 created_at,
                 txn.type.capitalize(),
                 f"{txn.amount:,.2f}",
                 txn.description or "No description"
             ))
-        
-        tree.pack(fill=BOTH, expand=True, padx=10, pady=10)
-        
-        ttk.Button(
-            win,
-            text="Close",
-            command=win.destroy,
-            bootstyle=SECONDARY,
-            style="Custom.TButton"
-        ).pack(pady=10)
     
     def _sort_tree(self, tree, col, reverse):
         """Sort Treeview by column"""
@@ -357,10 +367,20 @@ class UserDashboard(ttk.Frame):
         
         tree.heading(col, command=lambda: self._sort_tree(tree, col, not reverse))
     
+    def _load_snapshot(self) -> AccountSnapshot:
+        """Reload balance, history and locks from one consistent read"""
+        snapshot = get_account_snapshot(self.account.id, HISTORY_LIMIT)
+        if snapshot:
+            self.snapshot = snapshot
+        return self.snapshot
+    
     def _refresh_balance(self):
-        """Refresh the displayed balance"""
-        self.account.balance = get_account_balance(self.account.id)
-        self.balance_label.config(text=f"Balance: ₹{self.account.balance:,.2f}")
+        """Refresh the displayed balance and, once its tab is built, the history"""
+        self._load_snapshot()
+        if self.notebook.is_built(self.account_tab):
+            self.balance_label.config(text=f"Balance: ₹{self.snapshot.balance:,.2f}")
+        if self.notebook.is_built(self.transactions_tab):
+            self.update_transactions()
     
     def _get_amount(self, title, placeholder, max_value=None) -> Optional[Decimal]:
         """Custom dialog for amount input"""
@@ -2,9 +2,13 @@ import tkinter as tk
 from tkinter import messagebox
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
+import queue
 import re
+import threading
 from src.auth import authenticate_user
-from src.database import get_db_connection
+from src.session import load_session
+
+LOGIN_POLL_MS = 20
 
 class FormFrame(ttk.Frame):
     def __init__(self, parent, padding=(20, 20), bootstyle="light"):
@@ -121,26 +125,40 @@ class LoginFrame(FormFrame):
             messagebox.showerror("Error", "Username can only contain letters, numbers, and underscores")
             return
         
+        # Password verification is deliberately slow; keep it off the Tk thread
+        self.login_btn.config(state=DISABLED)
+        results = queue.Queue(maxsize=1)
+        threading.Thread(
+            target=self._authenticate, args=(username, password, results), daemon=True
+        ).start()
+        self.after(LOGIN_POLL_MS, self._finish_login, results)
+
+    def _authenticate(self, username, password, results):
         try:
-            user = authenticate_user(username, password)
-            if user:
-                # Check if any of the user's accounts are blocked
-                with get_db_connection() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        "SELECT is_blocked FROM accounts WHERE user_id = ?",
-                        (user.id,)
-                    )
-                    accounts = cursor.fetchall()
+            user, message = authenticate_user(username, password)
+            # One joined query loads the user's accounts and blocked status for the dashboards
+            session = load_session(user.id) if user else None
+            results.put((session, message, None))
+        except Exception as e:
+            results.put((None, "", e))
 
-                # If any account is blocked, show a message and prevent login
-                if any(account["is_blocked"] == 1 for account in accounts):
-                    messagebox.showerror("Account Blocked", "Your account is blocked. Please contact the admin.")
-                    return
+    def _finish_login(self, results):
+        try:
+            session, message, error = results.get_nowait()
+        except queue.Empty:
+            self.after(LOGIN_POLL_MS, self._finish_login, results)
+            return
+        self.login_btn.config(state=NORMAL)
 
-                # Proceed to dashboard if no accounts are blocked
-                self.on_login_success(user)
-            else:
-                messagebox.showerror("Error", "Incorrect username or password")
-        except Exception as e:
-            messagebox.showerror("Error", f"Login failed: {str(e)}")
\ No newline at end of file
+        if error is not None:
+            messagebox.showerror("Error", f"Login failed: {str(error)}")
+        elif session:
+            # If any account is blocked, show a message and prevent login
+            if session.is_blocked:
+                messagebox.showerror("Account Blocked", "Your account is blocked. Please contact the admin.")
+                return
+
+            # Proceed to dashboard if no accounts are blocked
+            self.on_login_success(session.user)
+        else:
+            messagebox.showerror("Error", message)
@@ -134,11 +134,11 @@ class RegisterFrame(FormFrame):
             return
 
         try:
-            user = register_user(username, password, full_name, email)
+            user, message = register_user(username, password, full_name, email)
             if user:
                 messagebox.showinfo("Success", f"Welcome, {full_name}! Your account has been created.")
                 self.on_register_success(user)
             else:
-                messagebox.showerror("Error", "Username or email already exists")
+                messagebox.showerror("Error", message)
         except Exception as e:
             messagebox.showerror("Error", f"Registration failed: {str(e)}")
\ No newline at end of file
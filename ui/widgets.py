@@ -0,0 +1,42 @@
+import ttkbootstrap as ttk
+from ttkbootstrap.constants import *
+
+class LazyNotebook(ttk.Notebook):
+    """Notebook whose tabs are built and populated the first time they are selected"""
+    def __init__(self, parent, **kwargs):
+        super().__init__(parent, **kwargs)
+        self._builders = {}
+        self.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+
+    def add_lazy(self, text, builder):
+        """
+        Add a tab showing a placeholder until it is first selected
+        Args:
+            text: Tab title
+            builder: Called without arguments to build the tab's contents
+        Returns:
+            ttk.Frame: The tab frame the builder should fill
+        """
+        frame = ttk.Frame(self)
+        placeholder = ttk.Label(frame, text="Loading...", font=('Helvetica', 12), bootstyle=SECONDARY)
+        placeholder.pack(pady=20)
+        self.add(frame, text=text)
+        self._builders[str(frame)] = (builder, placeholder)
+        return frame
+
+    def is_built(self, frame) -> bool:
+        return str(frame) not in self._builders
+
+    def build(self, frame):
+        """Build a tab now if it has not been built yet"""
+        pending = self._builders.pop(str(frame), None)
+        if pending:
+            builder, placeholder = pending
+            placeholder.destroy()
+            builder()
+
+    def _on_tab_changed(self, event):
+        tab = self.select()
+        if tab and not self.is_built(tab):
+            # Let the placeholder paint before running the tab's queries
+            self.after(1, self.build, tab)